@@ -1,5 +1,26 @@
 from django.contrib import admin
+from rest_framework_simplejwt.token_blacklist.admin import OutstandingTokenAdmin, BlacklistedTokenAdmin
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from .models import User
 
 # Register your models here.
-admin.site.register(User)
\ No newline at end of file
+admin.site.register(User)
+
+
+# The token tables may be on another database than the users, so they can't be joined
+class TokenOutstandingTokenAdmin(OutstandingTokenAdmin):
+
+    def get_queryset(self, *args, **kwargs):
+        return super().get_queryset(*args, **kwargs).select_related(None)
+
+
+class TokenBlacklistedTokenAdmin(BlacklistedTokenAdmin):
+
+    def get_queryset(self, *args, **kwargs):
+        return super().get_queryset(*args, **kwargs).select_related(None).select_related('token')
+
+
+admin.site.unregister(OutstandingToken)
+admin.site.register(OutstandingToken, TokenOutstandingTokenAdmin)
+admin.site.unregister(BlacklistedToken)
+admin.site.register(BlacklistedToken, TokenBlacklistedTokenAdmin)
@@ -18,8 +18,10 @@ from rest_framework_simplejwt.tokens import RefreshToken
 # Local Imports
 from authentication.tokens import account_activation_token
 from authentication.choices import UserTypeChoices
+from notifications.models import OutboxMessage
 
 import json
+from unittest import mock
 
 
 User = get_user_model()
@@ -64,6 +66,23 @@ class RegisterUserViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(User.objects.count(), 1)  # No new user should be created
 
+    def test_signup_failure_keeps_nothing(self):
+        """
+        Test that a failed signup can be retried.
+        """
+        data = {
+            'email': 'test@example.com',
+            'password': 'test_password',
+        }
+        with mock.patch('authentication.api.v1.views.AuthHelper.get_tokens_for_user', side_effect=Exception):
+            response = self.client.post(self.signup_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        response = self.client.post(self.signup_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_signup_email_validation_errors(self):
         """
         Test signup with invalid data.
@@ -126,6 +145,23 @@ class RegisterOrganizerViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(User.objects.count(), 1)  # No new user should be created
 
+    def test_signup_failure_keeps_nothing(self):
+        """
+        Test that a failed signup can be retried.
+        """
+        data = {
+            'email': 'test@example.com',
+            'password': 'test_password',
+        }
+        with mock.patch('authentication.api.v1.views.AuthHelper.get_tokens_for_user', side_effect=Exception):
+            response = self.client.post(self.signup_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        response = self.client.post(self.signup_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
     def test_signup_email_validation_errors(self):
         """
         Test signup with invalid data.
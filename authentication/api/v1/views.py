@@ -5,7 +5,7 @@ from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.hashers import check_password
 from django.contrib.auth.tokens import default_token_generator
-from django.template.loader import render_to_string
+from django.db import transaction
 
 # Rest Framework Imports
 from rest_framework.generics import GenericAPIView
@@ -24,7 +24,8 @@ from authentication.helpers import AuthHelper, validation_error_handler
 from authentication.tokens import account_activation_token, password_reset_token
 from authentication.choices import UserTypeChoices
 
-from notifications.tasks import send_email
+from notifications.tasks import send_templated_emails
+from notifications import outbox
 from django.core.mail import send_mail
 
 User = get_user_model()
@@ -35,6 +36,8 @@ class RegisterUserView(GenericAPIView):
     # DRF uses this variable to display the deafult html template
     serializer_class = auth_serializers.CreateUserSerializer
 
+    # The user and the verification email are committed together
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         request_data = request.data
         # data is required - otherwise it will not perform validations
@@ -78,19 +81,9 @@ class RegisterUserView(GenericAPIView):
 
         serializer_data = self.serializer_class(user).data
 
-        # Email
-        subject = "Verify Email for your account on Eventizer"
-        template = "authentication/acc_activate_mail.html"
-        context_data = {
-            "host": settings.FRONTEND_HOST,
-            "uidb64": urlsafe_base64_encode(force_bytes(user.id)),
-            "token": account_activation_token.make_token(user=user),
-            "protocol": settings.FRONTEND_PROTOCOL
-        }
-        message = render_to_string(template_name=template, context=context_data)
-
         try:
-            send_email.delay(subject=subject, message=message, to_email=user.email)
+            # Verification email, rendered by the worker
+            outbox.enqueue(send_templated_emails, template_key='account_verification', object_ids=[user.id])
 
             return Response({
                 "status": "success",
@@ -104,6 +97,8 @@ class RegisterUserView(GenericAPIView):
         except Exception:
             # logger.error(
             #     "Some error occurred in signup endpoint", exc_info=True)
+            # Neither the user nor its verification email is kept, so signing up again works
+            transaction.set_rollback(True)
             return Response({
                 "status": "error",
                 "message": "Some error occurred",
@@ -116,6 +111,8 @@ class RegisterOrganizerView(GenericAPIView):
     # DRF uses this variable to display the deafult html template
     serializer_class = auth_serializers.CreateUserSerializer
 
+    # The user and the verification email are committed together
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         request_data = request.data
         # data is required - otherwise it will not perform validations
@@ -160,20 +157,10 @@ class RegisterOrganizerView(GenericAPIView):
 
         serializer_data = self.serializer_class(user).data
 
-        # Email
-        subject = "Verify Email for your account on Eventizer"
-        template = "authentication/acc_activate_mail.html"
-        context_data = {
-            "host": settings.FRONTEND_HOST,
-            "uid": urlsafe_base64_encode(force_bytes(user.id)),
-            "token": account_activation_token.make_token(user=user),
-            "protocol": settings.FRONTEND_PROTOCOL
-        }
-        message = render_to_string(template_name=template, context=context_data)
-
         try:
             
-            send_email.delay(subject=subject, message=message, to_email=user.email)
+            # Verification email, rendered by the worker
+            outbox.enqueue(send_templated_emails, template_key='account_verification', object_ids=[user.id])
 
             return Response({
                 "status": "success",
@@ -187,6 +174,8 @@ class RegisterOrganizerView(GenericAPIView):
         except Exception:
             # logger.error(
             #     "Some error occurred in signup endpoint", exc_info=True)
+            # Neither the user nor its verification email is kept, so signing up again works
+            transaction.set_rollback(True)
             return Response({
                 "status": "error",
                 "message": "Some error occurred",
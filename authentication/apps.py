@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db import models
 
 
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+        from . import signals  # noqa: F401
+
+        # The token tables can be routed to their own database (AUTH_TOKEN_DATABASE), so the
+        # foreign key to the user can't be enforced by the database nor cascaded by the ORM.
+        # Must match authentication/token_blacklist_migrations.
+        user_field = OutstandingToken._meta.get_field('user')
+        user_field.db_constraint = False
+        user_field.remote_field.on_delete = models.DO_NOTHING
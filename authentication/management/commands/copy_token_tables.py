@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections
+
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
+
+
+class Command(BaseCommand):
+    help = "Copy the JWT token tables from the primary to AUTH_TOKEN_DATABASE after enabling it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='default')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        source = options['source']
+        target = settings.AUTH_TOKEN_DATABASE
+        if source == target:
+            raise CommandError("AUTH_TOKEN_DATABASE is the source database, set AUTH_TOKEN_DB_NAME first.")
+
+        for model in (OutstandingToken, BlacklistedToken):
+            copied = 0
+            last_id = 0
+            while True:
+                rows = list(
+                    model.objects.using(source).filter(id__gt=last_id).order_by('id')[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                for row in rows:
+                    row._state.db = target
+                model.objects.using(target).bulk_create(rows, ignore_conflicts=True)
+                last_id = rows[-1].id
+                copied += len(rows)
+            self.stdout.write(f"Copied {copied} rows of {model._meta.db_table}.")
+
+        # Continue the id sequences after the copied rows
+        connection = connections[target]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [OutstandingToken, BlacklistedToken]):
+                cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS(f"Token tables copied to {target}."))
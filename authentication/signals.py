@@ -0,0 +1,15 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=User)
+def release_outstanding_tokens(sender, instance, **kwargs):
+    # OutstandingToken.user has no database constraint (the token tables may be on another
+    # database) so the SET_NULL of simplejwt is done here instead of by the delete collector.
+    OutstandingToken.objects.filter(user_id=instance.pk).update(user=None)
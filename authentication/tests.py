@@ -14,6 +14,7 @@ from rest_framework.test import APIClient
 
 # SimpleJWT Imports
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
 
 # Local Imports
 from .tokens import account_activation_token
@@ -83,4 +84,13 @@ class UserModelTest(TestCase):
         self.assertFalse(self.organizer.is_staff)
         self.assertTrue(self.organizer.is_active)
         self.assertFalse(self.organizer.is_superuser)
-        self.assertTrue(self.organizer.check_password('testpassword1'))
\ No newline at end of file
+        self.assertTrue(self.organizer.check_password('testpassword1'))
+
+    def test_delete_user_releases_outstanding_tokens(self):
+        AuthHelper.get_tokens_for_user(self.user)
+        token = OutstandingToken.objects.get(user=self.user)
+
+        self.user.delete()
+
+        token.refresh_from_db()
+        self.assertIsNone(token.user_id)
@@ -0,0 +1,56 @@
+# Replaces the migrations of rest_framework_simplejwt.token_blacklist (see MIGRATION_MODULES in settings)
+# with its final schema, minus the database constraint on OutstandingToken.user: the token tables can live
+# on their own database (AUTH_TOKEN_DATABASE) where the user table does not exist.
+# Databases which already applied the upstream migrations treat this one as applied.
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    replaces = [
+        ('token_blacklist', '0001_initial'),
+        ('token_blacklist', '0002_outstandingtoken_jti_hex'),
+        ('token_blacklist', '0003_auto_20171017_2007'),
+        ('token_blacklist', '0004_auto_20171017_2013'),
+        ('token_blacklist', '0005_remove_outstandingtoken_jti'),
+        ('token_blacklist', '0006_auto_20171017_2113'),
+        ('token_blacklist', '0007_auto_20171017_2214'),
+        ('token_blacklist', '0008_migrate_to_bigautofield'),
+        ('token_blacklist', '0010_fix_migrate_to_bigautofield'),
+        ('token_blacklist', '0011_linearizes_history'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutstandingToken',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('jti', models.CharField(max_length=255, unique=True)),
+                ('token', models.TextField()),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField()),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('user',),
+            },
+        ),
+        migrations.CreateModel(
+            name='BlacklistedToken',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('blacklisted_at', models.DateTimeField(auto_now_add=True)),
+                ('token', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='token_blacklist.outstandingtoken')),
+            ],
+        ),
+    ]
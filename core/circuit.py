@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Per process circuit breaker of a remote service.
+
+    After threshold failures in a row the circuit opens and allow() returns False for
+    cooldown seconds, so callers skip the service instead of waiting on its timeouts. Then
+    a single caller is allowed through to probe it: a success closes the circuit, a failure
+    opens it for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.open_until is not None
+
+    def allow(self):
+        with self._lock:
+            if self.open_until is None:
+                return True
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            # Half open, hold the others back while this caller probes
+            self.open_until = now + self.cooldown
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_until = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.open_until = time.monotonic() + self.cooldown
@@ -0,0 +1,77 @@
+"""
+PostgreSQL backend which borrows connections from an in-process pool (core.db.pool)
+instead of opening a new connection, with its TLS and auth handshake, for every request.
+
+Configured through the POOL key of the database settings:
+
+    'POOL': {
+        'MAX_SIZE': 10,             # connections per process
+        'TIMEOUT': 10,              # seconds to wait for a free connection
+        'MAX_IDLE': 300,            # close connections idle for longer
+        'MAX_LIFETIME': 3600,       # close connections older than this
+        'HEALTH_CHECK_AFTER': 30,   # check connections idle for longer on checkout
+    }
+
+CONN_MAX_AGE should stay 0: Django "closes" the connection at the end of every request,
+which returns it to the pool.
+"""
+from django.db.backends.postgresql import base
+
+from core.db import pool as db_pool
+from .creation import DatabaseCreation
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def pool_key(self):
+        settings_dict = self.settings_dict
+        return (
+            self.alias, settings_dict['NAME'], settings_dict['HOST'],
+            settings_dict['PORT'], settings_dict['USER'],
+        )
+
+    def get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+
+        def create_pool():
+            return db_pool.ConnectionPool(
+                connect=lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+                check=self.check_pooled_connection,
+                max_size=options.get('MAX_SIZE', 10),
+                timeout=options.get('TIMEOUT', 10),
+                max_idle=options.get('MAX_IDLE', 300),
+                max_lifetime=options.get('MAX_LIFETIME', 3600),
+                health_check_after=options.get('HEALTH_CHECK_AFTER', 30),
+            )
+
+        return db_pool.get_pool(self.pool_key(), create_pool)
+
+    @staticmethod
+    def check_pooled_connection(connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        connection.rollback()
+
+    def get_new_connection(self, conn_params):
+        self._pool = self.get_pool(conn_params)
+        try:
+            return self._pool.getconn()
+        except db_pool.PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            connection = self.connection
+            # Closed inside an atomic block Django keeps a reference to the connection,
+            # so it must not be handed out again.
+            broken = bool(connection.closed) or self.in_atomic_block
+            if not broken and connection.get_transaction_status() != self.Database.extensions.TRANSACTION_STATUS_IDLE:
+                # Never hand out a connection with an open or failed transaction
+                try:
+                    connection.rollback()
+                except self.Database.Error:
+                    broken = True
+            self._pool.putconn(connection, discard=broken)
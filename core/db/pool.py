@@ -0,0 +1,228 @@
+"""
+In-process pool of database connections used by core.db.backends.pooled.
+
+There is one pool per database (connection parameters) per process. Pools are thread safe,
+so the threads of a WSGI/ASGI worker share them, and fork safe: a pool inherited from a
+parent process (celery prefork, gunicorn --preload) is dropped without touching the
+parent's connections.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'created_at', 'returned_at')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections.
+
+    connect() opens a new connection, check() raises if a connection is unusable. Idle
+    connections are health checked on checkout once they have been idle for more than
+    health_check_after seconds, and closed once idle for more than max_idle seconds or
+    older than max_lifetime seconds.
+    """
+
+    def __init__(self, connect, check, max_size=10, timeout=10, max_idle=300,
+                 max_lifetime=3600, health_check_after=30):
+        self.connect = connect
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._condition = threading.Condition()
+
+        # Metrics
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.health_check_failures = 0
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        with self._condition:
+            while True:
+                pooled = self._take_idle()
+                if pooled is not None:
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot, the connection is opened outside of the lock
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No connection available in the pool after {self.timeout} seconds "
+                        f"({self.max_size} connections in use)."
+                    )
+                self._condition.wait(remaining)
+
+        if pooled is not None and not self._is_healthy(pooled):
+            # Keep the slot, a fresh connection replaces the broken one
+            self._close_quietly(pooled)
+            pooled = None
+
+        if pooled is None:
+            try:
+                pooled = PooledConnection(self.connect())
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+            self.connections_created += 1
+
+        waited = time.monotonic() - started
+        with self._condition:
+            self._in_use[id(pooled.connection)] = pooled
+            self.checkouts += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+        return pooled.connection
+
+    def putconn(self, connection, discard=False):
+        with self._condition:
+            pooled = self._in_use.pop(id(connection), None)
+        if pooled is None:
+            # Not ours (e.g. opened before a fork), just close it
+            connection.close()
+            return
+
+        now = time.monotonic()
+        if discard or getattr(connection, 'closed', False) or now - pooled.created_at > self.max_lifetime:
+            self._discard(pooled)
+            return
+
+        pooled.returned_at = now
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def close(self):
+        """
+        Close every idle connection. Connections in use are closed when they are returned.
+        """
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'checked_out': len(self._in_use),
+                'idle': len(self._idle),
+                'checkouts': self.checkouts,
+                'wait_time_total': round(self.wait_time, 6),
+                'wait_time_max': round(self.max_wait_time, 6),
+                'timeouts': self.timeouts,
+                'connections_created': self.connections_created,
+                'connections_closed': self.connections_closed,
+                'health_check_failures': self.health_check_failures,
+            }
+
+    def _take_idle(self):
+        # Most recently used first, so the least used connections age out through max_idle
+        now = time.monotonic()
+        while self._idle:
+            pooled = self._idle.pop()
+            if now - pooled.returned_at > self.max_idle or now - pooled.created_at > self.max_lifetime:
+                self._size -= 1
+                self._close_quietly(pooled)
+                continue
+            return pooled
+        return None
+
+    def _is_healthy(self, pooled):
+        if getattr(pooled.connection, 'closed', False):
+            self.health_check_failures += 1
+            return False
+        if time.monotonic() - pooled.returned_at < self.health_check_after:
+            return True
+        try:
+            self.check(pooled.connection)
+        except Exception:
+            self.health_check_failures += 1
+            logger.warning("Discarding a broken pooled database connection.", exc_info=True)
+            return False
+        return True
+
+    def _discard(self, pooled):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        self._close_quietly(pooled)
+
+    def _close_quietly(self, pooled):
+        self.connections_closed += 1
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+# Connections inherited from a parent process are kept referenced, closing them would
+# terminate the parent's sessions.
+_inherited = []
+
+
+def get_pool(key, factory):
+    """
+    Return the pool of this process for key, creating it with factory() if needed.
+    """
+    global _pools_pid
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            _inherited.append(_pools.copy())
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = factory()
+        return pool
+
+
+def all_pools():
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            return {}
+        return dict(_pools)
+
+
+def close_pools(database_name=None):
+    for key, pool in all_pools().items():
+        if database_name is None or key[1] == database_name:
+            pool.close()
@@ -0,0 +1,86 @@
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.permissions import SAFE_METHODS
+
+from . import routers
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests to views with `use_read_replica = True` read from a replica.
+
+    After a request wrote to the primary, the client is pinned to the primary for
+    REPLICA_PIN_SECONDS so it never reads data older than its own write. Browsers are
+    pinned through a cookie, token clients through the cache keyed on their Authorization header.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = routers.begin_request()
+        try:
+            response = self.get_response(request)
+            if routers.get_routing_state().wrote:
+                self.pin_to_primary(request, response)
+            return response
+        finally:
+            routers.end_request(token)
+
+    async def __acall__(self, request):
+        token = routers.begin_request()
+        try:
+            response = await self.get_response(request)
+            if routers.get_routing_state().wrote:
+                self.set_pin_cookie(response)
+                key = self.pin_key(request)
+                if key is not None:
+                    await cache.aset(key, 1, timeout=settings.REPLICA_PIN_SECONDS)
+            return response
+        finally:
+            routers.end_request(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view_class, 'use_read_replica', False)
+            and not self.is_pinned(request)
+        ):
+            routers.get_routing_state().use_replica = True
+
+    def pin_key(self, request):
+        authorization = request.META.get('HTTP_AUTHORIZATION')
+        if not authorization:
+            return None
+        return 'replica-pin:' + hashlib.sha256(authorization.encode()).hexdigest()
+
+    def is_pinned(self, request):
+        if request.COOKIES.get(settings.REPLICA_PIN_COOKIE):
+            return True
+        key = self.pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def set_pin_cookie(self, response):
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE, '1',
+            max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+        )
+
+    def pin_to_primary(self, request, response):
+        self.set_pin_cookie(response)
+        key = self.pin_key(request)
+        if key is not None:
+            cache.set(key, 1, timeout=settings.REPLICA_PIN_SECONDS)
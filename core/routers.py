@@ -0,0 +1,145 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+
+
+class RoutingState:
+    """
+    Per request routing state, set up by core.middleware.ReplicaRoutingMiddleware.
+    """
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_routing_state = ContextVar('db_routing_state', default=None)
+
+# alias -> (checked at, lag in seconds)
+_replica_lag_cache = {}
+
+
+def begin_request():
+    return _routing_state.set(RoutingState())
+
+
+def end_request(token):
+    _routing_state.reset(token)
+
+
+def get_routing_state():
+    return _routing_state.get()
+
+
+def replica_lag(alias):
+    """
+    Return the replication lag of a replica in seconds. A replica which has replayed
+    everything it received is not lagging even if the primary has been idle for a while.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute("""
+            SELECT CASE
+                WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+            END
+        """)
+        return float(cursor.fetchone()[0])
+
+
+def _cached_replica_lag(alias):
+    now = time.monotonic()
+    checked_at, lag = _replica_lag_cache.get(alias, (None, None))
+    if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+        try:
+            lag = replica_lag(alias)
+        except DatabaseError:
+            # Unreachable replicas are skipped until the next check
+            lag = float('inf')
+        _replica_lag_cache[alias] = (now, lag)
+    return lag
+
+
+def healthy_replicas():
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if _cached_replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+
+
+class AuthTokenRouter:
+    """
+    Keeps the JWT token tables (token_blacklist) on AUTH_TOKEN_DATABASE so login, refresh and
+    logout write churn doesn't share buffers, WAL and vacuum with the event tables.
+    """
+    app_labels = {'token_blacklist'}
+
+    def is_token_model(self, model):
+        return model._meta.app_label in self.app_labels
+
+    def db_for_read(self, model, **hints):
+        if self.is_token_model(model):
+            return settings.AUTH_TOKEN_DATABASE
+
+        # Related objects of a token (e.g. token.user) live on the primary
+        instance = hints.get('instance')
+        if (
+            instance is not None
+            and settings.AUTH_TOKEN_DATABASE != 'default'
+            and instance._state.db == settings.AUTH_TOKEN_DATABASE
+        ):
+            return 'default'
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self.is_token_model(obj1) or self.is_token_model(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label in self.app_labels:
+            return db == settings.AUTH_TOKEN_DATABASE
+        if db == settings.AUTH_TOKEN_DATABASE and db != 'default':
+            return False
+        return None
+
+
+class ReplicaRouter:
+    """
+    Sends reads of views which opted in with `use_read_replica = True` to a healthy replica.
+    Everything else, and every read after a write in the same request, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = get_routing_state()
+        if state is None or not state.use_replica:
+            return None
+
+        replicas = healthy_replicas()
+        if not replicas:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = get_routing_state()
+        if state is not None:
+            # Read your own writes for the rest of the request
+            state.wrote = True
+            state.use_replica = False
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
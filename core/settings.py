@@ -11,12 +11,13 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
+from kombu import Queue
 from datetime import timedelta
 import os
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -55,7 +56,8 @@ INSTALLED_APPS = [
     # Local
     'authentication',
     'events',
-    'notifications'
+    'notifications',
+    'webhooks',
 ]
 
 MIDDLEWARE = [
@@ -66,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -94,15 +97,67 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        # PostgreSQL with an in-process connection pool, see core/db/backends/pooled
+        'ENGINE': 'core.db.backends.pooled',
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
-        'PORT': config('DB_PORT')
+        'PORT': config('DB_PORT'),
+        # Connections go back to the pool at the end of every request
+        'CONN_MAX_AGE': 0,
+        # Per process (each gunicorn/uvicorn/celery worker process has its own pool)
+        'POOL': {
+            'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=float),
+            'MAX_IDLE': config('DB_POOL_MAX_IDLE', default=300, cast=float),
+            'MAX_LIFETIME': config('DB_POOL_MAX_LIFETIME', default=3600, cast=float),
+            'HEALTH_CHECK_AFTER': config('DB_POOL_HEALTH_CHECK_AFTER', default=30, cast=float),
+        },
     }
 }
 
+# Read replicas, comma separated list of host or host:port
+# Replicas share the credentials and database name of the primary
+DATABASE_REPLICAS = []
+for index, replica in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    host, _, port = replica.partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Dedicated database for the JWT token tables (optional)
+# Defaults to the primary, set AUTH_TOKEN_DB_NAME to move them to their own database
+AUTH_TOKEN_DATABASE = 'default'
+if config('AUTH_TOKEN_DB_NAME', default=''):
+    AUTH_TOKEN_DATABASE = 'auth_tokens'
+    DATABASES[AUTH_TOKEN_DATABASE] = {
+        **DATABASES['default'],
+        'NAME': config('AUTH_TOKEN_DB_NAME'),
+        'HOST': config('AUTH_TOKEN_DB_HOST', default=DATABASES['default']['HOST']),
+        'PORT': config('AUTH_TOKEN_DB_PORT', default=DATABASES['default']['PORT']),
+    }
+
+DATABASE_ROUTERS = ['core.routers.AuthTokenRouter', 'core.routers.ReplicaRouter']
+
+# token_blacklist migrations without the database level foreign key to the user,
+# see authentication/token_blacklist_migrations
+MIGRATION_MODULES = {
+    'token_blacklist': 'authentication.token_blacklist_migrations',
+}
+
+# Replicas lagging behind the primary by more than this are not used
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=5, cast=float)
+REPLICA_LAG_CHECK_INTERVAL = config('REPLICA_LAG_CHECK_INTERVAL', default=2, cast=float)
+# How long a client reads from the primary after it wrote something
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 AUTH_USER_MODEL = 'authentication.User'
 PASSWORD_RESET_TIMEOUT = 86400
 
@@ -159,6 +214,22 @@ EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')
+# SMTP connections are kept open and reused by each (celery worker) process
+EMAIL_BACKEND = 'notifications.backends.PooledSMTPEmailBackend'
+EMAIL_POOL_SIZE = config('EMAIL_POOL_SIZE', default=4, cast=int)
+EMAIL_POOL_IDLE_TIMEOUT = config('EMAIL_POOL_IDLE_TIMEOUT', default=30, cast=float)
+EMAIL_POOL_MAX_MESSAGES = config('EMAIL_POOL_MAX_MESSAGES', default=100, cast=int)
+# Emails per second per worker process, 0 for no limit. Bulk mail is throttled below the
+# SMTP provider's limit so transactional mail always has room.
+EMAIL_RATE_LIMITS = {
+    'transactional': config('EMAIL_TRANSACTIONAL_RATE_LIMIT', default=0, cast=float),
+    'bulk': config('EMAIL_BULK_RATE_LIMIT', default=20, cast=float),
+}
+# Email tasks retry transient SMTP errors EMAIL_TASK_MAX_RETRIES times, waiting a random time
+# up to EMAIL_RETRY_BACKOFF * 2 ** retries seconds (at most EMAIL_RETRY_BACKOFF_MAX)
+EMAIL_TASK_MAX_RETRIES = config('EMAIL_TASK_MAX_RETRIES', default=5, cast=int)
+EMAIL_RETRY_BACKOFF = config('EMAIL_RETRY_BACKOFF', default=10, cast=int)
+EMAIL_RETRY_BACKOFF_MAX = config('EMAIL_RETRY_BACKOFF_MAX', default=600, cast=int)
 
 
 # JWT Authentication as the default authentication backend
@@ -180,7 +251,11 @@ REST_FRAMEWORK = {
         'anon':'100/day',
         'unrestricted': '1000/day',
         'restricted': '20/hour',
-        'limited': '5/day'
+        'limited': '5/day',
+        # Per keystroke of the search box
+        'autocomplete': '100/minute',
+        # Bulk availability of the event cards, on every page of the browse UI
+        'availability': '300/minute',
     }
 }
 
@@ -221,6 +296,21 @@ if (not os.path.exists(JWT_PRIVATE_KEY_PATH)) or (not os.path.exists(JWT_PUBLIC_
         pk.write(pem_public.decode())
     print("PRIVATE/PUBLIC keys generated!")
 
+# Ed25519 key signing the tickets, scanners verify them offline with the public key
+TICKET_SIGNING_KEY_PATH = os.path.join(AUTHORIZATION_DIR, "ticket_key")
+
+if not os.path.exists(TICKET_SIGNING_KEY_PATH):
+    if not os.path.exists(AUTHORIZATION_DIR):
+        os.makedirs(AUTHORIZATION_DIR)
+    ticket_key = ed25519.Ed25519PrivateKey.generate()
+    with open(TICKET_SIGNING_KEY_PATH, "w") as pk:
+        pk.write(ticket_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ).decode())
+    print("Ticket signing key generated!")
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(
@@ -256,6 +346,145 @@ SWAGGER_SETTINGS = {
 }
 
 # Celery
-CELERY_BROKER_URL = "redis://localhost:6379"
-CELERY_RESULT_BACKEND = "redis://localhost:6379"
-CELERY_RESULT_BACKEND = 'django-db'
\ No newline at end of file
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379')
+CELERY_RESULT_BACKEND = 'django-db'
+# Seconds to wait for the broker (and the availability Redis) to accept a connection. After
+# BROKER_CIRCUIT_THRESHOLD failures in a row a process stops trying for BROKER_CIRCUIT_COOLDOWN
+# seconds, messages wait in the outbox meanwhile.
+BROKER_CONNECT_TIMEOUT = config('BROKER_CONNECT_TIMEOUT', default=1, cast=float)
+BROKER_CIRCUIT_THRESHOLD = config('BROKER_CIRCUIT_THRESHOLD', default=3, cast=int)
+BROKER_CIRCUIT_COOLDOWN = config('BROKER_CIRCUIT_COOLDOWN', default=10, cast=float)
+CELERY_BROKER_CONNECTION_TIMEOUT = BROKER_CONNECT_TIMEOUT
+CELERY_BROKER_TRANSPORT_OPTIONS = {'socket_connect_timeout': BROKER_CONNECT_TIMEOUT}
+# Transactional mail (activation, ticket confirmation), bulk mail (broadcasts, reminders,
+# fan-outs) and background jobs go to their own queues, each served by its own workers
+# (see README), so a bulk send never delays activation emails.
+CELERY_TASK_QUEUES = (Queue('transactional'), Queue('bulk'), Queue('background'), Queue('webhooks'))
+CELERY_TASK_DEFAULT_QUEUE = 'background'
+CELERY_TASK_ROUTES = {
+    'notifications.tasks.send_email': {'queue': 'transactional'},
+    'notifications.tasks.send_templated_emails': {'queue': 'transactional'},
+    'notifications.tasks.relay_outbox_task': {'queue': 'transactional'},
+    'notifications.tasks.send_broadcast_task': {'queue': 'bulk'},
+    'notifications.tasks.send_event_reminders_task': {'queue': 'bulk'},
+    'notifications.tasks.flush_digests_task': {'queue': 'bulk'},
+    'notifications.tasks.notify_event_ticket_holders_task': {'queue': 'bulk'},
+    'events.tasks.archive_past_events_task': {'queue': 'background'},
+    # Slow organizer endpoints only hold up the webhook workers
+    'webhooks.tasks.deliver_webhooks_task': {'queue': 'webhooks'},
+    'webhooks.tasks.retry_webhooks_task': {'queue': 'webhooks'},
+}
+# Worker processes reserve one task at a time, so tasks aren't stuck behind a long task
+# prefetched by a busy process
+CELERY_WORKER_PREFETCH_MULTIPLIER = config('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1, cast=int)
+# Nothing reads the results of the tasks, don't write them to the result backend
+CELERY_TASK_IGNORE_RESULT = True
+# Seconds between two saves of the task metrics (notifications.metrics) of a worker process
+TASK_METRICS_FLUSH_INTERVAL = config('TASK_METRICS_FLUSH_INTERVAL', default=10, cast=float)
+CELERY_BEAT_SCHEDULE = {
+    'archive-past-events': {
+        'task': 'events.tasks.archive_past_events_task',
+        'schedule': timedelta(hours=1),
+    },
+    # Fallback for when no relay_outbox process is running
+    'relay-outbox': {
+        'task': 'notifications.tasks.relay_outbox_task',
+        'schedule': timedelta(seconds=10),
+    },
+    'send-event-reminders': {
+        'task': 'notifications.tasks.send_event_reminders_task',
+        'schedule': timedelta(minutes=config('EVENT_REMINDER_INTERVAL_MINUTES', default=5, cast=int)),
+    },
+    'retry-webhooks': {
+        'task': 'webhooks.tasks.retry_webhooks_task',
+        'schedule': timedelta(seconds=30),
+    },
+    'flush-digests': {
+        'task': 'notifications.tasks.flush_digests_task',
+        'schedule': timedelta(minutes=config('DIGEST_FLUSH_INTERVAL_MINUTES', default=15, cast=int)),
+    },
+}
+
+# Longest window of the event occurrence list
+EVENT_OCCURRENCE_MAX_WINDOW_DAYS = config('EVENT_OCCURRENCE_MAX_WINDOW_DAYS', default=366, cast=int)
+
+# Event calendar: longest range and how long counts are cached
+EVENT_CALENDAR_MAX_DAYS = config('EVENT_CALENDAR_MAX_DAYS', default=366, cast=int)
+EVENT_CALENDAR_CACHE_SECONDS = config('EVENT_CALENDAR_CACHE_SECONDS', default=60, cast=int)
+
+# Event list facets: values returned per facet and how long counts are cached
+EVENT_FACET_LIMIT = config('EVENT_FACET_LIMIT', default=20, cast=int)
+EVENT_FACET_CACHE_SECONDS = config('EVENT_FACET_CACHE_SECONDS', default=60, cast=int)
+
+# Event title autocomplete: default number of titles, how often every process reads the
+# events saved since its last pass and how often it rebuilds its index
+EVENT_AUTOCOMPLETE_LIMIT = config('EVENT_AUTOCOMPLETE_LIMIT', default=10, cast=int)
+EVENT_AUTOCOMPLETE_REFRESH_SECONDS = config('EVENT_AUTOCOMPLETE_REFRESH_SECONDS', default=5, cast=int)
+EVENT_AUTOCOMPLETE_REBUILD_SECONDS = config('EVENT_AUTOCOMPLETE_REBUILD_SECONDS', default=600, cast=int)
+
+# Event views: how often every web process saves its counts (at most that much is lost
+# when a process dies) and how many events it keeps counts of between two flushes
+EVENT_VIEW_FLUSH_INTERVAL = config('EVENT_VIEW_FLUSH_INTERVAL', default=5, cast=float)
+EVENT_VIEW_BUFFER_SIZE = config('EVENT_VIEW_BUFFER_SIZE', default=100000, cast=int)
+
+# Most ticket scans accepted by one check-in sync request
+TICKET_CHECK_IN_BATCH_SIZE = config('TICKET_CHECK_IN_BATCH_SIZE', default=5000, cast=int)
+
+# Live availability (SSE) of events
+# 'redis' (pub/sub on AVAILABILITY_REDIS_URL) or 'memory' (single process only)
+AVAILABILITY_BROKER = config('AVAILABILITY_BROKER', default='redis')
+AVAILABILITY_REDIS_URL = config('AVAILABILITY_REDIS_URL', default=CELERY_BROKER_URL)
+# At most one message per event per AVAILABILITY_COALESCE_MS
+AVAILABILITY_COALESCE_MS = config('AVAILABILITY_COALESCE_MS', default=250, cast=int)
+AVAILABILITY_HEARTBEAT_SECONDS = config('AVAILABILITY_HEARTBEAT_SECONDS', default=15, cast=int)
+
+# Bulk availability: most events per request and how long their snapshots are cached
+EVENT_AVAILABILITY_MAX_EVENTS = config('EVENT_AVAILABILITY_MAX_EVENTS', default=300, cast=int)
+EVENT_AVAILABILITY_CACHE_SECONDS = config('EVENT_AVAILABILITY_CACHE_SECONDS', default=30, cast=int)
+
+# Notifications
+# Number of users notified per transaction when notifying all ticket holders of an event
+NOTIFICATION_FANOUT_CHUNK_SIZE = config('NOTIFICATION_FANOUT_CHUNK_SIZE', default=1000, cast=int)
+# Outbox: messages published per batch, poll interval of relay_outbox and
+# how long published messages are kept
+OUTBOX_RELAY_BATCH_SIZE = config('OUTBOX_RELAY_BATCH_SIZE', default=500, cast=int)
+OUTBOX_RELAY_INTERVAL = config('OUTBOX_RELAY_INTERVAL', default=1, cast=float)
+OUTBOX_RETENTION_HOURS = config('OUTBOX_RETENTION_HOURS', default=24, cast=int)
+# Number of broadcast emails sent per SMTP connection
+BROADCAST_CHUNK_SIZE = config('BROADCAST_CHUNK_SIZE', default=500, cast=int)
+# A broadcast left sending without progress for this long (its worker died) can be claimed again,
+# it must be longer than sending a chunk takes
+BROADCAST_LEASE_SECONDS = config('BROADCAST_LEASE_SECONDS', default=900, cast=int)
+# Ticket holders are reminded of an event EVENT_REMINDER_WINDOWS hours before it starts,
+# EVENT_REMINDER_CHUNK_SIZE emails per SMTP connection
+EVENT_REMINDER_WINDOWS = config('EVENT_REMINDER_WINDOWS', default='24,1', cast=Csv(int))
+EVENT_REMINDER_CHUNK_SIZE = config('EVENT_REMINDER_CHUNK_SIZE', default=500, cast=int)
+# Number of users whose digest is sent per transaction
+DIGEST_CHUNK_SIZE = config('DIGEST_CHUNK_SIZE', default=500, cast=int)
+
+# Event Archival
+# Events which started more than EVENT_ARCHIVE_AFTER_DAYS ago are moved to the archive tables
+EVENT_ARCHIVE_AFTER_DAYS = config('EVENT_ARCHIVE_AFTER_DAYS', default=30, cast=int)
+# Number of events moved per transaction
+EVENT_ARCHIVE_BATCH_SIZE = config('EVENT_ARCHIVE_BATCH_SIZE', default=100, cast=int)
+# Number of tickets/feedbacks copied per insert
+EVENT_ARCHIVE_CHUNK_SIZE = config('EVENT_ARCHIVE_CHUNK_SIZE', default=2000, cast=int)
+
+# Webhooks
+# Endpoints delivered to at the same time by a worker process, and keep-alive connections
+# kept per receiver
+WEBHOOK_CONCURRENCY = config('WEBHOOK_CONCURRENCY', default=8, cast=int)
+WEBHOOK_CONNECTIONS_PER_HOST = config('WEBHOOK_CONNECTIONS_PER_HOST', default=2, cast=int)
+WEBHOOK_TIMEOUT = config('WEBHOOK_TIMEOUT', default=5, cast=float)
+# Failed deliveries are retried after a random time up to WEBHOOK_RETRY_BACKOFF * 2 ** attempts
+# seconds (at most WEBHOOK_RETRY_BACKOFF_MAX), WEBHOOK_MAX_ATTEMPTS attempts in total
+WEBHOOK_MAX_ATTEMPTS = config('WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+WEBHOOK_RETRY_BACKOFF = config('WEBHOOK_RETRY_BACKOFF', default=30, cast=int)
+WEBHOOK_RETRY_BACKOFF_MAX = config('WEBHOOK_RETRY_BACKOFF_MAX', default=3600, cast=int)
+# Nothing is sent to an endpoint for WEBHOOK_CIRCUIT_COOLDOWN seconds after
+# WEBHOOK_CIRCUIT_THRESHOLD failures in a row
+WEBHOOK_CIRCUIT_THRESHOLD = config('WEBHOOK_CIRCUIT_THRESHOLD', default=5, cast=int)
+WEBHOOK_CIRCUIT_COOLDOWN = config('WEBHOOK_CIRCUIT_COOLDOWN', default=300, cast=int)
+WEBHOOK_RETENTION_DAYS = config('WEBHOOK_RETENTION_DAYS', default=7, cast=int)
+# Allow receivers on private/loopback addresses (local development only)
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = config('WEBHOOK_ALLOW_PRIVATE_ADDRESSES', default=False, cast=bool)
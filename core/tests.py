@@ -0,0 +1,286 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from authentication.models import User
+from events.models import Event
+from events import views as event_views
+from notifications.models import TaskMetric
+
+from . import routers
+from .celery import app as celery_app
+from .circuit import CircuitBreaker
+from .db import pool as db_pool
+from .middleware import ReplicaRoutingMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_MAX_LAG_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        cache.clear()
+        routers._replica_lag_cache.clear()
+        patcher = mock.patch('core.routers.replica_lag', return_value=0)
+        self.replica_lag = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def route(self, request, view_class=event_views.EventsListCreateApiView, write=False):
+        """
+        Run request through the middleware and return the database a read inside the view is routed to.
+        """
+        routed = {}
+        view = view_class.as_view()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            if write:
+                router.db_for_write(Event)
+            routed['db'] = router.db_for_read(Event)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return routed['db'], response
+
+    def test_safe_request_reads_from_replica(self):
+        db, _ = self.route(self.factory.get('/events/'))
+        self.assertEqual(db, 'replica_1')
+
+    def test_view_without_opt_in_reads_from_primary(self):
+        db, _ = self.route(self.factory.get('/events/my-tickets/'), view_class=event_views.MyTicketView)
+        self.assertEqual(db, 'default')
+
+    def test_unsafe_request_reads_from_primary(self):
+        db, _ = self.route(self.factory.post('/events/'))
+        self.assertEqual(db, 'default')
+
+    def test_reads_after_a_write_use_primary(self):
+        db, _ = self.route(self.factory.get('/events/'), write=True)
+        self.assertEqual(db, 'default')
+
+    def test_write_pins_session_to_primary(self):
+        _, response = self.route(self.factory.post('/events/'), write=True)
+        cookie = response.cookies['primary_pin']
+
+        request = self.factory.get('/events/')
+        request.COOKIES['primary_pin'] = cookie.value
+        db, _ = self.route(request)
+        self.assertEqual(db, 'default')
+
+    def test_write_pins_token_client_to_primary(self):
+        self.route(self.factory.post('/events/', HTTP_AUTHORIZATION='Bearer token-1'), write=True)
+
+        db, _ = self.route(self.factory.get('/events/', HTTP_AUTHORIZATION='Bearer token-1'))
+        self.assertEqual(db, 'default')
+
+        db, _ = self.route(self.factory.get('/events/', HTTP_AUTHORIZATION='Bearer token-2'))
+        self.assertEqual(db, 'replica_1')
+
+    def test_lagging_replica_is_not_used(self):
+        self.replica_lag.return_value = 30
+        db, _ = self.route(self.factory.get('/events/'))
+        self.assertEqual(db, 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Event), 'default')
+
+
+@override_settings(AUTH_TOKEN_DATABASE='auth_tokens')
+class AuthTokenRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = routers.AuthTokenRouter()
+
+    def test_token_tables_are_routed_to_token_database(self):
+        self.assertEqual(self.router.db_for_read(OutstandingToken), 'auth_tokens')
+        self.assertEqual(self.router.db_for_write(OutstandingToken), 'auth_tokens')
+        self.assertIsNone(self.router.db_for_read(Event))
+
+    def test_user_of_a_token_is_read_from_primary(self):
+        token = OutstandingToken()
+        token._state.db = 'auth_tokens'
+        self.assertEqual(self.router.db_for_read(User, instance=token), 'default')
+
+    def test_token_can_reference_user_across_databases(self):
+        user = User()
+        user._state.db = 'default'
+        token = OutstandingToken()
+        token._state.db = 'auth_tokens'
+        self.assertTrue(self.router.allow_relation(token, user))
+
+    def test_migrations(self):
+        self.assertTrue(self.router.allow_migrate('auth_tokens', 'token_blacklist'))
+        self.assertFalse(self.router.allow_migrate('default', 'token_blacklist'))
+        self.assertFalse(self.router.allow_migrate('auth_tokens', 'events'))
+        self.assertIsNone(self.router.allow_migrate('default', 'events'))
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        def check(connection):
+            if connection.broken:
+                raise RuntimeError("connection lost")
+
+        return db_pool.ConnectionPool(connect=FakeConnection, check=check, **kwargs)
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(pool.stats()['connections_created'], 1)
+        self.assertEqual(pool.stats()['checkouts'], 2)
+
+    def test_checkout_times_out_when_pool_is_exhausted(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertEqual(pool.stats()['checked_out'], 1)
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.getconn()
+        threading.Timer(0.05, pool.putconn, args=(connection,)).start()
+        self.assertIs(pool.getconn(), connection)
+        self.assertGreater(pool.stats()['wait_time_max'], 0)
+
+    def test_broken_connection_is_replaced_on_checkout(self):
+        pool = self.make_pool(health_check_after=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.broken = True
+
+        with self.assertLogs('core.db.pool', level='WARNING'):
+            new_connection = pool.getconn()
+        self.assertIsNot(new_connection, connection)
+        self.assertTrue(connection.closed)
+        stats = pool.stats()
+        self.assertEqual(stats['health_check_failures'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_discarded_connection_frees_its_slot(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        connection = pool.getconn()
+        pool.putconn(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertEqual(pool.stats()['connections_closed'], 1)
+
+    def test_idle_connections_expire(self):
+        pool = self.make_pool(max_idle=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        time.sleep(0.01)
+        self.assertIsNot(pool.getconn(), connection)
+        self.assertTrue(connection.closed)
+
+
+class DatabasePoolStatsViewTests(APITestCase):
+
+    def setUp(self):
+        self.url = reverse('db-pool-stats')
+        self.admin = User.objects.create_superuser(
+            email='admin@gmail.com', username='admin123', first_name='Admin',
+            last_name='User', password='testpassword'
+        )
+        self.user = User.objects.create_user(
+            email='test@gmail.com', username='test_user', first_name='Test',
+            last_name='User', password='testpassword'
+        )
+
+    def test_admin_gets_pool_stats(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data['payload']['pools']['default']
+        self.assertGreaterEqual(stats['checked_out'], 1)
+        self.assertIn('wait_time_max', stats)
+
+    def test_non_admin_is_forbidden(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_admin_gets_task_metrics(self):
+        TaskMetric.objects.create(task_name='notifications.tasks.send_email', name='attempts', value=3)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('task-metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload']['tasks'], {'notifications.tasks.send_email': {'attempts': 3}})
+        self.assertEqual(response.data['payload']['dead_letters'], 0)
+
+
+class CeleryRoutingTests(SimpleTestCase):
+
+    def queue(self, task_name):
+        return celery_app.amqp.router.route({}, task_name)['queue'].name
+
+    def test_transactional_mail_has_its_own_queue(self):
+        self.assertEqual(self.queue('notifications.tasks.send_email'), 'transactional')
+        self.assertEqual(self.queue('notifications.tasks.send_templated_emails'), 'transactional')
+
+    def test_bulk_mail_is_routed_to_bulk_queue(self):
+        self.assertEqual(self.queue('notifications.tasks.send_broadcast_task'), 'bulk')
+        self.assertEqual(self.queue('notifications.tasks.send_event_reminders_task'), 'bulk')
+
+    def test_other_tasks_run_in_background(self):
+        self.assertEqual(self.queue('events.tasks.archive_past_events_task'), 'background')
+        self.assertEqual(self.queue('some.unrouted.task'), 'background')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def test_opens_after_threshold_failures(self):
+        circuit = CircuitBreaker(threshold=2, cooldown=60)
+        circuit.record_failure()
+        self.assertTrue(circuit.allow())
+        circuit.record_failure()
+        self.assertTrue(circuit.is_open)
+        self.assertFalse(circuit.allow())
+
+    def test_single_probe_after_cooldown(self):
+        circuit = CircuitBreaker(threshold=1, cooldown=60)
+        circuit.record_failure()
+        circuit.open_until = time.monotonic() - 1
+
+        self.assertTrue(circuit.allow())
+        # Only one caller probes the service
+        self.assertFalse(circuit.allow())
+        circuit.record_success()
+        self.assertFalse(circuit.is_open)
+        self.assertTrue(circuit.allow())
+
+    def test_failed_probe_opens_circuit_again(self):
+        circuit = CircuitBreaker(threshold=3, cooldown=60)
+        for _ in range(3):
+            circuit.record_failure()
+        circuit.open_until = time.monotonic() - 1
+
+        self.assertTrue(circuit.allow())
+        circuit.record_failure()
+        self.assertFalse(circuit.allow())
@@ -21,6 +21,8 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from . import views as core_views
+
 schema_view = get_schema_view(
     openapi.Info(
             title="Event Management API",
@@ -38,6 +40,10 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('authentication/', include('authentication.urls')),
     path('events/', include('events.urls')),
+    path('notifications/', include('notifications.urls')),
+    path('webhooks/', include('webhooks.urls')),
+    path('internal/db-pool/', core_views.DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('internal/task-metrics/', core_views.TaskMetricsView.as_view(), name='task-metrics'),
 
     # Documentation
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -0,0 +1,42 @@
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+
+from core.db import pool as db_pool
+from notifications import metrics as task_metrics
+from notifications.models import DeadLetter
+
+
+class DatabasePoolStatsView(APIView):
+    """
+    Connection pool metrics of the process serving the request.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        pools = {key[0]: pool.stats() for key, pool in db_pool.all_pools().items()}
+        return Response({
+            "status": "success",
+            "message": "Connection pool stats successfully retrieved.",
+            "payload": {
+                "pools": pools,
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class TaskMetricsView(APIView):
+    """
+    Celery task metrics saved by the workers, and the number of dead letters waiting for a replay.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "status": "success",
+            "message": "Task metrics successfully retrieved.",
+            "payload": {
+                "tasks": task_metrics.get_metrics(),
+                "dead_letters": DeadLetter.objects.filter(replayed_at__isnull=True).count(),
+            }
+        }, status=status.HTTP_200_OK)
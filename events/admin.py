@@ -1,6 +1,10 @@
 from django.contrib import admin
-from .models import Ticket, Event, EventFeedback
+from .models import Ticket, Event, EventSeries, EventFeedback, ArchivedEvent, ArchivedTicket, ArchivedEventFeedback
 # Register your models here.
 admin.site.register(Ticket)
 admin.site.register(Event)
-admin.site.register(EventFeedback)
\ No newline at end of file
+admin.site.register(EventSeries)
+admin.site.register(EventFeedback)
+admin.site.register(ArchivedEvent)
+admin.site.register(ArchivedTicket)
+admin.site.register(ArchivedEventFeedback)
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    Event, Ticket, TicketCheckIn, EventFeedback,
+    ArchivedEvent, ArchivedTicket, ArchivedEventFeedback
+)
+
+
+HOT_TABLES = (Event, Ticket, EventFeedback)
+
+
+def _copy_in_chunks(queryset, fields, archive_model, chunk_size):
+    """
+    Stream the rows of queryset and bulk insert their archive copies chunk by chunk,
+    so an event with a huge number of tickets never has to be loaded into memory.
+    """
+    chunk = []
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        chunk.append(archive_model(**dict(zip(fields, row))))
+        if len(chunk) >= chunk_size:
+            archive_model.objects.bulk_create(chunk, ignore_conflicts=True)
+            chunk = []
+    if chunk:
+        archive_model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move one batch of events which started before cutoff, along with their tickets
+    and feedbacks, into the archive tables. Returns the number of archived events.
+    """
+    chunk_size = settings.EVENT_ARCHIVE_CHUNK_SIZE
+
+    with transaction.atomic():
+        # skip_locked lets several workers archive concurrently without waiting on each other
+        events = list(
+            Event.objects.select_for_update(skip_locked=True)
+            .filter(start_time__lt=cutoff)
+            .order_by('start_time')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        event_ids = [event.id for event in events]
+        ArchivedEvent.objects.bulk_create([
+            ArchivedEvent(
+                id=event.id,
+                title=event.title,
+                description=event.description,
+                location=event.location,
+                start_time=event.start_time,
+                slug=event.slug,
+                created_by_id=event.created_by_id,
+                no_of_participants=event.no_of_participants,
+                created_at=event.created_at,
+                updated_at=event.updated_at,
+            ) for event in events
+        ], ignore_conflicts=True)
+
+        _copy_in_chunks(
+            Ticket.objects.filter(event_id__in=event_ids).order_by(),
+            ('id', 'user_id', 'event_id', 'pruchase_time'),
+            ArchivedTicket, chunk_size
+        )
+        _copy_in_chunks(
+            EventFeedback.objects.filter(event_id__in=event_ids).order_by(),
+            ('id', 'user_id', 'event_id', 'feedback'),
+            ArchivedEventFeedback, chunk_size
+        )
+
+        # Delete children explicitly, filtered on event_id, instead of relying on the
+        # cascade collector which would load every ticket into memory first. Check-ins
+        # aren't archived, they only matter at the door.
+        TicketCheckIn.objects.filter(event_id__in=event_ids).delete()
+        Ticket.objects.filter(event_id__in=event_ids).delete()
+        EventFeedback.objects.filter(event_id__in=event_ids).delete()
+        Event.objects.filter(id__in=event_ids).delete()
+
+    return len(events)
+
+
+def archive_past_events(older_than=None, batch_size=None, max_batches=None):
+    """
+    Archive every event whose start_time is older than older_than in bounded batches.
+    Returns the total number of archived events.
+    """
+    if older_than is None:
+        older_than = timedelta(days=settings.EVENT_ARCHIVE_AFTER_DAYS)
+    if batch_size is None:
+        batch_size = settings.EVENT_ARCHIVE_BATCH_SIZE
+
+    cutoff = timezone.now() - older_than
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        archived = archive_batch(cutoff=cutoff, batch_size=batch_size)
+        if not archived:
+            break
+        total += archived
+        batches += 1
+    return total
+
+
+def hot_table_sizes():
+    """
+    Return the total on-disk size (table + indexes + toast) in bytes of every hot table.
+    """
+    sizes = {}
+    with connection.cursor() as cursor:
+        for model in HOT_TABLES:
+            table = model._meta.db_table
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            sizes[table] = cursor.fetchone()[0]
+    return sizes
@@ -0,0 +1,254 @@
+"""
+Async (ASGI native) versions of the hot read endpoints: event list, event detail,
+feedback list and my tickets, and the live availability stream of an event.
+
+They are plain Django async views using the async ORM, the async cache API (throttling)
+and async JWT authentication, so under uvicorn a request doesn't hold a worker thread.
+Payloads are the same as the ones of the DRF views in events/views.py.
+"""
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from authentication.authentication import aauthenticate
+from . import availability
+from . import series as event_series
+from .filters import EventFilterSet
+from .models import Event, Ticket, EventFeedback
+from . import serializers as event_serialziers
+from . import throttles as event_throttles
+from . import view_counts
+
+
+def api_response(message, payload=None, status_code=status.HTTP_200_OK, response_status="success"):
+    return JsonResponse({
+        "status": response_status,
+        "message": message,
+        "payload": payload if payload is not None else {},
+    }, status=status_code, encoder=JSONEncoder)
+
+
+def error_message(exception):
+    detail = exception.detail
+    if isinstance(detail, dict):
+        detail = detail.get('detail', exception.default_detail)
+    return str(detail)
+
+
+class AsyncAPIView(View):
+    """
+    Authenticates and throttles the request before calling the async handler.
+    """
+    use_read_replica = True
+    login_required = False
+    throttle_classes = [event_throttles.AsyncUnrestrictedThrottle]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await aauthenticate(request)
+        except APIException as e:
+            return api_response(error_message(e), status_code=status.HTTP_401_UNAUTHORIZED, response_status="error")
+
+        if self.login_required and not request.user.is_authenticated:
+            return api_response(
+                "Authentication credentials were not provided.",
+                status_code=status.HTTP_401_UNAUTHORIZED, response_status="error"
+            )
+
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not await throttle.aallow_request(request, self):
+                wait = throttle.wait()
+                response = api_response(
+                    "Request was throttled.", status_code=status.HTTP_429_TOO_MANY_REQUESTS, response_status="error"
+                )
+                if wait is not None:
+                    response['Retry-After'] = str(math.ceil(wait))
+                return response
+
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncEventListView(AsyncAPIView):
+    search_param = 'search'
+    ordering_param = 'ordering'
+    ordering_fields = ["created_at", "updated_at", "id", "start_time", "view_count"]
+    ordering = ["-created_at"]
+    page_size = 10
+
+    async def get(self, request, *args, **kwargs):
+        filterset = EventFilterSet(request.GET, queryset=Event.objects.select_related('created_by'))
+        if not filterset.is_valid():
+            return api_response(
+                "Please correct the following errors.", {"errors": filterset.errors},
+                status_code=status.HTTP_400_BAD_REQUEST, response_status="error"
+            )
+        queryset = self.order(self.search(filterset.qs, request), request)
+
+        count = await queryset.acount()
+        num_pages = max(math.ceil(count / self.page_size), 1)
+        page = request.GET.get('page', 1)
+        try:
+            page = num_pages if page == 'last' else int(page)
+        except ValueError:
+            page = 0
+        if not 1 <= page <= num_pages:
+            return api_response("Invalid page.", status_code=status.HTTP_404_NOT_FOUND, response_status="error")
+
+        offset = (page - 1) * self.page_size
+        events = [event async for event in queryset[offset:offset + self.page_size]]
+        serializer = event_serialziers.EventSerializer(events, many=True, context={'request': request})
+
+        return api_response("Events successfully retrieved.", {
+            'events': serializer.data,
+            'pagination': {
+                'count': count,
+                'next': self.page_link(request, page + 1) if page < num_pages else None,
+                'previous': self.page_link(request, page - 1) if page > 1 else None,
+            },
+        })
+
+    def search(self, queryset, request):
+        terms = request.GET.get(self.search_param, '').replace(',', ' ').split()
+        for term in terms:
+            queryset = queryset.filter(title__icontains=term)
+        return queryset
+
+    def order(self, queryset, request):
+        fields = [
+            field.strip() for field in request.GET.get(self.ordering_param, '').split(',')
+            if field.strip().lstrip('-') in self.ordering_fields
+        ]
+        return queryset.order_by(*(fields or self.ordering))
+
+    def page_link(self, request, page):
+        url = request.build_absolute_uri()
+        if page == 1:
+            return remove_query_param(url, 'page')
+        return replace_query_param(url, 'page', page)
+
+
+class AsyncEventRetrieveView(AsyncAPIView):
+
+    async def get(self, request, slug, *args, **kwargs):
+        event = await Event.objects.select_related('created_by').filter(slug=slug).afirst()
+        if not event:
+            # An occurrence of a series which has no ticket sold yet
+            event = await sync_to_async(event_series.get_occurrence)(slug)
+        if not event:
+            return api_response("No Event matches the given query.", status_code=status.HTTP_404_NOT_FOUND, response_status="error")
+        if event.pk is not None:
+            view_counts.incr(event.pk)
+
+        booked = False
+        if request.user.is_authenticated and event.pk is not None:
+            booked = await Ticket.objects.filter(user=request.user, event=event).aexists()
+
+        serializer = event_serialziers.EventSerializer(event, context={'request': request})
+        return api_response("Event Details Retrieved", {
+            "booked": booked,
+            "event": serializer.data
+        })
+
+
+class AsyncEventFeedbackListView(AsyncAPIView):
+
+    async def get(self, request, slug, *args, **kwargs):
+        event = await Event.objects.filter(slug=slug).afirst()
+        if not event:
+            return api_response("Invalid slug field.", status_code=status.HTTP_400_BAD_REQUEST, response_status="error")
+
+        feedbacks = [feedback async for feedback in EventFeedback.objects.filter(event=event)]
+        serializer = event_serialziers.EventFeedbackSerializer(feedbacks, many=True)
+        return api_response("Feedbacks retrieved successfully.", {
+            "feedbacks": serializer.data
+        })
+
+
+class AsyncMyTicketView(AsyncAPIView):
+    use_read_replica = False
+    login_required = True
+
+    async def get(self, request, *args, **kwargs):
+        queryset = Ticket.objects.filter(user=request.user).select_related('user', 'event', 'event__created_by')
+        tickets = [ticket async for ticket in queryset]
+        serializer = event_serialziers.TicketSerializer(tickets, many=True)
+        return api_response("Tickets retrieved successfully!", {
+            'tickets': serializer.data
+        })
+
+
+class EventAvailabilityStreamView(AsyncAPIView):
+    """
+    Server-Sent Events stream of the availability of an event: the current availability
+    when connecting, then every change (see events/availability.py).
+    """
+    use_read_replica = False
+
+    async def get(self, request, slug, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return api_response(
+                "Availability streaming needs the ASGI server (core.asgi).",
+                status_code=status.HTTP_501_NOT_IMPLEMENTED, response_status="error"
+            )
+
+        event_id = await sync_to_async(self.event_id)(slug)
+        if not event_id:
+            return api_response("No Event matches the given query.", status_code=status.HTTP_404_NOT_FOUND, response_status="error")
+
+        response = StreamingHttpResponse(self.stream(event_id, slug), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def release_connection():
+        # The connection of the request is only closed when the stream ends, an idle
+        # subscriber must not keep it out of the pool (a test's transaction is kept)
+        for conn in connections.all(initialized_only=True):
+            if not conn.in_atomic_block:
+                conn.close()
+
+    def event_id(self, slug):
+        try:
+            return Event.objects.filter(slug=slug).values_list('id', flat=True).first()
+        finally:
+            self.release_connection()
+
+    def current_snapshot(self, event_id):
+        try:
+            return availability.get_snapshots(ids=[event_id])[1].get(event_id)
+        finally:
+            self.release_connection()
+
+    async def stream(self, event_id, slug):
+        hub = availability.get_hub()
+        # Subscribe before reading the current availability so no change is missed
+        subscriber = hub.subscribe(event_id)
+        try:
+            snapshot = await sync_to_async(self.current_snapshot)(event_id)
+            if snapshot is None:
+                return
+            yield self.message({'event': slug, **snapshot})
+
+            while True:
+                data = await subscriber.get(timeout=settings.AVAILABILITY_HEARTBEAT_SECONDS)
+                # Comments keep proxies from closing idle connections
+                yield self.message(data) if data is not None else ': heartbeat\n\n'
+        finally:
+            hub.unsubscribe(event_id, subscriber)
+
+    @staticmethod
+    def message(data):
+        return f'event: availability\ndata: {json.dumps(data)}\n\n'
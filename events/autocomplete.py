@@ -0,0 +1,191 @@
+"""
+Type-ahead of the titles of upcoming events, served from memory.
+
+Every process keeps the upcoming events in a sorted list with one (text, start_time, id,
+slug, title) entry per word of their title, the text being the title from that word on, so
+"summer jazz night" is found by "sum", "jazz n" and "night". The titles starting with a
+prefix are a bisected slice of the list, and a lookup never touches the database.
+
+The list is built on the first lookup of the process. A thread then reads the events saved
+since its last pass every EVENT_AUTOCOMPLETE_REFRESH_SECONDS (one query on updated_at) and
+rebuilds the list every EVENT_AUTOCOMPLETE_REBUILD_SECONDS, which drops the events deleted by
+other processes and the ones that started. Saves and deletes made by this process are
+applied as soon as they are committed. Updates copy the list and swap it, so lookups never
+wait for them.
+"""
+import bisect
+import heapq
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import Event
+
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r'\w+')
+
+# Past this many changed entries, the list is sorted again instead of updated in place
+RESORT_THRESHOLD = 1000
+# Results of prefixes up to this long, which match a large part of the list, are kept
+MEMO_PREFIX_LENGTH = 2
+MEMO_SIZE = 10000
+
+
+def normalize(text):
+    return ' '.join(WORD.findall(text.casefold()))
+
+
+def event_entries(event_id, title, slug, start_time):
+    words = WORD.findall(title.casefold())
+    return [(' '.join(words[i:]), start_time, event_id, slug, title) for i in range(len(words))]
+
+
+class TitleIndex:
+
+    def __init__(self):
+        self.entries = []
+        # Entries of each event, only used by updates (under the lock)
+        self.events = {}
+        # (prefix, limit): (entries, results) of short prefixes
+        self.memo = {}
+        self.lock = threading.Lock()
+        self.rebuilt_at = None
+        self.refreshed_from = None
+
+    def rebuild(self):
+        started = timezone.now()
+        rows = Event.objects.filter(start_time__gte=started).values_list('id', 'title', 'slug', 'start_time')
+        events = {row[0]: event_entries(*row) for row in rows.iterator()}
+        entries = sorted(itertools.chain.from_iterable(events.values()))
+        with self.lock:
+            self.events, self.entries = events, entries
+            self.rebuilt_at = time.monotonic()
+            self.refreshed_from = started
+
+    def update(self, saved=(), deleted=()):
+        """
+        Apply saved, (id, title, slug, start_time) rows of events, and the deleted event ids.
+        """
+        now = timezone.now()
+        with self.lock:
+            removed, added = [], []
+            for event_id in deleted:
+                removed.extend(self.events.pop(event_id, ()))
+            for row in saved:
+                new = event_entries(*row) if row[3] >= now else []
+                old = self.events.get(row[0], [])
+                if new == old:
+                    continue
+                removed.extend(old)
+                added.extend(new)
+                if new:
+                    self.events[row[0]] = new
+                else:
+                    del self.events[row[0]]
+            if not removed and not added:
+                return
+
+            if len(removed) + len(added) > RESORT_THRESHOLD:
+                removed = set(removed)
+                entries = sorted([entry for entry in self.entries if entry not in removed] + added)
+            else:
+                # A copy, lookups keep reading the current list
+                entries = list(self.entries)
+                for entry in removed:
+                    del entries[bisect.bisect_left(entries, entry)]
+                for entry in added:
+                    bisect.insort(entries, entry)
+            self.entries = entries
+
+    def refresh(self):
+        if self.rebuilt_at is None or time.monotonic() - self.rebuilt_at >= settings.EVENT_AUTOCOMPLETE_REBUILD_SECONDS:
+            self.rebuild()
+            return
+        started = timezone.now()
+        # Overlaps the previous pass, for the transactions committed after it read
+        since = self.refreshed_from - timedelta(seconds=settings.EVENT_AUTOCOMPLETE_REFRESH_SECONDS)
+        self.update(saved=list(
+            Event.objects.filter(updated_at__gte=since).values_list('id', 'title', 'slug', 'start_time')
+        ))
+        self.refreshed_from = started
+
+    def search(self, prefix, limit):
+        """
+        Return the limit soonest upcoming events with a title word starting with prefix.
+        """
+        key = normalize(prefix)
+        if not key:
+            return []
+        entries = self.entries
+        memo_key = (key, limit)
+        memoized = self.memo.get(memo_key) if len(key) <= MEMO_PREFIX_LENGTH else None
+        now = timezone.now()
+        # Still right while the list is the same and none of the results started
+        if memoized and memoized[0] is entries and (not memoized[1] or memoized[1][0]['start_time'] >= now):
+            return memoized[1]
+
+        matches = entries[bisect.bisect_left(entries, (key,)):bisect.bisect_left(entries, (key + '\U0010ffff',))]
+        # An event is matched once per word starting with prefix
+        upcoming = {entry[2]: entry for entry in matches if entry[1] >= now}
+        results = [
+            {'title': title, 'slug': slug, 'start_time': start_time}
+            for _, start_time, _, slug, title in heapq.nsmallest(limit, upcoming.values(), key=itemgetter(1, 2))
+        ]
+        if len(key) <= MEMO_PREFIX_LENGTH:
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo = {}
+            self.memo[memo_key] = (entries, results)
+        return results
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+
+
+def _refresh_forever(index):
+    while _index is index:
+        time.sleep(settings.EVENT_AUTOCOMPLETE_REFRESH_SECONDS)
+        try:
+            index.refresh()
+        except Exception:
+            logger.exception("Refreshing the event autocomplete failed")
+        finally:
+            connections.close_all()
+
+
+def get_index():
+    """
+    Return the index of this process, built (and its refresh thread started) on first use.
+    """
+    global _index, _index_pid
+    with _index_lock:
+        if _index is None or _index_pid != os.getpid():
+            index = TitleIndex()
+            index.rebuild()
+            _index, _index_pid = index, os.getpid()
+            if settings.EVENT_AUTOCOMPLETE_REFRESH_SECONDS:
+                threading.Thread(target=_refresh_forever, args=(index,), daemon=True).start()
+        return _index
+
+
+def event_saved(event_id, title, slug, start_time):
+    # Only an index already built by this process is updated
+    if _index is not None and _index_pid == os.getpid():
+        _index.update(saved=[(event_id, title, slug, start_time)])
+
+
+def event_deleted(event_id):
+    if _index is not None and _index_pid == os.getpid():
+        _index.update(deleted=[event_id])
@@ -0,0 +1,285 @@
+"""
+Live seat availability of events, pushed to clients over Server-Sent Events.
+
+The ticket purchase path publishes the new availability of an event to a broker (Redis
+pub/sub, or an in-memory broker for tests and single process setups). Every ASGI process
+runs one AvailabilityHub per event loop: a single broker subscription fanned out to the
+process' SSE subscribers, with updates coalesced to at most one message per event every
+AVAILABILITY_COALESCE_MS. Subscribers only keep the latest update, so slow clients never
+queue messages and an idle subscriber costs one pending coroutine.
+
+The event cards of the browse pages read availabilities in bulk from a snapshot cache
+instead (get_snapshots): purchases and event changes write their new snapshot once
+committed, and entries expire after EVENT_AVAILABILITY_CACHE_SECONDS for the changes made
+elsewhere (other processes with a per-process cache, the admin).
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from core.circuit import CircuitBreaker
+from .models import Event
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'event-availability:'
+
+
+def snapshot(event):
+    return {
+        'no_of_participants': event.no_of_participants,
+        'capacity': event.capacity,
+        'sold_out': event.capacity is not None and event.no_of_participants >= event.capacity,
+    }
+
+
+def availability(event):
+    return {'event': event.slug, **snapshot(event)}
+
+
+def snapshot_keys(event):
+    return [f'events:availability:slug:{event.slug}', f'events:availability:id:{event.pk}']
+
+
+def cache_snapshot(event):
+    """
+    Write the availability of event to the snapshot cache, once its change is committed.
+    """
+    cache.set_many(dict.fromkeys(snapshot_keys(event), snapshot(event)), timeout=settings.EVENT_AVAILABILITY_CACHE_SECONDS)
+
+
+def forget_snapshot(event):
+    cache.delete_many(snapshot_keys(event))
+
+
+def get_snapshots(slugs=(), ids=()):
+    """
+    Return the availabilities of the events with slugs and ids as ({slug: snapshot},
+    {id: snapshot}), unknown events left out. The ones missing from the cache are read with
+    one query and cached, unknown events included.
+    """
+    requested = {f'events:availability:slug:{slug}': ('slug', slug) for slug in slugs}
+    requested.update({f'events:availability:id:{event_id}': ('id', event_id) for event_id in ids})
+    snapshots = cache.get_many(requested)
+
+    missing = [requested[key] for key in requested if key not in snapshots]
+    if missing:
+        missing_slugs = [value for kind, value in missing if kind == 'slug']
+        missing_ids = [value for kind, value in missing if kind == 'id']
+        events = Event.objects.filter(Q(slug__in=missing_slugs) | Q(id__in=missing_ids)).only(
+            'id', 'slug', 'no_of_participants', 'capacity'
+        )
+        # Unknown events are cached as {} so they don't reach the database every time either
+        found = {f'events:availability:{kind}:{value}': {} for kind, value in missing}
+        for event in events:
+            found.update(dict.fromkeys(snapshot_keys(event), snapshot(event)))
+        cache.set_many(found, timeout=settings.EVENT_AVAILABILITY_CACHE_SECONDS)
+        snapshots.update({key: found[key] for key in requested if key in found})
+
+    by_slug, by_id = {}, {}
+    for key, (kind, value) in requested.items():
+        if snapshots.get(key):
+            (by_slug if kind == 'slug' else by_id)[value] = snapshots[key]
+    return by_slug, by_id
+
+
+class InMemoryBroker:
+    """
+    Broker for a single process, delivers to the listeners of every event loop of the process.
+    """
+
+    def __init__(self):
+        self._listeners = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event_id, data):
+        with self._lock:
+            listeners = list(self._listeners)
+        for loop, queue in listeners:
+            loop.call_soon_threadsafe(queue.put_nowait, (event_id, data))
+
+    async def listen(self):
+        listener = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._listeners.add(listener)
+        try:
+            while True:
+                yield await listener[1].get()
+        finally:
+            with self._lock:
+                self._listeners.discard(listener)
+
+
+class RedisBroker:
+    """
+    Publishes with short timeouts, and not at all while Redis is known to be down, so an
+    outage doesn't slow down purchases.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self._client = None
+        self.circuit = CircuitBreaker(settings.BROKER_CIRCUIT_THRESHOLD, settings.BROKER_CIRCUIT_COOLDOWN)
+
+    def publish(self, event_id, data):
+        import redis
+
+        if not self.circuit.allow():
+            return
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self.url,
+                socket_connect_timeout=settings.BROKER_CONNECT_TIMEOUT,
+                socket_timeout=settings.BROKER_CONNECT_TIMEOUT,
+            )
+        try:
+            self._client.publish(f'{CHANNEL_PREFIX}{event_id}', json.dumps(data))
+        except Exception:
+            self.circuit.record_failure()
+            raise
+        self.circuit.record_success()
+
+    async def listen(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+            async for message in pubsub.listen():
+                channel = message['channel'].decode()
+                yield int(channel[len(CHANNEL_PREFIX):]), json.loads(message['data'])
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_brokers = {}
+
+
+def get_broker():
+    name = settings.AVAILABILITY_BROKER
+    if name not in _brokers:
+        if name == 'memory':
+            _brokers[name] = InMemoryBroker()
+        elif name == 'redis':
+            _brokers[name] = RedisBroker(settings.AVAILABILITY_REDIS_URL)
+        else:
+            raise ValueError(f"Unknown AVAILABILITY_BROKER {name!r}, use 'redis' or 'memory'.")
+    return _brokers[name]
+
+
+def publish_availability(event):
+    """
+    Publish the availability of event. Failures are logged, they must never fail a purchase.
+    """
+    try:
+        get_broker().publish(event.pk, availability(event))
+    except Exception:
+        logger.exception("Could not publish the availability of event %s.", event.pk)
+
+
+class Subscriber:
+    __slots__ = ('latest', 'ready')
+
+    def __init__(self):
+        self.latest = None
+        self.ready = asyncio.Event()
+
+    def push(self, data):
+        self.latest = data
+        self.ready.set()
+
+    async def get(self, timeout=None):
+        """
+        Return the latest update, or None if nothing was published within timeout seconds.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        return self.latest
+
+
+class AvailabilityHub:
+
+    def __init__(self, broker, coalesce_ms):
+        self.broker = broker
+        self.coalesce = coalesce_ms / 1000
+        self.loop = asyncio.get_running_loop()
+        self.subscribers = defaultdict(set)
+        # Events which had a message delivered in the current coalescing window,
+        # with the latest update received since (if any)
+        self.windows = set()
+        self.pending = {}
+        self.listener = None
+
+    def subscribe(self, event_id):
+        subscriber = Subscriber()
+        self.subscribers[event_id].add(subscriber)
+        if self.listener is None or self.listener.done():
+            self.listener = self.loop.create_task(self.listen())
+        return subscriber
+
+    def unsubscribe(self, event_id, subscriber):
+        subscribers = self.subscribers.get(event_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[event_id]
+        if not self.subscribers and self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    async def listen(self):
+        while True:
+            try:
+                async for event_id, data in self.broker.listen():
+                    self.dispatch(event_id, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Availability broker connection lost, reconnecting.")
+                await asyncio.sleep(1)
+
+    def dispatch(self, event_id, data):
+        if event_id not in self.subscribers:
+            return
+        if event_id in self.windows:
+            self.pending[event_id] = data
+            return
+
+        for subscriber in self.subscribers[event_id]:
+            subscriber.push(data)
+        self.windows.add(event_id)
+        self.loop.call_later(self.coalesce, self.close_window, event_id)
+
+    def close_window(self, event_id):
+        self.windows.discard(event_id)
+        data = self.pending.pop(event_id, None)
+        if data is not None:
+            self.dispatch(event_id, data)
+
+
+_hubs = {}
+
+
+def get_hub():
+    """
+    Return the hub of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        # Drop the hubs of closed loops (e.g. async_to_sync in tests)
+        for closed in [other for other in _hubs if other.is_closed()]:
+            del _hubs[closed]
+        hub = _hubs[loop] = AvailabilityHub(get_broker(), settings.AVAILABILITY_COALESCE_MS)
+    return hub
@@ -0,0 +1,67 @@
+"""
+Bulk check-in of the tickets scanned at the door.
+
+Scanners verify the signed tokens offline (events.signing) and sync the scanned ticket
+ids in batches. A batch is recorded with a single statement: the ids are joined with the
+tickets of the event (only its partition is read), inserted with ON CONFLICT DO NOTHING on
+the unique ticket index, and the rows which didn't make it in are reported as duplicates,
+with the time they were first checked in, or as invalid when the event has no such ticket.
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .models import Ticket, TicketCheckIn
+
+
+def check_in(event, scans, checked_in_by=None):
+    """
+    Record scans, a list of (ticket_id, scanned_at), for event. Return a dict with the
+    checked_in ticket ids, the duplicates (already checked in, or scanned twice in the batch)
+    as (ticket_id, checked_in_at) and the invalid ticket ids.
+    """
+    now = timezone.now()
+    first_scans, repeated = {}, []
+    for ticket_id, scanned_at in scans:
+        if ticket_id in first_scans:
+            repeated.append(ticket_id)
+            first_scans[ticket_id] = min(first_scans[ticket_id], scanned_at)
+        else:
+            first_scans[ticket_id] = scanned_at
+
+    check_in_table = TicketCheckIn._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH scans AS (
+                SELECT * FROM unnest(%s::bigint[], %s::timestamptz[]) AS s(ticket_id, scanned_at)
+            ), valid AS (
+                SELECT scans.ticket_id, scans.scanned_at FROM scans
+                JOIN {Ticket._meta.db_table} ticket ON ticket.id = scans.ticket_id AND ticket.event_id = %s
+            ), inserted AS (
+                INSERT INTO {check_in_table} (ticket_id, event_id, scanned_at, checked_in_at, checked_in_by_id)
+                SELECT ticket_id, %s, scanned_at, %s, %s FROM valid
+                ON CONFLICT (ticket_id) DO NOTHING
+                RETURNING ticket_id
+            )
+            SELECT valid.ticket_id, inserted.ticket_id IS NOT NULL, existing.checked_in_at
+            FROM valid
+            LEFT JOIN inserted ON inserted.ticket_id = valid.ticket_id
+            LEFT JOIN {check_in_table} existing ON existing.ticket_id = valid.ticket_id
+        """, [
+            list(first_scans), list(first_scans.values()),
+            event.id, event.id, now, checked_in_by.id if checked_in_by else None,
+        ])
+        rows = cursor.fetchall()
+
+    checked_in, duplicates, first_checked_in = [], [], {}
+    for ticket_id, was_inserted, checked_in_at in rows:
+        # No existing row for a new check-in, or one of a concurrent batch
+        first_checked_in[ticket_id] = checked_in_at or now
+        if was_inserted:
+            checked_in.append(ticket_id)
+        else:
+            duplicates.append((ticket_id, first_checked_in[ticket_id]))
+    duplicates.extend(
+        (ticket_id, first_checked_in[ticket_id]) for ticket_id in repeated if ticket_id in first_checked_in
+    )
+    invalid = [ticket_id for ticket_id in first_scans if ticket_id not in first_checked_in]
+    return {'checked_in': checked_in, 'duplicates': duplicates, 'invalid': invalid}
@@ -0,0 +1,116 @@
+"""
+Facet counts of the event browser.
+
+All the requested facets of a filtered event queryset are counted in one query: the
+filtered events are grouped by GROUPING SETS ((location), (organizer), ()), and the
+date buckets (today, this week, this month in the user's time zone) are FILTERed counts
+of the () grouping set. Counts are cached for EVENT_FACET_CACHE_SECONDS, keyed on the
+normalized filters and the current day.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from authentication.models import User
+
+
+FACETS = ('location', 'organizer', 'date')
+
+
+def date_buckets(tzinfo, now=None):
+    """
+    Return {bucket: (start, end)} of today, this week (from Monday) and this month in tzinfo.
+    """
+    today = timezone.localdate(now or timezone.now(), timezone=tzinfo)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1)
+
+    def at_midnight(day):
+        return datetime.combine(day, time.min, tzinfo=tzinfo)
+
+    return {
+        'today': (at_midnight(today), at_midnight(today + timedelta(days=1))),
+        'this_week': (at_midnight(week_start), at_midnight(week_start + timedelta(days=7))),
+        'this_month': (at_midnight(month_start), at_midnight(month_end)),
+    }
+
+
+def count_facets(queryset, facets, tzinfo, now=None):
+    """
+    Return the counts of facets (some of FACETS) of the events of queryset.
+    """
+    sql, params = queryset.order_by().values('location', 'created_by_id', 'start_time').query.sql_with_params()
+    # A column outside the requested facets is left out of the query
+    grouping_sets, columns = ['()'], []
+    for facet, grouping_set, column in [
+        ('location', '(e.location)', 'e.location'),
+        ('organizer', '(e.created_by_id, u.username)', 'u.username'),
+    ]:
+        if facet in facets:
+            grouping_sets.append(grouping_set)
+            columns.append(f'GROUPING({column}), {column}')
+        else:
+            columns.append('1, NULL')
+
+    buckets = date_buckets(tzinfo, now) if 'date' in facets else {}
+    bucket_params = []
+    for start, end in buckets.values():
+        columns.append('count(*) FILTER (WHERE e.start_time >= %s AND e.start_time < %s)')
+        bucket_params.extend([start, end])
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"""
+            SELECT count(*), {', '.join(columns)}
+            FROM ({sql}) e
+            LEFT JOIN {User._meta.db_table} u ON u.id = e.created_by_id
+            GROUP BY GROUPING SETS ({', '.join(grouping_sets)})
+        """, bucket_params + list(params))
+        rows = cursor.fetchall()
+
+    result = {}
+    locations, organizers = [], []
+    # GROUPING() is 0 for the rows grouped by that column
+    for count, location_aggregated, location, organizer_aggregated, username, *bucket_values in rows:
+        if not location_aggregated:
+            locations.append({'value': location, 'count': count})
+        elif not organizer_aggregated:
+            organizers.append({'value': username, 'count': count})
+        else:
+            result['total'] = count
+            if buckets:
+                result['date'] = dict(zip(buckets, bucket_values))
+
+    def top(values):
+        return sorted(values, key=lambda value: (-value['count'], value['value'] or ''))[:settings.EVENT_FACET_LIMIT]
+
+    if 'location' in facets:
+        result['location'] = top(locations)
+    if 'organizer' in facets:
+        result['organizer'] = top(organizers)
+    return result
+
+
+def cache_key(filters, facets, tzinfo):
+    """
+    Key of the facets of filters (query parameters, in any order) at the current day.
+    """
+    today = timezone.localdate(timezone=tzinfo)
+    normalized = '&'.join(
+        f'{name}={value}' for name, values in sorted(filters.lists()) for value in sorted(values)
+    )
+    raw = f'{normalized}|{",".join(sorted(facets))}|{tzinfo}|{today}'
+    return f'events:facets:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def get_facets(queryset, filters, facets, tzinfo):
+    key = cache_key(filters, facets, tzinfo)
+    result = cache.get(key)
+    if result is None:
+        result = count_facets(queryset, facets, tzinfo)
+        cache.set(key, result, timeout=settings.EVENT_FACET_CACHE_SECONDS)
+    return result
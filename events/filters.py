@@ -0,0 +1,17 @@
+from django_filters import rest_framework as filters
+
+from .models import Event
+
+
+class EventFilterSet(filters.FilterSet):
+    """
+    Filters of the event list, shared by the sync and the async event list views.
+    """
+
+    class Meta:
+        model = Event
+        fields = {
+            "start_time": ["gt", "lt", "gte", "lte", "date"],
+            "created_at": ["gt", "lt", "gte", "lte", "date"],
+            "updated_at": ["gt", "lt", "gte", "lte", "date"],
+        }
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.archive import archive_past_events, hot_table_sizes
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = "Move past events along with their tickets and feedbacks into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.EVENT_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.EVENT_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument(
+            '--report', action='store_true',
+            help="Print the hot table sizes and the event list query latency before and after archiving."
+        )
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self.report("Before")
+
+        archived = archive_past_events(
+            older_than=timedelta(days=options['older_than_days']),
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} events."))
+
+        if options['report']:
+            self.report("After")
+
+    def report(self, label):
+        self.stdout.write(f"{label}:")
+        for table, size in hot_table_sizes().items():
+            self.stdout.write(f"  {table}: {size / 1024:.1f} KiB")
+
+        # Same query as the first page of the event list endpoint
+        timings = []
+        for _ in range(10):
+            start = time.perf_counter()
+            list(Event.objects.select_related('created_by').order_by('-created_at')[:10])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        self.stdout.write(f"  event list query: p50 {timings[len(timings) // 2]:.2f} ms, max {timings[-1]:.2f} ms")
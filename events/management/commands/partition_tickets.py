@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from events import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the ticket table into a hash partitioned table without downtime: "
+        "copy the existing rows into the partitioned shadow table in batches and swap the tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partitions', type=int, default=partitioning.DEFAULT_PARTITIONS,
+                            help="Number of hash partitions, only used when the shadow table does not exist yet.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help="Seconds to sleep between batches to limit the load on the primary.")
+        parser.add_argument('--swap', action='store_true',
+                            help="Swap the tables once the backfill is complete.")
+        parser.add_argument('--drop-legacy', action='store_true',
+                            help="Drop events_ticket_legacy after the swap.")
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            if partitioning.is_partitioned(cursor):
+                self.stdout.write("The ticket table is already partitioned.")
+                if options['drop_legacy']:
+                    partitioning.drop_legacy_table(cursor)
+                    self.stdout.write(self.style.SUCCESS("Dropped the legacy ticket table."))
+                return
+
+            if not partitioning.table_exists(cursor, partitioning.SHADOW_TABLE):
+                with transaction.atomic():
+                    partitioning.create_shadow_table(cursor, partitions=options['partitions'])
+                self.stdout.write(f"Created {partitioning.SHADOW_TABLE} with {options['partitions']} partitions.")
+
+            last_id, copied = 0, 0
+            while True:
+                batch_last_id, count = partitioning.backfill(
+                    cursor, after_id=last_id, batch_size=options['batch_size']
+                )
+                if not count:
+                    break
+                last_id = batch_last_id
+                copied += count
+                self.stdout.write(f"Copied {copied} tickets (last id {last_id}).")
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+
+            if not options['swap']:
+                self.stdout.write("Backfill complete, run again with --swap to switch to the partitioned table.")
+                return
+
+            # The full comparison runs without blocking the ticket table (both counts come from
+            # the same snapshot, which the trigger keeps consistent), under the lock only the
+            # tickets added since are compared.
+            legacy_count, shadow_count, checked_id = partitioning.count_rows(cursor)
+            self.check_counts(legacy_count, shadow_count)
+            with transaction.atomic():
+                cursor.execute(f"LOCK TABLE {partitioning.TICKET_TABLE} IN ACCESS EXCLUSIVE MODE")
+                legacy_count, shadow_count, _ = partitioning.count_rows(cursor, after_id=checked_id)
+                self.check_counts(legacy_count, shadow_count)
+                partitioning.swap(cursor)
+            self.stdout.write(self.style.SUCCESS("The ticket table is now partitioned."))
+
+            if options['drop_legacy']:
+                partitioning.drop_legacy_table(cursor)
+                self.stdout.write(self.style.SUCCESS("Dropped the legacy ticket table."))
+
+    def check_counts(self, legacy_count, shadow_count):
+        if legacy_count != shadow_count:
+            raise CommandError(
+                f"Row counts differ ({legacy_count} != {shadow_count}), run the backfill again before swapping."
+            )
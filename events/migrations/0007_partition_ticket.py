@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from events import partitioning
+
+
+def partition_ticket_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        if partitioning.is_partitioned(cursor):
+            return
+        partitioning.create_shadow_table(cursor)
+
+        # Fresh databases are converted right away. Populated ones keep the shadow table
+        # in sync through the trigger until `manage.py partition_tickets` has copied
+        # the existing rows and swapped the tables.
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {partitioning.TICKET_TABLE})")
+        if not cursor.fetchone()[0]:
+            partitioning.swap(cursor)
+            partitioning.drop_legacy_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_archive_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_ticket_table),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_event_series'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -4,10 +4,44 @@ from django.utils.text import slugify
 from django.utils import timezone
 from datetime import timedelta
 
+from .choices import RecurrenceChoices
 
 User = get_user_model()
 
 # Create your models here.
+class EventSeries(models.Model):
+    """
+    A recurring event: an occurrence every interval days/weeks/months from first_start, up
+    to until or count occurrences. Occurrences are expanded on the fly (events.series) and
+    only saved as Event rows when their first ticket is sold.
+    """
+    # Occurrences are titled "<title> <YYYY-MM-DD>", which must fit Event.title
+    title = models.CharField(max_length=39, unique=True)
+    description = models.TextField()
+    location = models.CharField(max_length=255)
+    slug = models.SlugField(max_length=255, unique=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_series')
+
+    frequency = models.CharField(max_length=10, choices=RecurrenceChoices.choices, default=RecurrenceChoices.WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    first_start = models.DateTimeField()
+    until = models.DateTimeField(null=True, blank=True)
+    count = models.PositiveIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.title
+
+    def save(self, *args, **kwargs) -> None:
+        if not self.slug:
+            self.slug = slugify(self.title)
+        # Recurrence rules work in whole seconds
+        self.first_start = self.first_start.replace(microsecond=0)
+        super().save(*args, **kwargs)
+
+
 class Event(models.Model):
 
     def get_default_time():
@@ -16,15 +50,29 @@ class Event(models.Model):
     title = models.CharField(max_length=50, unique=True, db_index=True)
     description = models.TextField()
     location = models.CharField(max_length=255)
-    start_time = models.DateTimeField(default=get_default_time)
+    start_time = models.DateTimeField(default=get_default_time, db_index=True)
     slug = models.SlugField(max_length=255, unique=True, db_index=True)
 
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='events_created')
+    # Only written with F() updates by the ticket purchases
     no_of_participants = models.PositiveBigIntegerField(default=0)
+    # Most tickets sold, unlimited when null
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    # Only written by the flushes of events.view_counts
+    view_count = models.PositiveBigIntegerField(default=0)
+    # Set on the occurrences of a series, saved when their first ticket was sold
+    series = models.ForeignKey(EventSeries, on_delete=models.SET_NULL, null=True, blank=True, related_name='events')
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'start_time'], name='unique_series_occurrence')
+        ]
+
+    # Counters incremented in the database, never written back by save()
+    DATABASE_COUNTERS = ('no_of_participants', 'view_count')
 
     def __str__(self) -> str:
         return self.title
@@ -32,6 +80,12 @@ class Event(models.Model):
     def save(self, *args, **kwargs) -> None:
         if not self.slug:
             self.slug = slugify(self.title)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # The tickets sold and views counted since this instance was read would be overwritten
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DATABASE_COUNTERS
+            ]
         super().save(*args, **kwargs)
         
 
@@ -51,6 +105,21 @@ class Ticket(models.Model):
         return f'user_{self.user_id}_event_{self.event_id}'
     
 
+class TicketCheckIn(models.Model):
+    """
+    A ticket scanned at the door. The tickets table is partitioned with an (id, event_id)
+    primary key, so ticket is a plain column with a unique index and no database constraint.
+    """
+    ticket = models.OneToOneField(Ticket, on_delete=models.DO_NOTHING, db_constraint=False, related_name='check_in')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='check_ins')
+    scanned_at = models.DateTimeField()
+    checked_in_at = models.DateTimeField(auto_now_add=True)
+    checked_in_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ticket_check_ins')
+
+    def __str__(self) -> str:
+        return f'ticket_{self.ticket_id}_event_{self.event_id}'
+
+
 class EventFeedback(models.Model):
     user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='event_feedbacks')
     event = models.ForeignKey(to=Event, on_delete=models.CASCADE, related_name='feedbacks')
@@ -58,3 +127,44 @@ class EventFeedback(models.Model):
 
     def __str__(self) -> str:
         return f'user_{self.user_id}_event_{self.event_id}'
+
+
+# Archive tables - past events are moved here by events.archive so the hot tables
+# only hold upcoming and recently finished events.
+class ArchivedEvent(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=50, db_index=True)
+    description = models.TextField()
+    location = models.CharField(max_length=255)
+    start_time = models.DateTimeField(db_index=True)
+    slug = models.SlugField(max_length=255, db_index=True)
+
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_events')
+    no_of_participants = models.PositiveBigIntegerField(default=0)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class ArchivedTicket(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_tickets')
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='tickets_sold')
+    pruchase_time = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f'user_{self.user_id}_event_{self.event_id}'
+
+
+class ArchivedEventFeedback(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='archived_event_feedbacks')
+    event = models.ForeignKey(to=ArchivedEvent, on_delete=models.CASCADE, related_name='feedbacks')
+    feedback = models.TextField()
+
+    def __str__(self) -> str:
+        return f'user_{self.user_id}_event_{self.event_id}'
@@ -0,0 +1,174 @@
+"""
+Online conversion of events_ticket into a hash partitioned (by event_id) table.
+
+The conversion happens in three steps so it can run against a live database:
+
+1. create_shadow_table() creates events_ticket_partitioned with the same columns
+   and a trigger on events_ticket which mirrors every insert/update/delete into it.
+2. backfill() copies the existing rows in small keyset batches.
+3. swap() renames the tables in one short transaction, after that the ORM reads and
+   writes the partitioned table and the old one is left as events_ticket_legacy, without
+   its foreign keys.
+
+Postgres requires every unique constraint of a partitioned table to contain the
+partition key, so the primary key becomes (id, event_id). unique_event_user already
+contains event_id so it's enforced per partition without any change.
+"""
+
+TICKET_TABLE = 'events_ticket'
+SHADOW_TABLE = 'events_ticket_partitioned'
+LEGACY_TABLE = 'events_ticket_legacy'
+SHADOW_SEQUENCE = 'events_ticket_partitioned_id_seq'
+SYNC_TRIGGER = 'events_ticket_partition_sync'
+
+DEFAULT_PARTITIONS = 16
+
+# Index/constraint names Django created for the ticket table (see 0002 migration)
+# as (django name, shadow name) pairs.
+INDEX_NAMES = (
+    ('events_ticket_pkey', 'events_ticket_partitioned_pkey'),
+    ('unique_event_user', 'events_ticket_partitioned_unique_event_user'),
+    ('events_ticket_event_id_a43e217d', 'events_ticket_partitioned_event_id'),
+    ('events_ticket_user_id_1e3922f7', 'events_ticket_partitioned_user_id'),
+)
+
+
+def is_partitioned(cursor, table=TICKET_TABLE):
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+        )
+    """, [table])
+    return cursor.fetchone()[0]
+
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [table])
+    return cursor.fetchone()[0]
+
+
+def create_shadow_table(cursor, partitions=DEFAULT_PARTITIONS):
+    """
+    Create the partitioned shadow table and the trigger that keeps it in sync.
+    """
+    cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SHADOW_SEQUENCE}")
+    cursor.execute(f"""
+        CREATE TABLE {SHADOW_TABLE} (
+            id bigint NOT NULL DEFAULT nextval('{SHADOW_SEQUENCE}'),
+            pruchase_time timestamp with time zone NOT NULL,
+            event_id bigint NOT NULL
+                REFERENCES events_event(id) DEFERRABLE INITIALLY DEFERRED,
+            user_id bigint NOT NULL
+                REFERENCES authentication_user(id) DEFERRABLE INITIALLY DEFERRED,
+            CONSTRAINT events_ticket_partitioned_pkey PRIMARY KEY (id, event_id),
+            CONSTRAINT events_ticket_partitioned_unique_event_user UNIQUE (user_id, event_id)
+        ) PARTITION BY HASH (event_id)
+    """)
+    for remainder in range(partitions):
+        cursor.execute(f"""
+            CREATE TABLE {SHADOW_TABLE}_p{remainder} PARTITION OF {SHADOW_TABLE}
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})
+        """)
+    cursor.execute(f"CREATE INDEX events_ticket_partitioned_event_id ON {SHADOW_TABLE} (event_id)")
+    cursor.execute(f"CREATE INDEX events_ticket_partitioned_user_id ON {SHADOW_TABLE} (user_id)")
+
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {SYNC_TRIGGER}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {SHADOW_TABLE} WHERE id = OLD.id AND event_id = OLD.event_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {SHADOW_TABLE} (id, pruchase_time, event_id, user_id)
+                VALUES (NEW.id, NEW.pruchase_time, NEW.event_id, NEW.user_id)
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER {SYNC_TRIGGER}
+        AFTER INSERT OR UPDATE OR DELETE ON {TICKET_TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {SYNC_TRIGGER}()
+    """)
+
+
+def backfill(cursor, after_id=0, batch_size=10000):
+    """
+    Copy the next batch of tickets with id > after_id into the shadow table.
+    Returns (last copied id, number of rows read), last id is None when there is nothing left.
+    """
+    cursor.execute(f"""
+        WITH batch AS (
+            SELECT id, pruchase_time, event_id, user_id FROM {TICKET_TABLE}
+            WHERE id > %s ORDER BY id LIMIT %s
+        ), copied AS (
+            INSERT INTO {SHADOW_TABLE} (id, pruchase_time, event_id, user_id)
+            SELECT id, pruchase_time, event_id, user_id FROM batch
+            ON CONFLICT DO NOTHING
+        )
+        SELECT max(id), count(*) FROM batch
+    """, [after_id, batch_size])
+    return cursor.fetchone()
+
+
+def count_rows(cursor, after_id=0):
+    """
+    Return the number of tickets with id > after_id in the ticket and shadow tables (from
+    the same snapshot) and the largest ticket id.
+    """
+    cursor.execute(f"""
+        SELECT (SELECT count(*) FROM {TICKET_TABLE} WHERE id > %s),
+               (SELECT count(*) FROM {SHADOW_TABLE} WHERE id > %s),
+               (SELECT coalesce(max(id), 0) FROM {TICKET_TABLE})
+    """, [after_id, after_id])
+    return cursor.fetchone()
+
+
+def swap(cursor):
+    """
+    Make the shadow table the ticket table. Must run inside a transaction, it holds an
+    exclusive lock on the ticket table only for the duration of a few renames.
+    """
+    cursor.execute(f"LOCK TABLE {TICKET_TABLE} IN ACCESS EXCLUSIVE MODE")
+    cursor.execute(f"DROP TRIGGER {SYNC_TRIGGER} ON {TICKET_TABLE}")
+    cursor.execute(f"DROP FUNCTION {SYNC_TRIGGER}()")
+
+    # Continue numbering where the legacy identity sequence stopped
+    cursor.execute(f"SELECT pg_get_serial_sequence('{TICKET_TABLE}', 'id')")
+    legacy_sequence = cursor.fetchone()[0]
+    cursor.execute(f"""
+        SELECT setval('{SHADOW_SEQUENCE}', GREATEST(
+            (SELECT last_value FROM {legacy_sequence}),
+            (SELECT coalesce(max(id), 0) FROM {SHADOW_TABLE}),
+            1
+        ))
+    """)
+
+    cursor.execute(f"ALTER TABLE {TICKET_TABLE} RENAME TO {LEGACY_TABLE}")
+    # The legacy rows must not keep events and users from being deleted
+    cursor.execute(f"""
+        SELECT conname FROM pg_constraint
+        WHERE conrelid = '{LEGACY_TABLE}'::regclass AND contype = 'f'
+    """)
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT "{constraint}"')
+    for django_name, shadow_name in INDEX_NAMES:
+        cursor.execute(f"ALTER INDEX IF EXISTS {django_name} RENAME TO {django_name}_legacy")
+        cursor.execute(f"ALTER INDEX {shadow_name} RENAME TO {django_name}")
+    cursor.execute(f"""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = '{SHADOW_TABLE}'::regclass
+    """)
+    for (partition,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {partition} RENAME TO {partition.replace(SHADOW_TABLE, TICKET_TABLE, 1)}")
+    cursor.execute(f"ALTER TABLE {SHADOW_TABLE} RENAME TO {TICKET_TABLE}")
+    cursor.execute(f"ALTER SEQUENCE {SHADOW_SEQUENCE} OWNED BY {TICKET_TABLE}.id")
+
+
+def drop_legacy_table(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
@@ -1,7 +1,11 @@
 
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer, ValidationError
 
-from .models import Event, Ticket, EventFeedback
+from .models import Event, EventSeries, Ticket, EventFeedback, ArchivedEvent, ArchivedTicket, ArchivedEventFeedback
+from .signing import ticket_token
 
 from authentication.serializers import UserSerializer
 
@@ -20,7 +24,12 @@ class EventSerializer(ModelSerializer):
         model = Event
         fields = '__all__'
 
-        read_only_fields = ["slug", "created_by", "no_of_participants"]
+        read_only_fields = ["slug", "created_by", "no_of_participants", "view_count", "series"]
+
+    def validate_capacity(self, capacity):
+        if capacity is not None and self.instance is not None and capacity < self.instance.no_of_participants:
+            raise ValidationError(f"{self.instance.no_of_participants} tickets are already sold.")
+        return capacity
 
     def create(self, validated_data):
         request = self.context.get('request')
@@ -29,14 +38,56 @@ class EventSerializer(ModelSerializer):
         return super().create(validated_data)
 
 
+class EventSeriesSerializer(ModelSerializer):
+    created_by = UserSerializer(required=False, read_only=True)
+    interval = serializers.IntegerField(min_value=1, max_value=365, required=False)
+
+    class Meta:
+        model = EventSeries
+        fields = '__all__'
+
+        read_only_fields = ["slug", "created_by"]
+
+    def validate(self, attrs):
+        first_start = attrs.get('first_start', getattr(self.instance, 'first_start', None))
+        until = attrs.get('until', getattr(self.instance, 'until', None))
+        if until and first_start and until < first_start:
+            raise ValidationError({'until': "Must be after first_start."})
+        return attrs
+
+    def create(self, validated_data):
+        validated_data["created_by"] = self.context['request'].user
+        return super().create(validated_data)
+
+
 class TicketSerializer(ReadOnlyModelSerializer):
     user = UserSerializer()
     event = EventSerializer()
+    # Signed token shown as a QR code and verified offline at the door
+    token = serializers.SerializerMethodField()
     class Meta:
         model = Ticket
-        fields = ['user', 'event', 'pruchase_time']
+        fields = ['id', 'user', 'event', 'pruchase_time', 'token']
         read_only_field = ['user', 'event', 'purchase_time']
 
+    def get_token(self, ticket):
+        return ticket_token(ticket)
+
+
+class TicketScanSerializer(serializers.Serializer):
+    ticket_id = serializers.IntegerField(min_value=1, max_value=2**63 - 1)
+    scanned_at = serializers.DateTimeField(required=False)
+
+
+class TicketCheckInSerializer(serializers.Serializer):
+    scans = serializers.ListField(child=TicketScanSerializer(), allow_empty=False)
+
+    def validate_scans(self, value):
+        if len(value) > settings.TICKET_CHECK_IN_BATCH_SIZE:
+            raise ValidationError(f"At most {settings.TICKET_CHECK_IN_BATCH_SIZE} scans per request.")
+        now = timezone.now()
+        return [(scan['ticket_id'], scan.get('scanned_at') or now) for scan in value]
+
 
 class EventFeedbackSerializer(ModelSerializer):
 
@@ -46,3 +97,24 @@ class EventFeedbackSerializer(ModelSerializer):
 
         read_only_fields = ['user', 'event']
 
+
+class ArchivedEventSerializer(ReadOnlyModelSerializer):
+    created_by = UserSerializer()
+    class Meta:
+        model = ArchivedEvent
+        fields = '__all__'
+
+
+class ArchivedTicketSerializer(ReadOnlyModelSerializer):
+    user = UserSerializer()
+    event = ArchivedEventSerializer()
+    class Meta:
+        model = ArchivedTicket
+        fields = ['user', 'event', 'pruchase_time']
+
+
+class ArchivedEventFeedbackSerializer(ReadOnlyModelSerializer):
+
+    class Meta:
+        model = ArchivedEventFeedback
+        fields = '__all__'
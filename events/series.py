@@ -0,0 +1,219 @@
+"""
+Occurrences of recurring events (EventSeries).
+
+Occurrences aren't stored ahead of time: they are expanded from the recurrence rule of
+their series for the requested window, as unsaved Event instances. An occurrence's slug
+is "<series slug>-<YYYY-MM-DD>", the slug its Event row gets when the first ticket is sold
+and materialize() saves it, so links to an occurrence keep working once it is saved.
+Saved occurrences replace the expanded ones in listings.
+
+occurrence_page() pages over the saved events and the occurrences of every series in a
+window by (start_time, slug): each series is expanded lazily from the page's position and
+merged with the events, so a page costs four queries and at most a page of occurrences
+per series, whatever the length of the window.
+"""
+import heapq
+import itertools
+import re
+from datetime import datetime, time, timedelta
+
+from dateutil import rrule
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .choices import RecurrenceChoices
+from .models import Event, EventSeries, User
+
+
+FREQUENCIES = {
+    RecurrenceChoices.DAILY: rrule.DAILY,
+    RecurrenceChoices.WEEKLY: rrule.WEEKLY,
+    RecurrenceChoices.MONTHLY: rrule.MONTHLY,
+}
+
+OCCURRENCE_SLUG = re.compile(r'^(?P<series>.+)-(?P<date>\d{4}-\d{2}-\d{2})$')
+
+
+STEPS = {
+    RecurrenceChoices.DAILY: timedelta(days=1),
+    RecurrenceChoices.WEEKLY: timedelta(weeks=1),
+}
+
+
+def get_rule(series, after=None):
+    """
+    Return the recurrence rule of series. With after, the rule starts at an occurrence
+    shortly before it instead of first_start, so a long running series isn't iterated from
+    its beginning: the occurrences from after on are the same.
+    """
+    dtstart, count, extra = series.first_start, series.count, {}
+    if series.frequency == RecurrenceChoices.MONTHLY:
+        # Months without that day are skipped, like a rule starting at first_start
+        extra['bymonthday'] = dtstart.day
+
+    if after is not None and after > dtstart:
+        if series.frequency in STEPS:
+            step = STEPS[series.frequency] * series.interval
+            # One step back, datetimes add up in wall clock time
+            skipped = max((after - dtstart) // step - 1, 0)
+            dtstart += step * skipped
+        elif dtstart.day <= 28 or count is None:
+            months = (after.year - dtstart.year) * 12 + after.month - dtstart.month
+            skipped = max(months // series.interval - 1, 0)
+            month_index = dtstart.month - 1 + skipped * series.interval
+            dtstart = dtstart.replace(
+                year=dtstart.year + month_index // 12, month=month_index % 12 + 1, day=min(dtstart.day, 28)
+            )
+        else:
+            skipped = 0
+        if count is not None:
+            count = max(count - skipped, 0)
+            if not count:
+                return None
+
+    return rrule.rrule(
+        FREQUENCIES[series.frequency],
+        interval=series.interval,
+        dtstart=dtstart,
+        until=series.until,
+        count=count,
+        **extra,
+    )
+
+
+def occurrence_slug(series, start_time):
+    return f'{series.slug}-{timezone.localdate(start_time).isoformat()}'
+
+
+def build_occurrence(series, start_time):
+    """
+    Return the unsaved Event of the occurrence of series at start_time.
+    """
+    return Event(
+        title=f'{series.title} {timezone.localdate(start_time).isoformat()}',
+        slug=occurrence_slug(series, start_time),
+        description=series.description,
+        location=series.location,
+        start_time=start_time,
+        created_by_id=series.created_by_id,
+        series=series,
+    )
+
+
+def iter_starts(series, after, before):
+    """
+    Yield the start times of the occurrences of series from after (inclusive) to before.
+    """
+    rule = get_rule(series, after)
+    if rule is None:
+        return
+    for start_time in rule.xafter(after, inc=True):
+        if start_time >= before:
+            return
+        yield start_time
+
+
+def iter_occurrences(series, after, before):
+    for start_time in iter_starts(series, after, before):
+        yield build_occurrence(series, start_time)
+
+
+def get_occurrence(slug):
+    """
+    Return the unsaved Event of the occurrence with slug, or None.
+    """
+    match = OCCURRENCE_SLUG.match(slug)
+    if not match:
+        return None
+    series = EventSeries.objects.filter(slug=match['series']).select_related('created_by').first()
+    if not series:
+        return None
+
+    day = datetime.fromisoformat(match['date']).date()
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    occurrence = next(iter_occurrences(series, day_start, day_start + timedelta(days=1)), None)
+    if occurrence is not None:
+        occurrence.created_by = series.created_by
+    return occurrence
+
+
+def materialize(occurrence):
+    """
+    Save an occurrence returned by get_occurrence (or the row a concurrent request saved)
+    and return it, or None when its slug is taken by another event.
+    """
+    try:
+        with transaction.atomic():
+            event, _ = Event.objects.get_or_create(
+                series=occurrence.series, start_time=occurrence.start_time,
+                defaults={
+                    'title': occurrence.title,
+                    'slug': occurrence.slug,
+                    'description': occurrence.description,
+                    'location': occurrence.location,
+                    'created_by': occurrence.created_by,
+                },
+            )
+    except IntegrityError:
+        # The series was edited after an event with this slug was saved
+        event = Event.objects.filter(slug=occurrence.slug).first()
+        if event is None or (event.series_id, event.start_time) != (occurrence.series_id, occurrence.start_time):
+            return None
+    return event
+
+
+def _drop_copies(items):
+    # A saved occurrence and its expanded copy have the same key, the saved one comes first
+    last_key = None
+    for item in items:
+        if item[:2] != last_key:
+            yield item
+        last_key = item[:2]
+
+
+def _series_stream(series, position, end):
+    for start_time in iter_starts(series, position[0], end):
+        item = (start_time, occurrence_slug(series, start_time), series)
+        if item[:2] > position:
+            yield item
+
+
+def occurrence_page(start, end, page_size, after=None, search=None):
+    """
+    Return up to page_size events and unsaved occurrences starting in [start, end), ordered
+    by (start_time, slug) and after the position after (a (start_time, slug) pair), and
+    whether there are more.
+    """
+    position = after or (start, '')
+    events = Event.objects.filter(start_time__gte=start, start_time__lt=end).filter(
+        Q(start_time__gt=position[0]) | Q(start_time=position[0], slug__gt=position[1])
+    )
+    series_list = EventSeries.objects.filter(first_start__lt=end).filter(Q(until__isnull=True) | Q(until__gte=position[0]))
+    if search:
+        events = events.filter(title__icontains=search)
+        series_list = series_list.filter(title__icontains=search)
+    events = list(events.select_related('created_by').order_by('start_time', 'slug')[:page_size + 1])
+
+    # Merged as (start_time, slug, event or series), occurrences are only built for the page
+    streams = [((event.start_time, event.slug, event) for event in events)]
+    for series in series_list:
+        streams.append(_series_stream(series, position, end))
+
+    merged = heapq.merge(*streams, key=lambda item: item[:2])
+    page = list(itertools.islice(_drop_copies(merged), page_size + 1))
+    has_more = len(page) > page_size
+    page = [
+        item if isinstance(item, Event) else build_occurrence(item, start_time)
+        for start_time, _, item in page[:page_size]
+    ]
+
+    occurrences = [item for item in page if item.pk is None]
+    organizers = User.objects.in_bulk({occurrence.created_by_id for occurrence in occurrences})
+    for occurrence in occurrences:
+        occurrence.created_by = organizers[occurrence.created_by_id]
+    # Saved occurrences which were moved to another time
+    saved = set(
+        Event.objects.filter(slug__in=[occurrence.slug for occurrence in occurrences]).values_list('slug', flat=True)
+    )
+    return [item for item in page if item.pk is not None or item.slug not in saved], has_more
@@ -0,0 +1,20 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete
+from .models import Event
+
+
+@receiver(post_save, sender=Event)
+def update_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(partial(
+        autocomplete.event_saved, instance.id, instance.title, instance.slug, instance.start_time
+    ))
+
+
+@receiver(post_delete, sender=Event)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    transaction.on_commit(partial(autocomplete.event_deleted, instance.id))
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from .archive import archive_past_events
+
+
+@shared_task()
+def archive_past_events_task():
+    return archive_past_events()
@@ -1,14 +1,44 @@
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction, DatabaseError, IntegrityError
+from django.db.models import F
 from django.utils import timezone
-from datetime import timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+from zoneinfo import ZoneInfo
+import asyncio
+from asgiref.sync import ThreadSensitiveContext
+import io
+import base64
+import json
+
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
 
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 
 
-from .models import Event, EventFeedback, Ticket
+from .models import Event, EventSeries, EventFeedback, Ticket, TicketCheckIn, ArchivedEvent, ArchivedTicket, ArchivedEventFeedback
+from .archive import archive_past_events
+from . import partitioning
+from . import availability
+from . import signing
+from . import series as event_series
+from .choices import RecurrenceChoices
+from .checkin import check_in
+from . import facets as event_facets
+from . import autocomplete
+from . import view_counts
+from . import throttles as event_throttles
+from . import serializers as event_serialziers
+from .views import EventOccurrenceListView
+from authentication.helpers import AuthHelper
 from authentication.choices import UserTypeChoices
 
 User = get_user_model()
@@ -549,4 +579,950 @@ class OraganizerEventListTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['status'], 'error')
-        self.assertEqual(response.data['message'], 'No organizer with that username found.')
\ No newline at end of file
+        self.assertEqual(response.data['message'], 'No organizer with that username found.')
+
+
+class AsyncReadViewsTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(email="organizer@gamil.com", username="organizer", password="test_organizer", role=UserTypeChoices.ORGANIZER)
+        self.participant = User.objects.create_user(email="participant@gamil.com", username="participant", password="test_participant")
+        self.events = [
+            Event.objects.create(
+                title=f"Async Event {index}",
+                description="Async Event Description",
+                location="Test Location",
+                start_time=timezone.now() + timedelta(days=index + 1),
+                created_by=self.organizer
+            )
+            for index in range(12)
+        ]
+        self.event = self.events[0]
+        Ticket.objects.create(event=self.event, user=self.participant)
+        EventFeedback.objects.create(event=self.event, user=self.participant, feedback="Great event!")
+        self.token = AuthHelper.get_tokens_for_user(self.participant)['access']
+        cache.clear()
+
+    def auth(self):
+        return {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+
+    def test_list_events_matches_sync_view(self):
+        response = self.client.get(reverse('async-event-list'), {'ordering': 'start_time'})
+        sync_response = self.client.get(reverse('event-list-create'), {'ordering': 'start_time'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['payload']['events'], sync_response.json()['payload']['events'])
+        self.assertEqual(response.json()['payload']['pagination']['count'], 12)
+        self.assertTrue(response.json()['payload']['pagination']['next'].endswith('page=2'))
+
+        response = self.client.get(reverse('async-event-list'), {'ordering': 'start_time', 'page': 2})
+        self.assertEqual(len(response.json()['payload']['events']), 2)
+        self.assertIsNone(response.json()['payload']['pagination']['next'])
+
+    def test_list_events_filters_and_search(self):
+        response = self.client.get(reverse('async-event-list'), {
+            'start_time__lte': (timezone.now() + timedelta(days=2, hours=1)).isoformat(),
+            'search': 'async event',
+        })
+        self.assertEqual(len(response.json()['payload']['events']), 2)
+
+        response = self.client.get(reverse('async-event-list'), {'start_time__lte': 'not a date'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('async-event-list'), {'page': 5})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_event_booked(self):
+        url = reverse('async-event-retrieve', kwargs={'slug': self.event.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.json()['payload']['booked'])
+
+        response = self.client.get(url, **self.auth())
+        self.assertTrue(response.json()['payload']['booked'])
+        self.assertEqual(response.json()['payload']['event']['slug'], self.event.slug)
+
+        response = self.client.get(reverse('async-event-retrieve', kwargs={'slug': 'invalid-slug'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_feedback_list(self):
+        response = self.client.get(reverse('async-feedback-list', kwargs={'slug': self.event.slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['payload']['feedbacks']), 1)
+
+        response = self.client.get(reverse('async-feedback-list', kwargs={'slug': 'invalid-slug'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_my_tickets_requires_authentication(self):
+        url = reverse('async-my-tickets')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION='Bearer invalid').status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+        response = self.client.get(url, **self.auth())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['payload']['tickets']), 1)
+
+    def test_requests_are_throttled(self):
+        with mock.patch.object(event_throttles.AsyncUnrestrictedThrottle, 'THROTTLE_RATES', {'unrestricted': '2/day'}):
+            for _ in range(2):
+                self.assertEqual(self.client.get(reverse('async-event-list')).status_code, status.HTTP_200_OK)
+            response = self.client.get(reverse('async-event-list'))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    async def test_served_through_async_stack(self):
+        response = await self.async_client.get(
+            reverse('async-my-tickets'), headers={'Authorization': f'Bearer {self.token}'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['payload']['tickets'][0]['event']['slug'], self.event.slug)
+
+
+class AvailabilityHubTests(SimpleTestCase):
+
+    def test_updates_are_coalesced_per_event(self):
+        async def scenario():
+            hub = availability.AvailabilityHub(availability.InMemoryBroker(), coalesce_ms=50)
+            subscriber = hub.subscribe(1)
+            other = hub.subscribe(2)
+
+            for participants in range(1, 4):
+                hub.dispatch(1, {'no_of_participants': participants})
+            hub.dispatch(3, {'no_of_participants': 1})
+            first = await subscriber.get(timeout=1)
+            # The burst is held back until the coalescing window closes
+            held_back = await subscriber.get(timeout=0.01)
+            last = await subscriber.get(timeout=1)
+            other_update = await other.get(timeout=0.1)
+
+            hub.unsubscribe(1, subscriber)
+            hub.unsubscribe(2, other)
+            return first, held_back, last, other_update, hub.listener
+
+        first, held_back, last, other_update, listener = asyncio.run(scenario())
+        self.assertEqual(first, {'no_of_participants': 1})
+        self.assertIsNone(held_back)
+        self.assertEqual(last, {'no_of_participants': 3})
+        self.assertIsNone(other_update)
+        self.assertIsNone(listener)
+
+
+@override_settings(BROKER_CIRCUIT_THRESHOLD=2, BROKER_CIRCUIT_COOLDOWN=60, BROKER_CONNECT_TIMEOUT=0.5)
+class RedisBrokerTests(SimpleTestCase):
+
+    def test_publishing_stops_while_redis_is_down(self):
+        broker = availability.RedisBroker('redis://127.0.0.1:1')
+        with mock.patch('redis.Redis.publish', side_effect=ConnectionError("redis is down")) as publish:
+            for _ in range(2):
+                with self.assertRaises(ConnectionError):
+                    broker.publish(1, {'no_of_participants': 1})
+            # Purchases don't try to connect anymore
+            broker.publish(1, {'no_of_participants': 2})
+        self.assertEqual(publish.call_count, 2)
+        self.assertTrue(broker.circuit.is_open)
+
+
+@override_settings(AVAILABILITY_BROKER='memory', AVAILABILITY_COALESCE_MS=10)
+class EventAvailabilityStreamTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(email="organizer@gamil.com", username="organizer", password="test_organizer", role=UserTypeChoices.ORGANIZER)
+        self.participant = User.objects.create_user(email="participant@gamil.com", username="participant", password="test_participant")
+        self.event = Event.objects.create(
+            title="Live Event",
+            description="Live Event Description",
+            location="Test Location",
+            start_time=timezone.now() + timedelta(days=3),
+            created_by=self.organizer
+        )
+        self.url = reverse('event-availability-stream', kwargs={'slug': self.event.slug})
+        cache.clear()
+
+    async def test_stream_pushes_availability_changes(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        first = await anext(stream)
+        self.assertIn(b'"no_of_participants": 0', first)
+
+        availability.get_broker().publish(self.event.pk, {'event': self.event.slug, 'no_of_participants': 1})
+        second = await asyncio.wait_for(anext(stream), timeout=5)
+        self.assertTrue(second.startswith(b'event: availability\n'))
+        self.assertIn(b'"no_of_participants": 1', second)
+        await stream.aclose()
+
+    def test_stream_needs_asgi(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+    def test_purchase_publishes_availability(self):
+        self.client.force_authenticate(user=self.participant)
+        with mock.patch('events.views.publish_availability') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('buy-event-ticket', kwargs={'slug': self.event.slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        publish.assert_called_once()
+        self.assertEqual(publish.call_args.args[0].no_of_participants, 1)
+
+
+class EventAvailabilityStreamConnectionTests(TransactionTestCase):
+
+    def setUp(self):
+        organizer = User.objects.create_user(email="organizer@gamil.com", username="organizer", password="test_organizer", role=UserTypeChoices.ORGANIZER)
+        self.event = Event.objects.create(
+            title="Live Event", description="Live Event Description", start_time=timezone.now() + timedelta(days=3), created_by=organizer
+        )
+        self.url = reverse('event-availability-stream', kwargs={'slug': self.event.slug})
+        cache.clear()
+        # Every stream below borrows from this pool, the test's own connection included
+        self.pool = connection._pool
+        connection.close()
+        for name, value in [('max_size', 2), ('timeout', 1)]:
+            patcher = mock.patch.object(self.pool, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def open_stream(self):
+        # Like a request served by the ASGI handler, with its own thread for the ORM
+        async with ThreadSensitiveContext():
+            response = await self.async_client.get(self.url)
+            stream = response.streaming_content
+            return await anext(stream), stream
+
+    async def test_idle_streams_give_their_connection_back(self):
+        streams = []
+        try:
+            for _ in range(3):
+                first, stream = await asyncio.wait_for(self.open_stream(), timeout=5)
+                streams.append(stream)
+                self.assertIn(b'"no_of_participants": 0', first)
+                self.assertEqual(self.pool.stats()['checked_out'], 0)
+        finally:
+            for stream in streams:
+                await stream.aclose()
+
+
+class ArchivePastEventsTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', password='password123', email="organizer@organizer.organizer", role=UserTypeChoices.ORGANIZER)
+        self.user = User.objects.create_user(username='user', password='password123', email="user@user.user")
+
+        self.client = APIClient()
+
+        self.past_event = Event.objects.create(
+            title='Past Event',
+            description='Description for past event',
+            start_time=timezone.now() - timedelta(days=400),
+            created_by=self.organizer
+        )
+        self.upcoming_event = Event.objects.create(
+            title='Upcoming Event',
+            description='Description for upcoming event',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.organizer
+        )
+        Ticket.objects.create(event=self.past_event, user=self.user)
+        Ticket.objects.create(event=self.upcoming_event, user=self.user)
+        EventFeedback.objects.create(event=self.past_event, user=self.user, feedback="Great event!")
+
+    def test_archive_moves_past_events_with_tickets_and_feedbacks(self):
+        archived = archive_past_events(older_than=timedelta(days=30), batch_size=1)
+
+        self.assertEqual(archived, 1)
+        self.assertFalse(Event.objects.filter(id=self.past_event.id).exists())
+        self.assertTrue(Event.objects.filter(id=self.upcoming_event.id).exists())
+        self.assertEqual(Ticket.objects.count(), 1)
+        self.assertEqual(EventFeedback.objects.count(), 0)
+
+        archived_event = ArchivedEvent.objects.get(id=self.past_event.id)
+        self.assertEqual(archived_event.title, 'Past Event')
+        self.assertEqual(ArchivedTicket.objects.filter(event=archived_event, user=self.user).count(), 1)
+        self.assertEqual(ArchivedEventFeedback.objects.filter(event=archived_event).count(), 1)
+
+    def test_archive_deletes_the_check_ins(self):
+        ticket = Ticket.objects.get(event=self.past_event)
+        TicketCheckIn.objects.create(ticket=ticket, event=self.past_event, scanned_at=self.past_event.start_time)
+        TicketCheckIn.objects.create(ticket=Ticket.objects.get(event=self.upcoming_event), event=self.upcoming_event, scanned_at=timezone.now())
+
+        archive_past_events(older_than=timedelta(days=30))
+        self.assertFalse(TicketCheckIn.objects.filter(ticket_id=ticket.id).exists())
+        self.assertEqual(TicketCheckIn.objects.count(), 1)
+
+    def test_archive_is_idempotent(self):
+        archive_past_events(older_than=timedelta(days=30))
+        self.assertEqual(archive_past_events(older_than=timedelta(days=30)), 0)
+        self.assertEqual(ArchivedEvent.objects.count(), 1)
+
+    def test_archived_events_are_readable(self):
+        archive_past_events(older_than=timedelta(days=30))
+
+        response = self.client.get(reverse('archived-event-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['payload']['events']), 1)
+
+        url = reverse('archived-event-retrieve', kwargs={'pk': self.past_event.id})
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['payload']['booked'])
+
+        url = reverse('archived-feedback-list', kwargs={'pk': self.past_event.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['payload']['feedbacks']), 1)
+
+        response = self.client.get(reverse('my-archived-tickets'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['payload']['tickets']), 1)
+
+    def test_archived_events_are_read_only(self):
+        archive_past_events(older_than=timedelta(days=30))
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('archived-event-retrieve', kwargs={'pk': self.past_event.id})
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class TicketPartitioningTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123', email='user@user.user')
+        self.event = Event.objects.create(
+            title='Event 1',
+            description='Description for event 1',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.user
+        )
+
+    def test_ticket_table_is_partitioned(self):
+        with connection.cursor() as cursor:
+            self.assertTrue(partitioning.is_partitioned(cursor))
+
+    def test_unique_event_user_is_enforced(self):
+        Ticket.objects.create(event=self.event, user=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.create(event=self.event, user=self.user)
+        self.assertEqual(Ticket.objects.filter(event=self.event).count(), 1)
+
+    def use_unpartitioned_ticket_table(self):
+        # The ticket table of the databases created before 0007 (rolled back with the test)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {partitioning.TICKET_TABLE} CASCADE")
+            cursor.execute(f"""
+                CREATE TABLE {partitioning.TICKET_TABLE} (
+                    id bigint GENERATED BY DEFAULT AS IDENTITY CONSTRAINT events_ticket_pkey PRIMARY KEY,
+                    pruchase_time timestamp with time zone NOT NULL,
+                    event_id bigint NOT NULL REFERENCES events_event(id) DEFERRABLE INITIALLY DEFERRED,
+                    user_id bigint NOT NULL REFERENCES authentication_user(id) DEFERRABLE INITIALLY DEFERRED,
+                    CONSTRAINT unique_event_user UNIQUE (user_id, event_id)
+                )
+            """)
+            cursor.execute(f"CREATE INDEX events_ticket_event_id_a43e217d ON {partitioning.TICKET_TABLE} (event_id)")
+            cursor.execute(f"CREATE INDEX events_ticket_user_id_1e3922f7 ON {partitioning.TICKET_TABLE} (user_id)")
+
+    def test_backfill_and_swap_of_a_populated_table(self):
+        self.use_unpartitioned_ticket_table()
+        users = [
+            User.objects.create_user(username=f'buyer{i}', password='password123', email=f'buyer{i}@user.user')
+            for i in range(3)
+        ]
+        for user in users[:2]:
+            Ticket.objects.create(event=self.event, user=user)
+        with connection.cursor() as cursor:
+            partitioning.create_shadow_table(cursor, partitions=4)
+        # Mirrored by the trigger, then copied again by the backfill
+        last_ticket = Ticket.objects.create(event=self.event, user=users[2])
+        # Fires the deferred foreign key checks of the inserts, a table with pending ones can't be altered
+        connection.check_constraints()
+
+        call_command('partition_tickets', '--swap', '--batch-size', '1', stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            self.assertTrue(partitioning.is_partitioned(cursor))
+        self.assertEqual(Ticket.objects.filter(event=self.event).count(), 3)
+        self.assertGreater(Ticket.objects.create(event=self.event, user=self.user).id, last_ticket.id)
+
+        # The legacy table doesn't reference events and users anymore
+        self.event.delete()
+        users[0].delete()
+        connection.check_constraints()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {partitioning.LEGACY_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+    def test_swap_is_refused_when_the_tables_differ(self):
+        self.use_unpartitioned_ticket_table()
+        Ticket.objects.create(event=self.event, user=self.user)
+        with connection.cursor() as cursor:
+            partitioning.create_shadow_table(cursor, partitions=4)
+            cursor.execute(
+                f"INSERT INTO {partitioning.SHADOW_TABLE} (id, pruchase_time, event_id, user_id) VALUES (1000, now(), %s, %s)",
+                [self.event.id, self.user.id],
+            )
+        with self.assertRaises(CommandError):
+            call_command('partition_tickets', '--swap', stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            self.assertFalse(partitioning.is_partitioned(cursor))
+
+
+class TicketSigningTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        self.user = User.objects.create_user(username='user', email='user@email.com', password='password123')
+        self.event = Event.objects.create(title='Event 1', description='Description', start_time=timezone.now() + timedelta(days=2), created_by=self.organizer)
+        self.ticket = Ticket.objects.create(event=self.event, user=self.user)
+
+    def test_token_is_verified_with_the_public_key(self):
+        response = self.client.get(reverse('ticket-public-key'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        public_key = Ed25519PublicKey.from_public_bytes(base64.b64decode(response.data['payload']['public_key']))
+
+        self.client.force_authenticate(user=self.user)
+        token = self.client.get(reverse('my-tickets')).data['payload']['tickets'][0]['token']
+        self.assertLessEqual(len(token), 120)
+        self.assertEqual(
+            signing.verify_token(token, public_key), (self.ticket.id, self.event.id, self.user.id)
+        )
+
+    def test_tampered_token_is_rejected(self):
+        token = signing.ticket_token(self.ticket)
+        raw = bytearray(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        # Claim another ticket id
+        raw[8] ^= 1
+        tampered = base64.urlsafe_b64encode(bytes(raw)).rstrip(b'=').decode()
+
+        with self.assertRaises(signing.InvalidTicketToken):
+            signing.verify_token(tampered)
+        with self.assertRaises(signing.InvalidTicketToken):
+            signing.verify_token(token[:-4])
+        with self.assertRaises(signing.InvalidTicketToken):
+            signing.verify_token('not a token!')
+
+
+class EventCheckInTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        self.event = Event.objects.create(title='Event 1', description='Description', start_time=timezone.now() + timedelta(days=2), created_by=self.organizer)
+        other_event = Event.objects.create(title='Event 2', description='Description', start_time=timezone.now() + timedelta(days=2), created_by=self.organizer)
+        users = [
+            User.objects.create_user(username=f'user{index}', email=f'user{index}@email.com', password='password123')
+            for index in range(4)
+        ]
+        self.tickets = [Ticket.objects.create(event=self.event, user=user) for user in users[:3]]
+        self.other_ticket = Ticket.objects.create(event=other_event, user=users[3])
+        self.url = reverse('event-check-in', kwargs={'slug': self.event.slug})
+
+    def test_scans_are_checked_in_and_duplicates_reported(self):
+        first, second, third = [ticket.id for ticket in self.tickets]
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(self.url, {'scans': [{'ticket_id': first}, {'ticket_id': second}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(response.data['payload']['checked_in'], [first, second])
+
+        response = self.client.post(self.url, {'scans': [
+            {'ticket_id': second}, {'ticket_id': third}, {'ticket_id': third}, {'ticket_id': self.other_ticket.id},
+        ]}, format='json')
+        payload = response.data['payload']
+        self.assertEqual(payload['checked_in'], [third])
+        self.assertCountEqual([duplicate['ticket_id'] for duplicate in payload['duplicates']], [second, third])
+        self.assertEqual(payload['invalid'], [self.other_ticket.id])
+        self.assertEqual(TicketCheckIn.objects.filter(event=self.event).count(), 3)
+        self.assertFalse(TicketCheckIn.objects.filter(ticket=self.other_ticket).exists())
+
+    def test_duplicate_reports_first_check_in_time(self):
+        scanned_at = timezone.now() - timedelta(minutes=5)
+        check_in(self.event, [(self.tickets[0].id, scanned_at)], self.organizer)
+        first_check_in = TicketCheckIn.objects.get(ticket=self.tickets[0])
+        self.assertEqual(first_check_in.scanned_at, scanned_at)
+
+        result = check_in(self.event, [(self.tickets[0].id, timezone.now())])
+        self.assertEqual(result['duplicates'], [(self.tickets[0].id, first_check_in.checked_in_at)])
+
+    def test_only_the_organizer_checks_in(self):
+        self.client.force_authenticate(user=self.tickets[0].user)
+        response = self.client.post(self.url, {'scans': [{'ticket_id': self.tickets[0].id}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(TicketCheckIn.objects.exists())
+
+    @override_settings(TICKET_CHECK_IN_BATCH_SIZE=2)
+    def test_batch_size_is_limited(self):
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(self.url, {'scans': [{'ticket_id': ticket.id} for ticket in self.tickets]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ticket_id_out_of_the_bigint_range_is_rejected(self):
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(self.url, {'scans': [{'ticket_id': 2**63}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TicketCheckIn.objects.exists())
+
+
+class EventSeriesTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        self.user = User.objects.create_user(username='user', email='user@email.com', password='password123')
+        self.first_start = (timezone.now() + timedelta(days=1)).replace(hour=18, minute=0, second=0, microsecond=0)
+        self.series = EventSeries.objects.create(
+            title='Weekly meetup', description='Meetup', location='Hall A', created_by=self.organizer,
+            frequency=RecurrenceChoices.WEEKLY, first_start=self.first_start, count=52,
+        )
+
+    def occurrence_slug(self, week):
+        return event_series.occurrence_slug(self.series, self.first_start + timedelta(weeks=week))
+
+    def test_occurrences_are_expanded_without_rows(self):
+        occurrences = list(event_series.iter_occurrences(self.series, self.first_start, self.first_start + timedelta(weeks=3)))
+
+        self.assertEqual([occurrence.start_time for occurrence in occurrences], [
+            self.first_start + timedelta(weeks=week) for week in range(3)
+        ])
+        self.assertEqual(occurrences[1].slug, self.occurrence_slug(1))
+        self.assertEqual(occurrences[1].title, f'Weekly meetup {timezone.localdate(occurrences[1].start_time)}')
+        self.assertFalse(Event.objects.exists())
+
+    def test_organizer_creates_series(self):
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(reverse('event-series-list-create'), {
+            'title': 'Monthly talk', 'description': 'Talk', 'location': 'Hall B',
+            'frequency': RecurrenceChoices.MONTHLY, 'first_start': self.first_start.isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['payload']['series']['slug'], 'monthly-talk')
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('event-series-list-create'), {
+            'title': 'Daily standup', 'description': 'Standup', 'location': 'Hall C',
+            'frequency': RecurrenceChoices.DAILY, 'first_start': self.first_start.isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_first_ticket_materializes_occurrence(self):
+        slug = self.occurrence_slug(2)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('event-retrieve-update-destroy', kwargs={'slug': slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['payload']['event']['id'])
+
+        response = self.client.post(reverse('buy-event-ticket', kwargs={'slug': slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        event = Event.objects.get()
+        self.assertEqual((event.slug, event.series, event.start_time), (slug, self.series, self.first_start + timedelta(weeks=2)))
+        self.assertEqual(event.no_of_participants, 1)
+
+        other = User.objects.create_user(username='other', email='other@email.com', password='password123')
+        self.client.force_authenticate(user=other)
+        self.client.post(reverse('buy-event-ticket', kwargs={'slug': slug}))
+        self.assertEqual(Event.objects.get().no_of_participants, 2)
+
+    def test_async_retrieve_of_an_occurrence(self):
+        slug = self.occurrence_slug(2)
+        response = self.client.get(reverse('async-event-retrieve', kwargs={'slug': slug}), HTTP_AUTHORIZATION=f"Bearer {AuthHelper.get_tokens_for_user(self.user)['access']}")
+        sync_response = self.client.get(reverse('event-retrieve-update-destroy', kwargs={'slug': slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.json()['payload']['booked'])
+        self.assertEqual(response.json()['payload']['event'], sync_response.json()['payload']['event'])
+        self.assertFalse(Event.objects.exists())
+
+    def test_event_with_the_series_slug_can_be_bought(self):
+        event = Event.objects.create(
+            title='Series', description='Description', start_time=self.first_start, created_by=self.organizer,
+        )
+        self.assertEqual(event.slug, 'series')
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('buy-event-ticket', kwargs={'slug': 'series'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(Ticket.objects.filter(event=event, user=self.user).exists())
+
+    def test_occurrence_is_not_materialized_over_another_event(self):
+        occurrence = event_series.get_occurrence(self.occurrence_slug(1))
+        saved = event_series.materialize(occurrence)
+        self.assertEqual(event_series.materialize(event_series.get_occurrence(self.occurrence_slug(1))), saved)
+
+        # The series was moved by an hour, the slug of the occurrence is taken by the saved one
+        moved = event_series.build_occurrence(self.series, occurrence.start_time + timedelta(hours=1))
+        self.assertIsNone(event_series.materialize(moved))
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_dates_without_occurrence_are_not_found(self):
+        slug = event_series.occurrence_slug(self.series, self.first_start + timedelta(days=1))
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(reverse('buy-event-ticket', kwargs={'slug': slug}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Event.objects.exists())
+
+    def test_occurrence_list_pages_over_events_and_occurrences(self):
+        event = Event.objects.create(
+            title='Single event', description='Description', start_time=self.first_start + timedelta(days=1, hours=1),
+            created_by=self.organizer,
+        )
+        # A sold occurrence is listed once, as the saved event
+        sold = event_series.materialize(event_series.get_occurrence(self.occurrence_slug(1)))
+
+        url = reverse('event-occurrence-list')
+        params = {'start': self.first_start.isoformat(), 'end': (self.first_start + timedelta(weeks=5)).isoformat()}
+        listed, pages = [], 0
+        with mock.patch.object(EventOccurrenceListView, 'page_size', 2):
+            while url:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                listed.extend((item['slug'], item['id']) for item in response.data['payload']['events'])
+                url, params, pages = response.data['payload']['pagination']['next'], None, pages + 1
+
+        self.assertEqual(listed, [
+            (self.occurrence_slug(0), None),
+            (event.slug, event.id),
+            (self.occurrence_slug(1), sold.id),
+            (self.occurrence_slug(2), None),
+            (self.occurrence_slug(3), None),
+            (self.occurrence_slug(4), None),
+        ])
+        self.assertEqual(pages, 3)
+
+    def test_occurrence_list_window_is_limited(self):
+        response = self.client.get(reverse('event-occurrence-list'), {
+            'start': self.first_start.isoformat(), 'end': (self.first_start + timedelta(days=400)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_occurrence_cursor_is_rejected(self):
+        for position in [{'a': 1}, ['2030-01-01T00:00:00'], [1, 'slug'], ['2030-01-01T00:00:00', None], 'slug']:
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(reverse('event-occurrence-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EventCalendarTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        other = User.objects.create_user(username='other', email='other@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        self.day = (timezone.now() + timedelta(days=10)).date()
+        late_evening = datetime.combine(self.day, datetime.min.time(), tzinfo=dt_timezone.utc) + timedelta(hours=23, minutes=30)
+        Event.objects.create(title='Late event', description='Description', location='Paris', start_time=late_evening, created_by=self.organizer)
+        Event.objects.create(title='Noon event', description='Description', location='Berlin', start_time=late_evening - timedelta(hours=11), created_by=other)
+        self.url = reverse('event-calendar')
+        self.params = {'start': self.day.isoformat(), 'end': (self.day + timedelta(days=1)).isoformat()}
+
+    def days(self, **params):
+        response = self.client.get(self.url, {**self.params, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {day['date']: day['count'] for day in response.data['payload']['days']}
+
+    def test_days_are_counted_in_the_time_zone(self):
+        self.assertEqual(self.days(), {self.day: 2})
+        self.assertEqual(self.days(tz='Europe/Paris'), {self.day: 1, self.day + timedelta(days=1): 1})
+
+    def test_days_are_filtered_by_location_and_organizer(self):
+        self.assertEqual(self.days(location='paris'), {self.day: 1})
+        self.assertEqual(self.days(organizer='other'), {self.day: 1})
+        self.assertEqual(self.days(location='Paris', organizer='other'), {})
+
+    def test_series_occurrences_are_counted(self):
+        series = EventSeries.objects.create(
+            title='Daily standup', description='Standup', location='Paris', created_by=self.organizer,
+            frequency=RecurrenceChoices.DAILY, first_start=datetime.combine(self.day, datetime.min.time(), tzinfo=dt_timezone.utc) + timedelta(hours=9),
+        )
+        # A sold occurrence isn't counted twice
+        event_series.materialize(event_series.get_occurrence(event_series.occurrence_slug(series, series.first_start)))
+        self.assertEqual(self.days(), {self.day: 3, self.day + timedelta(days=1): 1})
+
+    def test_counts_are_cached(self):
+        self.days()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.days(), {self.day: 2})
+
+    def test_invalid_range_and_time_zone_are_rejected(self):
+        response = self.client.get(self.url, {'start': self.day.isoformat(), 'end': (self.day - timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {**self.params, 'tz': 'Mars/Olympus'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_days_out_of_the_datetime_range_are_rejected(self):
+        for params in [
+            {'start': '9999-12-30', 'end': '9999-12-31'},
+            {'start': '9999-12-01'},
+            {'start': '9999-12-30', 'end': '9999-12-30', 'tz': 'America/New_York'},
+            {'start': '0001-01-01', 'end': '0001-01-02', 'tz': 'Asia/Tokyo'},
+        ]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EventFacetsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        other = User.objects.create_user(username='other', email='other@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        # A Wednesday
+        self.now = datetime(2030, 5, 15, 12, tzinfo=dt_timezone.utc)
+        for title, location, start_time, created_by in [
+            ('Music today', 'Paris', self.now + timedelta(hours=10), self.organizer),
+            ('Music this week', 'Paris', self.now + timedelta(days=3), self.organizer),
+            ('Music this month', 'Berlin', self.now + timedelta(days=10), other),
+            ('Music next month', 'Berlin', self.now + timedelta(days=20), self.organizer),
+            ('Talk today', 'Paris', self.now + timedelta(hours=1), other),
+        ]:
+            Event.objects.create(title=title, description='Description', location=location, start_time=start_time, created_by=created_by)
+        self.url = reverse('event-list-create')
+
+    def test_facets_of_the_filtered_events(self):
+        response = self.client.get(self.url, {'search': 'music', 'facets': 'location,organizer'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        facets = response.data['payload']['facets']
+        self.assertEqual(facets['total'], 4)
+        self.assertEqual(facets['location'], [{'value': 'Berlin', 'count': 2}, {'value': 'Paris', 'count': 2}])
+        self.assertEqual(facets['organizer'], [{'value': 'organizer', 'count': 3}, {'value': 'other', 'count': 1}])
+        self.assertNotIn('date', facets)
+
+    def test_date_buckets(self):
+        facets = event_facets.count_facets(Event.objects.all(), ['date'], dt_timezone.utc, now=self.now)
+        self.assertEqual(facets['date'], {'today': 2, 'this_week': 3, 'this_month': 4})
+        # 22:00 on the 15th in UTC is already the 16th in Tokyo
+        facets = event_facets.count_facets(Event.objects.all(), ['date'], ZoneInfo('Asia/Tokyo'), now=self.now)
+        self.assertEqual(facets['date'], {'today': 1, 'this_week': 3, 'this_month': 4})
+
+    def test_facets_are_counted_in_one_query(self):
+        with self.assertNumQueries(1):
+            event_facets.count_facets(Event.objects.filter(title__icontains='music'), event_facets.FACETS, dt_timezone.utc)
+
+    def test_facets_are_cached_on_the_normalized_filters(self):
+        with mock.patch.object(event_facets, 'count_facets', wraps=event_facets.count_facets) as count_facets:
+            self.client.get(self.url, {'search': 'music', 'location': 'x', 'facets': 'location,date', 'page': 1})
+            response = self.client.get(self.url, {'location': 'x', 'search': 'music', 'facets': 'date,location', 'ordering': 'id'})
+        self.assertEqual(count_facets.call_count, 1)
+        self.assertEqual(response.data['payload']['facets']['total'], 4)
+
+    def test_unknown_facets_are_rejected(self):
+        response = self.client.get(self.url, {'facets': 'location,price'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'facets': 'location', 'tz': 'Mars/Olympus'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EVENT_AUTOCOMPLETE_REFRESH_SECONDS=0)
+class EventAutocompleteTests(APITestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(autocomplete, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        now = timezone.now()
+        for title, start_time in [
+            ('Summer Jazz Night', now + timedelta(days=3)),
+            ('Jazz Brunch', now + timedelta(days=1)),
+            ('Jazz and Blues', now + timedelta(days=2)),
+            ('Old Jazz Concert', now - timedelta(days=1)),
+            ('Rock Festival', now + timedelta(days=1)),
+        ]:
+            Event.objects.create(title=title, description='Description', location='Paris', start_time=start_time, created_by=self.organizer)
+        self.url = reverse('event-autocomplete')
+
+    def titles(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [event['title'] for event in response.data['payload']['events']]
+
+    def test_soonest_upcoming_titles_with_a_word_starting_with_the_prefix(self):
+        self.assertEqual(self.titles('jaz'), ['Jazz Brunch', 'Jazz and Blues', 'Summer Jazz Night'])
+        self.assertEqual(self.titles('JAZZ n'), ['Summer Jazz Night'])
+        self.assertEqual(self.titles('jazz', limit=1), ['Jazz Brunch'])
+        self.assertEqual(self.titles('pop'), [])
+        self.assertEqual(self.titles(''), [])
+
+    def test_lookups_dont_query_the_database(self):
+        self.titles('jazz')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('rock'), ['Rock Festival'])
+
+    def test_committed_saves_and_deletes_are_applied(self):
+        self.titles('jazz')
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.create(title='Jazz Picnic', description='Description', location='Paris', start_time=timezone.now() + timedelta(hours=1), created_by=self.organizer)
+            Event.objects.get(title='Jazz Brunch').delete()
+            event = Event.objects.get(title='Rock Festival')
+            event.title = 'Rock Jazz Festival'
+            event.save()
+        self.assertEqual(self.titles('jazz'), ['Jazz Picnic', 'Rock Jazz Festival', 'Jazz and Blues', 'Summer Jazz Night'])
+        self.assertEqual(self.titles('rock'), ['Rock Jazz Festival'])
+
+    def test_refresh_reads_the_events_saved_by_other_processes(self):
+        index = autocomplete.get_index()
+        # No signal, as if saved by another process
+        Event.objects.filter(title='Rock Festival').update(title='Jazz Festival', updated_at=timezone.now())
+        self.assertNotIn('Jazz Festival', self.titles('jazz'))
+        index.refresh()
+        self.assertEqual(self.titles('jazz'), ['Jazz Brunch', 'Jazz Festival', 'Jazz and Blues', 'Summer Jazz Night'])
+        self.assertEqual(self.titles('rock'), [])
+
+    def test_invalid_limit_is_rejected(self):
+        response = self.client.get(self.url, {'q': 'jazz', 'limit': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(EVENT_VIEW_FLUSH_INTERVAL=0)
+class EventViewCountTests(APITestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(view_counts, '_counters', Counter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        self.event = Event.objects.create(title='Popular event', description='Description', location='Paris', created_by=self.organizer)
+        self.other = Event.objects.create(title='Other event', description='Description', location='Paris', created_by=self.organizer)
+        self.url = reverse('event-retrieve-update-destroy', kwargs={'slug': self.event.slug})
+
+    def test_views_are_counted_without_a_write_and_flushed_in_one_statement(self):
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(all(query['sql'].startswith('SELECT') for query in queries))
+        self.client.get(reverse('event-retrieve-update-destroy', kwargs={'slug': self.other.slug}))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.view_count, 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(view_counts.flush(), 2)
+        self.event.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.event.view_count, self.other.view_count), (3, 1))
+        self.assertEqual(view_counts.flush(), 0)
+
+    def test_events_are_ordered_by_views(self):
+        # The other way around from the default ordering, newest first
+        Event.objects.filter(pk=self.event.pk).update(view_count=10)
+        for name in ['event-list-create', 'async-event-list']:
+            response = self.client.get(reverse(name), {'ordering': '-view_count'})
+            self.assertEqual([event['slug'] for event in response.json()['payload']['events']], [self.event.slug, self.other.slug])
+
+    def test_views_are_kept_when_the_flush_fails(self):
+        view_counts.incr(self.event.id, 2)
+        with mock.patch.object(view_counts.connection, 'cursor', side_effect=DatabaseError), self.assertLogs(view_counts.logger):
+            self.assertEqual(view_counts.flush(), 0)
+        view_counts.flush()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.view_count, 2)
+
+    def test_saving_an_event_keeps_the_flushed_views(self):
+        event = Event.objects.get(pk=self.event.pk)
+        view_counts.incr(self.event.id, 5)
+        view_counts.flush()
+        event.title = 'Renamed event'
+        event.save()
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.title, self.event.view_count), ('Renamed event', 5))
+
+    @override_settings(EVENT_VIEW_BUFFER_SIZE=1)
+    def test_buffer_is_bounded(self):
+        view_counts.incr(self.event.id)
+        view_counts.incr(self.other.id)
+        view_counts.incr(self.event.id)
+        self.assertEqual(dict(view_counts._counters), {self.event.id: 2})
+
+    def test_list_can_be_ordered_by_views(self):
+        view_counts.incr(self.other.id, 3)
+        view_counts.flush()
+        response = self.client.get(reverse('event-list-create'), {'ordering': '-view_count'})
+        self.assertEqual([event['title'] for event in response.data['payload']['events']], ['Other event', 'Popular event'])
+
+
+class EventAvailabilityListTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER)
+        self.event = Event.objects.create(title='Small event', description='Description', location='Paris', capacity=1, created_by=self.organizer)
+        self.open_event = Event.objects.create(title='Open event', description='Description', location='Paris', no_of_participants=4, created_by=self.organizer)
+        self.url = reverse('event-availability-list')
+
+    def test_availability_by_slug_and_id_from_the_cache(self):
+        params = {'slugs': f'{self.event.slug},unknown-event', 'ids': f'{self.open_event.id}'}
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload'], {
+            'slugs': {self.event.slug: {'no_of_participants': 0, 'capacity': 1, 'sold_out': False}},
+            'ids': {self.open_event.id: {'no_of_participants': 4, 'capacity': None, 'sold_out': False}},
+        })
+        # Unknown events are cached too
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, params).data, response.data)
+        response = self.client.post(self.url, {'ids': [self.event.id]}, format='json')
+        self.assertEqual(response.data['payload']['ids'], {self.event.id: {'no_of_participants': 0, 'capacity': 1, 'sold_out': False}})
+
+    def test_purchases_respect_the_capacity_and_update_the_snapshot(self):
+        self.client.get(self.url, {'slugs': self.event.slug})
+        buy_url = reverse('buy-event-ticket', kwargs={'slug': self.event.slug})
+        self.client.force_authenticate(user=self.organizer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(buy_url).status_code, status.HTTP_200_OK)
+
+        buyer = User.objects.create_user(username='buyer', email='buyer@email.com', password='password123')
+        self.client.force_authenticate(user=buyer)
+        response = self.client.post(buy_url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'This event is sold out.')
+        self.assertFalse(Ticket.objects.filter(event=self.event, user=buyer).exists())
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.no_of_participants, 1)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'slugs': self.event.slug})
+        self.assertEqual(response.data['payload']['slugs'][self.event.slug], {'no_of_participants': 1, 'capacity': 1, 'sold_out': True})
+
+    def test_capacity_below_the_tickets_sold_is_rejected(self):
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('event-retrieve-update-destroy', kwargs={'slug': self.open_event.slug})
+        response = self.client.patch(url, {'capacity': 3})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(url, {'capacity': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, {'ids': self.open_event.id})
+        self.assertTrue(response.data['payload']['ids'][self.open_event.id]['sold_out'])
+
+    def test_saving_a_stale_event_keeps_the_tickets_sold(self):
+        stale = Event.objects.get(pk=self.open_event.pk)
+        Event.objects.filter(pk=self.open_event.pk).update(no_of_participants=F('no_of_participants') + 1)
+        stale.location = 'Berlin'
+        stale.save()
+
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('event-retrieve-update-destroy', kwargs={'slug': self.open_event.slug})
+        response = self.client.patch(url, {'no_of_participants': 0, 'description': 'New description'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.open_event.refresh_from_db()
+        self.assertEqual((self.open_event.location, self.open_event.no_of_participants), ('Berlin', 5))
+
+    def test_update_does_not_cache_a_stale_availability(self):
+        self.client.get(self.url, {'ids': self.open_event.id})
+        update = event_serialziers.EventSerializer.update
+
+        def update_after_a_purchase(serializer, instance, validated_data):
+            # A ticket bought after the event was loaded
+            Event.objects.filter(pk=instance.pk).update(no_of_participants=F('no_of_participants') + 1)
+            return update(serializer, instance, validated_data)
+
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('event-retrieve-update-destroy', kwargs={'slug': self.open_event.slug})
+        with mock.patch.object(event_serialziers.EventSerializer, 'update', update_after_a_purchase):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(self.client.patch(url, {'capacity': 10}).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, {'ids': self.open_event.id})
+        self.assertEqual(response.data['payload']['ids'][self.open_event.id], {'no_of_participants': 5, 'capacity': 10, 'sold_out': False})
+
+    @override_settings(EVENT_AVAILABILITY_MAX_EVENTS=2)
+    def test_invalid_requests_are_rejected(self):
+        for params in [{}, {'ids': 'one'}, {'slugs': 'a,b', 'ids': '1'}]:
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(self.url, {'slugs': 'a'}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(self.url, [1, 2], format='json').status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,7 +1,38 @@
 from rest_framework.throttling import UserRateThrottle
 
+
+class AsyncThrottleMixin:
+    """
+    Lets a DRF rate throttle run in async views. The request history is read and written
+    with the async cache API, under the same keys as the sync throttle.
+    """
+
+    async def aallow_request(self, request, view=None):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.history = await self.cache.aget(self.key, [])
+        self.now = self.timer()
+
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+        if len(self.history) >= self.num_requests:
+            return self.throttle_failure()
+
+        self.history.insert(0, self.now)
+        await self.cache.aset(self.key, self.history, self.duration)
+        return True
+
+
 class UnrestrictedThrottle(UserRateThrottle):
     scope = 'unrestricted'
 
 class RestrictedThrottle(UserRateThrottle):
-    scope = 'restricted'
\ No newline at end of file
+    scope = 'restricted'
+
+class AsyncUnrestrictedThrottle(AsyncThrottleMixin, UnrestrictedThrottle):
+    pass
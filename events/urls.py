@@ -1,12 +1,37 @@
 from django.urls import path, include
 
 from . import views as event_views
+from . import async_views as event_async_views
 
 urlpatterns = [
     path('', view=event_views.EventsListCreateApiView.as_view(), name='event-list-create'),
+    path('availability/', view=event_views.EventAvailabilityListView.as_view(), name='event-availability-list'),
+    path('autocomplete/', view=event_views.EventAutocompleteView.as_view(), name='event-autocomplete'),
+    path('calendar/', view=event_views.EventCalendarView.as_view(), name='event-calendar'),
+    path('occurrences/', view=event_views.EventOccurrenceListView.as_view(), name='event-occurrence-list'),
+    path('series/', view=event_views.EventSeriesListCreateView.as_view(), name='event-series-list-create'),
     path('<slug:slug>', view=event_views.EventRetrieveUpdateDestroyAPIView.as_view(), name='event-retrieve-update-destroy'),
     path('<slug:slug>/buy-ticket', view=event_views.BuyEventTicketView.as_view(), name='buy-event-ticket'),
+    # After <slug>/buy-ticket, which must win for an event with the slug "series"
+    path('series/<slug:slug>', view=event_views.EventSeriesRetrieveUpdateDestroyView.as_view(), name='event-series-retrieve-update-destroy'),
     path('<slug:slug>/feedbacks/', view=event_views.EventFeedbackListCreateView.as_view(), name="feedback-list-create"),
+    path('<slug:slug>/broadcasts/', view=event_views.EventBroadcastListCreateView.as_view(), name='event-broadcast-list-create'),
+    path('<slug:slug>/broadcasts/<int:pk>/resume', view=event_views.EventBroadcastResumeView.as_view(), name='event-broadcast-resume'),
+    path('<slug:slug>/check-ins/', view=event_views.EventCheckInView.as_view(), name='event-check-in'),
     path('my-tickets/', view=event_views.MyTicketView.as_view(), name='my-tickets'),
-    path('organizer/<username>/events/', view=event_views.OraganizerEventList.as_view(), name='organizer-events')
+    path('tickets/public-key/', view=event_views.TicketPublicKeyView.as_view(), name='ticket-public-key'),
+    path('organizer/<username>/events/', view=event_views.OraganizerEventList.as_view(), name='organizer-events'),
+
+    # Archive (read only)
+    path('archived/', view=event_views.ArchivedEventListView.as_view(), name='archived-event-list'),
+    path('archived/<int:pk>', view=event_views.ArchivedEventRetrieveView.as_view(), name='archived-event-retrieve'),
+    path('archived/<int:pk>/feedbacks/', view=event_views.ArchivedEventFeedbackListView.as_view(), name='archived-feedback-list'),
+    path('my-tickets/archived/', view=event_views.MyArchivedTicketView.as_view(), name='my-archived-tickets'),
+
+    # Async (ASGI native) read endpoints
+    path('async/', view=event_async_views.AsyncEventListView.as_view(), name='async-event-list'),
+    path('async/my-tickets/', view=event_async_views.AsyncMyTicketView.as_view(), name='async-my-tickets'),
+    path('async/<slug:slug>', view=event_async_views.AsyncEventRetrieveView.as_view(), name='async-event-retrieve'),
+    path('async/<slug:slug>/feedbacks/', view=event_async_views.AsyncEventFeedbackListView.as_view(), name='async-feedback-list'),
+    path('<slug:slug>/availability/', view=event_async_views.EventAvailabilityStreamView.as_view(), name='event-availability-stream'),
 ]
@@ -0,0 +1,101 @@
+"""
+Views of the event detail pages.
+
+A view is only counted in the memory of the process serving it: a thread of every web
+process adds the counts of the events to Event.view_count with one UPDATE every
+EVENT_VIEW_FLUSH_INTERVAL seconds, so the detail page stays a read. A process killed
+between two flushes loses at most that many seconds of its views, and counts which could
+not be saved are kept for the next flush (up to EVENT_VIEW_BUFFER_SIZE events).
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, connections
+
+from .models import Event
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters = Counter()
+_pid = None
+_flusher = None
+_stopped = threading.Event()
+
+
+def _start_flusher():
+    global _pid, _flusher
+    if _pid != os.getpid():
+        # Counted by the parent before the fork, it flushes them itself
+        _counters.clear()
+        _pid = os.getpid()
+        _flusher = None
+    if _flusher is None and settings.EVENT_VIEW_FLUSH_INTERVAL:
+        _flusher = threading.Thread(target=_flush_forever, daemon=True)
+        _flusher.start()
+
+
+def incr(event_id, value=1):
+    with _lock:
+        _start_flusher()
+        if event_id in _counters or len(_counters) < settings.EVENT_VIEW_BUFFER_SIZE:
+            _counters[event_id] += value
+
+
+def flush():
+    """
+    Add the counts of this process to Event.view_count and reset them.
+    """
+    with _lock:
+        counters = dict(_counters)
+        _counters.clear()
+    if not counters:
+        return 0
+
+    event_ids = sorted(counters)
+    table = Event._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            # Rows locked in id order, flushes of other processes can't deadlock with it
+            cursor.execute(f"""
+                WITH locked AS (
+                    SELECT id FROM {table} WHERE id = ANY(%s::bigint[]) ORDER BY id FOR UPDATE
+                )
+                UPDATE {table} SET view_count = {table}.view_count + views.count
+                FROM unnest(%s::bigint[], %s::bigint[]) AS views(event_id, count)
+                JOIN locked ON locked.id = views.event_id
+                WHERE {table}.id = views.event_id
+            """, [event_ids, event_ids, [counters[event_id] for event_id in event_ids]])
+    except Exception:
+        logger.exception("Could not save the event views, keeping them for the next flush.")
+        for event_id, value in counters.items():
+            incr(event_id, value)
+        return 0
+    return len(counters)
+
+
+def _flush_forever():
+    global _flusher
+    while not _stopped.wait(settings.EVENT_VIEW_FLUSH_INTERVAL):
+        if not settings.EVENT_VIEW_FLUSH_INTERVAL:
+            # Turned off, views are flushed by the caller of flush()
+            break
+        try:
+            flush()
+        finally:
+            connections.close_all()
+    with _lock:
+        if _flusher is threading.current_thread():
+            _flusher = None
+
+
+@atexit.register
+def flush_at_exit():
+    _stopped.set()
+    if _pid == os.getpid():
+        flush()
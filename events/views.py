@@ -1,46 +1,64 @@
 from django.shortcuts import render
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import base64
+import json
 from django.conf import settings
 from django.db import transaction
-from django.template.loader import render_to_string
+from django.db.models import F, Q
+from django.http import Http404
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
 
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView, CreateAPIView
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
+from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView, CreateAPIView, RetrieveAPIView
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.throttling import ScopedRateThrottle
 
+from .filters import EventFilterSet
 from .permission import IsOrganizerOrReadOnly, IsParticipantorEventOrganizer
-from .models import Event, Ticket, EventFeedback
+from .models import Event, EventSeries, Ticket, EventFeedback, ArchivedEvent, ArchivedTicket, ArchivedEventFeedback
 from . import serializers as event_serialziers
 from . import throttles as event_throttles
-
-from notifications.tasks import send_email
+from .availability import cache_snapshot, forget_snapshot, get_snapshots, publish_availability
+from .checkin import check_in
+from .calendar import day_range, get_calendar
+from . import autocomplete
+from . import facets as event_facets
+from . import series as event_series
+from . import signing
+from . import view_counts
+
+from notifications.tasks import send_templated_emails, notify_event_ticket_holders_task, send_broadcast_task
+from notifications.models import Broadcast
+from notifications.broadcast import claimable
+from notifications.choices import BroadcastStatusChoices
+from notifications.serializers import BroadcastSerializer
+from notifications import outbox
+from webhooks import dispatch as webhooks
 from authentication.choices import UserTypeChoices
 
 User = get_user_model()
 
 # Create your views here.
 class EventsListCreateApiView(ListCreateAPIView):
+    use_read_replica = True
     permission_classes = (IsAuthenticatedOrReadOnly, IsOrganizerOrReadOnly)
     serializer_class = event_serialziers.EventSerializer
     filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]
     search_fields = ["title",]
-    ordering_fields = ["created_at", "updated_at", "id", "start_time"]
+    ordering_fields = ["created_at", "updated_at", "id", "start_time", "view_count"]
     ordering = ["-created_at"]
     page_size = 10
     pagination_class = PageNumberPagination
 
-    filterset_fields = {
-        "start_time": ["gt", "lt", "gte", "lte", "date"],
-        "created_at": ["gt", "lt", "gte", "lte", "date"],
-        "updated_at": ["gt", "lt", "gte", "lte", "date"],
-    }
+    filterset_class = EventFilterSet
 
     def get_throttles(self):
         if self.request.method == 'POST':
@@ -50,16 +68,42 @@ class EventsListCreateApiView(ListCreateAPIView):
         return [throttle() for throttle in throttle_classes]
 
     def list(self, request, *args, **kwargs):
+        facets = None
+        if 'facets' in request.query_params:
+            facets = [facet for facet in request.query_params['facets'].split(',') if facet]
+            try:
+                tzinfo = ZoneInfo(request.query_params.get('tz', settings.TIME_ZONE))
+            except (ZoneInfoNotFoundError, ValueError):
+                return self.error_response("Unknown time zone.")
+            if not facets or not set(facets) <= set(event_facets.FACETS):
+                return self.error_response(f"facets must be some of {', '.join(event_facets.FACETS)}.")
+
         self.pagination_class.page_size = self.page_size
         response = super().list(request, *args, **kwargs)
+        payload = {
+            'events' : response.data.pop('results'),
+            'pagination':response.data
+        }
+        if facets:
+            # The facets of the whole filter set, not only of this page
+            filters = request.query_params.copy()
+            for param in ('page', 'ordering', 'facets', 'tz'):
+                filters.pop(param, None)
+            payload['facets'] = event_facets.get_facets(
+                self.filter_queryset(self.get_queryset()), filters, facets, tzinfo
+            )
         return Response({
             "status":"success",
             "message":"Events successfully retrieved.",
-            "payload": {
-                'events' : response.data.pop('results'),
-                'pagination':response.data
-                },
+            "payload": payload,
         }, status=status.HTTP_200_OK)
+
+    def error_response(self, message):
+        return Response({
+            "status":"error",
+            "message":message,
+            "payload":{}
+        }, status=status.HTTP_400_BAD_REQUEST)
     
     def create(self, request, *args, **kwargs):
         response = super().create(request, *args, **kwargs)
@@ -77,18 +121,28 @@ class EventsListCreateApiView(ListCreateAPIView):
 
 
 class EventRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+    use_read_replica = True
     permission_classes = (IsAuthenticatedOrReadOnly, IsParticipantorEventOrganizer)
     queryset = Event.objects.all()
     lookup_field = 'slug'
     serializer_class = event_serialziers.EventSerializer
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+        try:
+            instance = self.get_object()
+        except Http404:
+            # An occurrence of a series which has no ticket sold yet
+            instance = event_series.get_occurrence(kwargs['slug'])
+            if instance is None:
+                raise
         serializer = self.get_serializer(instance)
 
+        if instance.pk is not None:
+            view_counts.incr(instance.pk)
+
         user = request.user
         booked = False
-        if user.is_authenticated:
+        if user.is_authenticated and instance.pk is not None:
             ticket = Ticket.objects.filter(user=user, event=instance).first()
             if ticket:
                 booked = True
@@ -102,6 +156,26 @@ class EventRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
             }
         })
     
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            event = serializer.save()
+            # Tell the ticket holders in their notification inbox
+            outbox.enqueue(
+                notify_event_ticket_holders_task,
+                dedup_key=f'event-updated:{event.id}:{event.updated_at.isoformat()}',
+                event_id=event.id,
+                title="Event updated",
+                message=f'"{event.title}" has been updated, check the latest details.',
+            )
+            webhooks.event_updated(event)
+            # Read again on the next request, purchases may have changed the tickets sold since
+            # event was loaded
+            transaction.on_commit(lambda: forget_snapshot(event))
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        forget_snapshot(instance)
+
     def update(self, request, *args, **kwargs):
         response = super().update(request, *args, **kwargs)
         return Response({
@@ -128,13 +202,276 @@ class EventRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         return [throttle() for throttle in throttle_classes]
 
 
+class EventCalendarView(GenericAPIView):
+    """
+    Number of events per day from start to end (dates, this month by default) in the time
+    zone tz, optionally of one location or organizer (username).
+    """
+    use_read_replica = True
+    throttle_scope = 'unrestricted'
+
+    def error_response(self, message):
+        return Response({
+            "status":"error",
+            "message":message,
+            "payload":{}
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            tzinfo = ZoneInfo(params.get('tz', settings.TIME_ZONE))
+        except (ZoneInfoNotFoundError, ValueError):
+            return self.error_response("Unknown time zone.")
+        try:
+            today = timezone.localdate(timezone=tzinfo)
+            start = date.fromisoformat(params['start']) if 'start' in params else today.replace(day=1)
+            end = date.fromisoformat(params['end']) if 'end' in params else (start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+            # Days next to date.min or date.max have no datetime bounds in UTC
+            for moment in day_range(start, end, tzinfo):
+                moment.astimezone(dt_timezone.utc)
+            max_end = start + timedelta(days=settings.EVENT_CALENDAR_MAX_DAYS)
+        except (ValueError, OverflowError):
+            return self.error_response("Invalid start or end date.")
+        if not start <= end < max_end:
+            return self.error_response(
+                f"end must be after start and at most {settings.EVENT_CALENDAR_MAX_DAYS} days later."
+            )
+
+        days = get_calendar(start, end, tzinfo, location=params.get('location'), organizer=params.get('organizer'))
+        return Response({
+            "status":"success",
+            "message":"Event calendar retrieved successfully.",
+            "payload":{
+                "start":start,
+                "end":end,
+                "timezone":str(tzinfo),
+                "total":sum(days.values()),
+                "days":[{"date":day, "count":count} for day, count in days.items()],
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class EventAvailabilityListView(GenericAPIView):
+    """
+    Availability of up to EVENT_AVAILABILITY_MAX_EVENTS events at once, by slug and/or id
+    (comma separated query parameters, or lists in a POST body), for the event cards.
+    Served from the snapshot cache, the events missing from it are read with one query.
+    """
+    use_read_replica = True
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    throttle_classes = (ScopedRateThrottle,)
+    throttle_scope = 'availability'
+
+    def error_response(self, message):
+        return Response({
+            "status":"error",
+            "message":message,
+            "payload":{}
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    def get(self, request, *args, **kwargs):
+        slugs = [slug for slug in request.query_params.get('slugs', '').split(',') if slug]
+        ids = [event_id for event_id in request.query_params.get('ids', '').split(',') if event_id]
+        return self.availabilities(slugs, ids)
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return self.error_response("Send an object with the slugs and ids lists.")
+        slugs, ids = request.data.get('slugs', []), request.data.get('ids', [])
+        if not isinstance(slugs, list) or not isinstance(ids, list):
+            return self.error_response("slugs and ids must be lists.")
+        return self.availabilities([str(slug) for slug in slugs], ids)
+
+    def availabilities(self, slugs, ids):
+        try:
+            ids = [int(event_id) for event_id in ids]
+        except (TypeError, ValueError):
+            return self.error_response("ids must be integers.")
+        slugs, ids = list(dict.fromkeys(slugs)), list(dict.fromkeys(ids))
+        if not slugs and not ids:
+            return self.error_response("Give the slugs or ids of the events.")
+        if len(slugs) + len(ids) > settings.EVENT_AVAILABILITY_MAX_EVENTS:
+            return self.error_response(f"At most {settings.EVENT_AVAILABILITY_MAX_EVENTS} events at once.")
+
+        by_slug, by_id = get_snapshots(slugs, ids)
+        return Response({
+            "status":"success",
+            "message":"Event availability retrieved successfully.",
+            "payload":{
+                "slugs":by_slug,
+                "ids":by_id,
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class EventAutocompleteView(GenericAPIView):
+    """
+    Titles of the soonest upcoming events with a word starting with q, for the search box.
+    Served from the in-memory index of the process: no authentication, no database query.
+    """
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+    throttle_classes = (ScopedRateThrottle,)
+    throttle_scope = 'autocomplete'
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', settings.EVENT_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= 50:
+            return Response({
+                "status":"error",
+                "message":"limit must be between 1 and 50.",
+                "payload":{}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status":"success",
+            "message":"Event titles retrieved successfully.",
+            "payload":{
+                "events":autocomplete.get_index().search(request.query_params.get('q', ''), limit),
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class EventSeriesListCreateView(ListCreateAPIView):
+    use_read_replica = True
+    permission_classes = (IsAuthenticatedOrReadOnly, IsOrganizerOrReadOnly)
+    serializer_class = event_serialziers.EventSeriesSerializer
+    page_size = 10
+    pagination_class = PageNumberPagination
+
+    def get_throttles(self):
+        if self.request.method == 'POST':
+            throttle_classes = [event_throttles.RestrictedThrottle]
+        else:
+            throttle_classes = [event_throttles.UnrestrictedThrottle]
+        return [throttle() for throttle in throttle_classes]
+
+    def list(self, request, *args, **kwargs):
+        self.pagination_class.page_size = self.page_size
+        response = super().list(request, *args, **kwargs)
+        return Response({
+            "status":"success",
+            "message":"Event series successfully retrieved.",
+            "payload": {
+                'series' : response.data.pop('results'),
+                'pagination':response.data
+                },
+        }, status=status.HTTP_200_OK)
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        return Response({
+            "status": "success",
+            "message": "Event series successfully created.",
+            "payload": {'series' : response.data},
+        }, status=status.HTTP_201_CREATED)
+
+    def get_queryset(self):
+        return EventSeries.objects.all().select_related('created_by').order_by('-created_at')
+
+
+class EventSeriesRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+    """
+    Changes of a series apply to its occurrences which have no ticket sold yet.
+    """
+    use_read_replica = True
+    permission_classes = (IsAuthenticatedOrReadOnly, IsParticipantorEventOrganizer)
+    queryset = EventSeries.objects.all().select_related('created_by')
+    lookup_field = 'slug'
+    serializer_class = event_serialziers.EventSeriesSerializer
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        return Response({
+            "status":"success",
+            "message":"Event series retrieved.",
+            "payload": {
+                "series":response.data
+            }
+        }, status=status.HTTP_200_OK)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        return Response({
+            "status":"success",
+            "message":"Event series updated successfully!",
+            "payload":{
+                "series":response.data
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class EventOccurrenceListView(GenericAPIView):
+    """
+    Events and series occurrences starting between start and end (30 days from now by
+    default), by start time. Paged with the cursor of the next link.
+    """
+    use_read_replica = True
+    serializer_class = event_serialziers.EventSerializer
+    throttle_scope = 'unrestricted'
+    page_size = 10
+
+    def error_response(self, message):
+        return Response({
+            "status":"error",
+            "message":message,
+            "payload":{}
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            start = datetime.fromisoformat(params['start']) if 'start' in params else timezone.now()
+            end = datetime.fromisoformat(params['end']) if 'end' in params else start + timedelta(days=30)
+            after = None
+            if 'cursor' in params:
+                position = json.loads(base64.urlsafe_b64decode(params['cursor']))
+                if not (isinstance(position, list) and len(position) == 2 and all(isinstance(value, str) for value in position)):
+                    raise ValueError(position)
+                after = (datetime.fromisoformat(position[0]), position[1])
+        except (ValueError, TypeError, IndexError, KeyError):
+            return self.error_response("Invalid start, end or cursor.")
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end)
+        if not start < end <= start + timedelta(days=settings.EVENT_OCCURRENCE_MAX_WINDOW_DAYS):
+            return self.error_response(
+                f"end must be after start and at most {settings.EVENT_OCCURRENCE_MAX_WINDOW_DAYS} days later."
+            )
+
+        events, has_more = event_series.occurrence_page(
+            start, end, self.page_size, after=after, search=params.get('search')
+        )
+        next_url = None
+        if has_more:
+            last = events[-1]
+            cursor = base64.urlsafe_b64encode(json.dumps([last.start_time.isoformat(), last.slug]).encode()).decode()
+            next_url = request.build_absolute_uri(
+                f"{request.path}?{urlencode({**params.dict(), 'cursor': cursor})}"
+            )
+        return Response({
+            "status":"success",
+            "message":"Events successfully retrieved.",
+            "payload": {
+                'events':self.serializer_class(events, many=True).data,
+                'pagination':{'next':next_url},
+            },
+        }, status=status.HTTP_200_OK)
+
+
 class BuyEventTicketView(GenericAPIView):
     permission_classes = (IsAuthenticated, )
     serializer_class = event_serialziers.TicketSerializer
     throttle_scope = 'restricted'
     
     def post(self, request, slug, *args, **kwargs):
-        event = Event.objects.filter(slug=slug).first()
+        event = Event.objects.filter(slug=slug).first() or event_series.get_occurrence(slug)
         if not event:
             return Response({
                 "status":"error",
@@ -151,25 +488,48 @@ class BuyEventTicketView(GenericAPIView):
         
         user = request.user
 
+        sold_out = False
         with transaction.atomic():
+            if event.pk is None:
+                # First ticket of a series occurrence, save its event
+                event = event_series.materialize(event)
+                if event is None:
+                    return Response({
+                        "status":"error",
+                        "message":"This occurrence can't be booked, its slug is used by another event.",
+                        "payload":{}
+                    }, status=status.HTTP_400_BAD_REQUEST)
             ticket, created = Ticket.objects.get_or_create(event=event, user=user)
 
             if created:
-                event.no_of_participants += 1
-                event.save()
+                # Counted by the database, concurrent purchases can't sell more than the capacity
+                sold_out = not Event.objects.filter(
+                    Q(capacity__isnull=True) | Q(no_of_participants__lt=F('capacity')), pk=event.pk
+                ).update(no_of_participants=F('no_of_participants') + 1)
+                if sold_out:
+                    transaction.set_rollback(True)
+                    created = False
 
-        if created:
-            # Email
-            subject = "Ticket Confirmation"
-            template = "events/confirm_ticket.html"
-            context_data = {
-                'event':event,
-                'user':user
-            }
-            message = render_to_string(template_name=template, context=context_data)
-
-            send_email.delay(message=message, subject=subject, to_email=user.email)
+            if created:
+                event.refresh_from_db(fields=['no_of_participants', 'capacity'])
+                transaction.on_commit(lambda: publish_availability(event))
+                transaction.on_commit(lambda: cache_snapshot(event))
+
+                # Email, rendered by the worker
+                outbox.enqueue(
+                    send_templated_emails, dedup_key=f'ticket-confirmation:{ticket.id}',
+                    template_key='ticket_confirmation', object_ids=[ticket.id]
+                )
+                webhooks.ticket_created(ticket)
+
+        if sold_out:
+            return Response({
+                "status":"error",
+                "message":"This event is sold out.",
+                "payload":{}
+            }, status=status.HTTP_400_BAD_REQUEST)
 
+        if created:
             serializer = self.serializer_class(instance=ticket)
             return Response({
                 "status":"success",
@@ -204,7 +564,77 @@ class MyTicketView(ListAPIView):
         return Ticket.objects.filter(user=self.request.user).select_related('user', 'event')
     
 
+class TicketPublicKeyView(GenericAPIView):
+    """
+    Public key verifying the ticket tokens, downloaded by the door scanners.
+    """
+    permission_classes = (AllowAny,)
+    throttle_scope = 'unrestricted'
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "status":"success",
+            "message":"Ticket signing key retrieved successfully.",
+            "payload":{
+                "algorithm":"Ed25519",
+                "token_version":signing.TOKEN_VERSION,
+                "public_key":base64.b64encode(signing.public_key_bytes()).decode(),
+                "public_key_pem":signing.public_key_pem(),
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class EventCheckInView(GenericAPIView):
+    """
+    Sync of the tickets scanned at the door of an event, in batches.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = event_serialziers.TicketCheckInSerializer
+    throttle_scope = 'unrestricted'
+
+    def post(self, request, slug, *args, **kwargs):
+        event = Event.objects.filter(slug=slug).first()
+        if not event:
+            return Response({
+                "status":"error",
+                "message":"Invalid slug field.",
+                "payload":{}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if event.created_by_id != request.user.id and request.user.role != UserTypeChoices.ADMIN:
+            return Response({
+                "status":"error",
+                "message":"Only the organizer of the event can check in its attendees.",
+                "payload":{}
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid() is False:
+            return Response({
+                "status":"error",
+                "message":"Please correct the following errors.",
+                "payload":{
+                    "errors":serializer.errors
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = check_in(event, serializer.validated_data['scans'], checked_in_by=request.user)
+        return Response({
+            "status":"success",
+            "message":f"{len(result['checked_in'])} tickets checked in.",
+            "payload":{
+                "checked_in":result['checked_in'],
+                "duplicates":[
+                    {"ticket_id":ticket_id, "checked_in_at":checked_in_at}
+                    for ticket_id, checked_in_at in result['duplicates']
+                ],
+                "invalid":result['invalid'],
+            }
+        }, status=status.HTTP_200_OK)
+
+
 class EventFeedbackListCreateView(GenericAPIView):
+    use_read_replica = True
     permission_classes = [IsAuthenticatedOrReadOnly]
     serializer_class = event_serialziers.EventFeedbackSerializer
 
@@ -265,7 +695,9 @@ class EventFeedbackListCreateView(GenericAPIView):
                 }
             }, status=status.HTTP_400_BAD_REQUEST)
         validated_data = serializer.validated_data
-        feedback = EventFeedback.objects.create(user=user, event=event, **validated_data)
+        with transaction.atomic():
+            feedback = EventFeedback.objects.create(user=user, event=event, **validated_data)
+            webhooks.feedback_created(feedback)
 
         serializer = self.serializer_class(feedback)
         return Response({
@@ -278,6 +710,7 @@ class EventFeedbackListCreateView(GenericAPIView):
 
 
 class OraganizerEventList(GenericAPIView):
+    use_read_replica = True
     serializer_class = event_serialziers.EventSerializer
     throttle_scope = 'unrestricted'
     def get(self, request, *args, **kwargs):
@@ -302,4 +735,215 @@ class OraganizerEventList(GenericAPIView):
                 "events":serializer.data
             }
         }, status=status.HTTP_200_OK)
-    
\ No newline at end of file
+
+
+class EventBroadcastMixin:
+
+    def get_organizer_event(self, request, slug):
+        """
+        Return (event, error response), the user must be the organizer of the event.
+        """
+        event = Event.objects.filter(slug=slug).first()
+        if not event:
+            return None, Response({
+                "status":"error",
+                "message":"Invalid slug field.",
+                "payload":{}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if event.created_by_id != request.user.id:
+            return None, Response({
+                "status":"error",
+                "message":"Only the organizer of the event can broadcast to its attendees.",
+                "payload":{}
+            }, status=status.HTTP_403_FORBIDDEN)
+        return event, None
+
+
+class EventBroadcastListCreateView(EventBroadcastMixin, GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BroadcastSerializer
+
+    def get_throttles(self):
+        if self.request.method == 'POST':
+            throttle_classes = [event_throttles.RestrictedThrottle]
+        else:
+            throttle_classes = [event_throttles.UnrestrictedThrottle]
+        return [throttle() for throttle in throttle_classes]
+
+    def get(self, request, slug, *args, **kwargs):
+        event, error = self.get_organizer_event(request, slug)
+        if error:
+            return error
+
+        broadcasts = Broadcast.objects.filter(event=event).order_by('-id')
+        serializer = self.serializer_class(broadcasts, many=True)
+        return Response({
+            "status":"success",
+            "message":"Broadcasts retrieved successfully.",
+            "payload":{
+                "broadcasts":serializer.data
+            }
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request, slug, *args, **kwargs):
+        event, error = self.get_organizer_event(request, slug)
+        if error:
+            return error
+
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid() is False:
+            return Response({
+                "status":"error",
+                "message":"Please correct the following errors.",
+                "payload":{
+                    "errors":serializer.errors
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            broadcast = serializer.save(event=event, created_by=request.user)
+            outbox.enqueue(send_broadcast_task, dedup_key=f'broadcast:{broadcast.id}', broadcast_id=broadcast.id)
+
+        return Response({
+            "status":"success",
+            "message":"Your message will be sent to all the attendees.",
+            "payload":{
+                "broadcast":self.serializer_class(broadcast).data
+            }
+        }, status=status.HTTP_201_CREATED)
+
+
+class EventBroadcastResumeView(EventBroadcastMixin, GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BroadcastSerializer
+    throttle_scope = 'restricted'
+
+    def post(self, request, slug, pk, *args, **kwargs):
+        event, error = self.get_organizer_event(request, slug)
+        if error:
+            return error
+
+        with transaction.atomic():
+            # Failed, or left sending by a worker which died
+            updated = Broadcast.objects.filter(
+                claimable(), id=pk, event=event
+            ).exclude(status=BroadcastStatusChoices.PENDING).update(status=BroadcastStatusChoices.PENDING)
+            if updated:
+                outbox.enqueue(send_broadcast_task, broadcast_id=pk)
+
+        if not updated:
+            return Response({
+                "status":"error",
+                "message":"Only failed or stalled broadcasts can be resumed.",
+                "payload":{}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status":"success",
+            "message":"The broadcast will resume where it stopped.",
+            "payload":{
+                "broadcast":self.serializer_class(Broadcast.objects.get(id=pk)).data
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class ArchivedEventListView(ListAPIView):
+    use_read_replica = True
+    serializer_class = event_serialziers.ArchivedEventSerializer
+    throttle_classes = [event_throttles.UnrestrictedThrottle]
+    filter_backends = [SearchFilter, OrderingFilter, DjangoFilterBackend]
+    search_fields = ["title",]
+    ordering_fields = ["start_time", "id"]
+    ordering = ["-start_time"]
+    page_size = 10
+    pagination_class = PageNumberPagination
+
+    filterset_fields = {
+        "start_time": ["gt", "lt", "gte", "lte", "date"],
+    }
+
+    def list(self, request, *args, **kwargs):
+        self.pagination_class.page_size = self.page_size
+        response = super().list(request, *args, **kwargs)
+        return Response({
+            "status":"success",
+            "message":"Archived events successfully retrieved.",
+            "payload": {
+                'events' : response.data.pop('results'),
+                'pagination':response.data
+                },
+        }, status=status.HTTP_200_OK)
+
+    def get_queryset(self):
+        return ArchivedEvent.objects.all().select_related('created_by')
+
+
+class ArchivedEventRetrieveView(RetrieveAPIView):
+    use_read_replica = True
+    serializer_class = event_serialziers.ArchivedEventSerializer
+    throttle_classes = [event_throttles.UnrestrictedThrottle]
+    queryset = ArchivedEvent.objects.all().select_related('created_by')
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+
+        user = request.user
+        booked = False
+        if user.is_authenticated:
+            booked = ArchivedTicket.objects.filter(user=user, event=instance).exists()
+
+        return Response({
+            "status":"success",
+            "message":"Archived Event Details Retrieved",
+            "payload": {
+                "booked":booked,
+                "event":serializer.data
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class ArchivedEventFeedbackListView(GenericAPIView):
+    use_read_replica = True
+    serializer_class = event_serialziers.ArchivedEventFeedbackSerializer
+    throttle_scope = 'unrestricted'
+
+    def get(self, request, *args, **kwargs):
+        if not ArchivedEvent.objects.filter(pk=kwargs['pk']).exists():
+            return Response({
+                "status":"error",
+                "message":"No archived event found.",
+                "payload":{}
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        feedbacks = ArchivedEventFeedback.objects.filter(event_id=kwargs['pk'])
+        serializer = self.serializer_class(feedbacks, many=True)
+
+        return Response({
+            "status":"success",
+            "message":"Feedbacks retrieved successfully.",
+            "payload":{
+                "feedbacks":serializer.data
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class MyArchivedTicketView(ListAPIView):
+    permission_classes = IsAuthenticated,
+    serializer_class = event_serialziers.ArchivedTicketSerializer
+    throttle_scope  = 'unrestricted'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        serializer = self.serializer_class(queryset, many=True)
+        return Response({
+            "status":"success",
+            "message":"Archived tickets retrieved successfully!",
+            "payload": {
+                'tickets':serializer.data
+            },
+        }, status=status.HTTP_200_OK)
+
+    def get_queryset(self):
+        return ArchivedTicket.objects.filter(user=self.request.user).select_related('user', 'event__created_by')
@@ -1,3 +1,9 @@
 from django.contrib import admin
-
+from .models import Notification, NotificationCounter, Broadcast, EventReminder, DeadLetter, NotificationPreference
 # Register your models here.
+admin.site.register(Notification)
+admin.site.register(NotificationCounter)
+admin.site.register(Broadcast)
+admin.site.register(EventReminder)
+admin.site.register(DeadLetter)
+admin.site.register(NotificationPreference)
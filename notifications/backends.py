@@ -0,0 +1,250 @@
+"""
+SMTP email backend which keeps the authenticated SMTP connections of a process open
+between emails instead of connecting (TCP, STARTTLS, AUTH) for every email.
+
+Settings:
+    EMAIL_POOL_SIZE            idle connections kept per process
+    EMAIL_POOL_IDLE_TIMEOUT    seconds after which an idle connection is closed
+    EMAIL_POOL_MAX_MESSAGES    messages sent over a connection before it is replaced
+    EMAIL_RATE_LIMITS          emails per second per process of each kind of email, picked
+                               with get_connection(rate_limit='bulk')
+
+Like core.db.pool the pool (and the rate limiters) are per process: celery prefork
+children don't share the connections of their parent.
+"""
+import atexit
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.mail.backends import smtp
+
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the message is retried once on a new connection
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+# Errors of one message only, the session is reset and the connection can be reused
+RECIPIENT_ERRORS = (smtplib.SMTPRecipientsRefused,)
+
+
+class PooledSMTPConnection:
+    __slots__ = ('connection', 'messages_sent', 'returned_at')
+
+    def __init__(self, connection, messages_sent=0):
+        self.connection = connection
+        self.messages_sent = messages_sent
+        self.returned_at = time.monotonic()
+
+
+class SMTPConnectionPool:
+
+    def __init__(self, size, idle_timeout):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def get(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                pooled = self._idle.pop()
+                if now - pooled.returned_at <= self.idle_timeout:
+                    return pooled
+                quit_quietly(pooled.connection)
+        return None
+
+    def put(self, connection, messages_sent):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(PooledSMTPConnection(connection, messages_sent))
+                return
+        quit_quietly(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            quit_quietly(pooled.connection)
+
+
+def quit_quietly(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+class RateLimiter:
+    """
+    Token bucket allowing rate emails per second, with bursts of up to one second's worth.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            # Take the token now and wait for it outside of the lock
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+_pools = {}
+_rate_limiters = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _pools_pid
+    if os.getpid() != _pools_pid:
+        # The parent's sockets are left alone, it still uses them
+        _pools.clear()
+        _rate_limiters.clear()
+        _pools_pid = os.getpid()
+
+
+def get_rate_limiter(key):
+    """
+    Return the rate limiter of the EMAIL_RATE_LIMITS entry key, None if it isn't limited.
+    """
+    rate = settings.EMAIL_RATE_LIMITS.get(key)
+    if not rate:
+        return None
+    with _pools_lock:
+        _reset_after_fork()
+        limiter = _rate_limiters.get(key)
+        if limiter is None or limiter.rate != rate:
+            limiter = _rate_limiters[key] = RateLimiter(rate)
+        return limiter
+
+
+def get_pool(key):
+    with _pools_lock:
+        _reset_after_fork()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPConnectionPool(
+                size=settings.EMAIL_POOL_SIZE, idle_timeout=settings.EMAIL_POOL_IDLE_TIMEOUT
+            )
+        return pool
+
+
+@atexit.register
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values()) if os.getpid() == _pools_pid else []
+    for pool in pools:
+        pool.close()
+
+
+class PooledSMTPEmailBackend(smtp.EmailBackend):
+
+    def __init__(self, *args, rate_limit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = get_rate_limiter(rate_limit) if rate_limit else None
+        self.max_messages = settings.EMAIL_POOL_MAX_MESSAGES
+        self.messages_sent = 0
+        self.broken = False
+
+    @property
+    def pool(self):
+        return get_pool((self.host, self.port, self.username, self.use_tls, self.use_ssl))
+
+    def open(self):
+        if self.connection:
+            return False
+
+        pooled = self.pool.get()
+        if pooled is not None:
+            self.connection = pooled.connection
+            self.messages_sent = pooled.messages_sent
+            self.broken = False
+            return True
+
+        opened = super().open()
+        self.messages_sent = 0
+        self.broken = False
+        return opened
+
+    def close(self):
+        if self.connection is None:
+            return
+        if self.broken or self.messages_sent >= self.max_messages:
+            super().close()
+            return
+        self.pool.put(self.connection, self.messages_sent)
+        self.connection = None
+
+    def reconnect(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except OSError:
+                pass
+            self.connection = None
+        super().open()
+        self.messages_sent = 0
+        self.broken = False
+
+    def _send(self, email_message):
+        if self.rate_limiter is not None and email_message.recipients():
+            self.rate_limiter.acquire()
+        try:
+            if self.messages_sent >= self.max_messages:
+                quit_quietly(self.connection)
+                self.connection = None
+                self.reconnect()
+            try:
+                sent = super()._send(email_message)
+            except RECONNECT_ERRORS:
+                logger.info("SMTP connection lost, retrying on a new connection.")
+                self.reconnect()
+                sent = super()._send(email_message)
+        except RECIPIENT_ERRORS:
+            raise
+        except Exception:
+            # Don't put a connection in an unknown state back into the pool
+            self.broken = True
+            raise
+
+        if sent:
+            self.messages_sent += 1
+        return sent
+
+
+def send_each(connection, messages):
+    """
+    Send messages, (key, message) pairs, one at a time over connection and yield (key, sent)
+    once each is handled: sent, or skipped because the server refused its recipients
+    (logged). Pairs without a message are yielded as they come, not sent. Other errors are
+    raised, the keys yielded until then were handled.
+    """
+    connection.open()
+    try:
+        for key, message in messages:
+            sent = False
+            if message is not None:
+                try:
+                    connection.send_messages([message])
+                    sent = True
+                except RECIPIENT_ERRORS as e:
+                    logger.warning("Skipped the email %r to the refused recipients %s.", message.subject, list(e.recipients))
+            yield key, sent
+    finally:
+        connection.close()
@@ -0,0 +1,130 @@
+"""
+Email broadcasts to the ticket holders of an event.
+
+The recipients are streamed off the ticket table with a server-side cursor in ticket id
+order, the email is rendered once per broadcast, and every chunk of recipients is sent
+over a single SMTP connection (recipients who chose digests get it in their next digest).
+Progress is saved after each chunk (up to the last recipient handled when sending fails
+halfway), so a broadcast which failed resumes after the last ticket it reached. Recipients
+refused by the mail server are logged and skipped. A broadcast is claimed with a status
+update before it is sent, so it is never sent by two workers at once. The claim is a lease
+renewed after every chunk (heartbeat_at): a broadcast whose worker died while sending it can
+be claimed again once BROADCAST_LEASE_SECONDS passed, and a worker which lost its claim stops.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import digests
+from .backends import send_each
+from .choices import BroadcastStatusChoices
+from .models import Broadcast
+
+
+def _send_chunk(broadcast, body, chunk):
+    digest_user_ids = digests.digest_users([user_id for _, user_id, _ in chunk])
+    messages = [
+        (recipient, None if recipient[1] in digest_user_ids else EmailMessage(
+            subject=broadcast.subject, body=body, from_email=settings.EMAIL_HOST_USER, to=[recipient[2]]
+        ))
+        for recipient in chunk
+    ]
+    # Progress is saved up to the last recipient handled, also when sending fails halfway
+    handled, claimed = [], True
+    try:
+        for recipient, _ in send_each(get_connection(rate_limit='bulk'), messages):
+            handled.append(recipient)
+    finally:
+        if handled:
+            claimed = _save_progress(broadcast, handled, digest_user_ids)
+    return claimed
+
+
+def _save_progress(broadcast, handled, digest_user_ids):
+    """
+    Save the progress and renew the claim of broadcast. Returns False when another worker
+    claimed it since.
+    """
+    last_ticket_id, heartbeat_at = handled[-1][0], timezone.now()
+    claimed = Broadcast.objects.filter(
+        id=broadcast.id, status=BroadcastStatusChoices.SENDING, heartbeat_at=broadcast.heartbeat_at
+    ).update(
+        last_ticket_id=last_ticket_id, sent_count=F('sent_count') + len(handled), heartbeat_at=heartbeat_at
+    )
+    if not claimed:
+        return False
+    digests.buffer(
+        [user_id for _, user_id, _ in handled if user_id in digest_user_ids],
+        broadcast.subject, broadcast.message, event=broadcast.event,
+    )
+    broadcast.last_ticket_id, broadcast.heartbeat_at = last_ticket_id, heartbeat_at
+    broadcast.sent_count += len(handled)
+    return True
+
+
+def claimable(now=None):
+    """
+    Filter of the broadcasts which can be claimed: pending, failed, or sending without
+    progress for BROADCAST_LEASE_SECONDS.
+    """
+    stale = (now or timezone.now()) - timedelta(seconds=settings.BROADCAST_LEASE_SECONDS)
+    return Q(status__in=[BroadcastStatusChoices.PENDING, BroadcastStatusChoices.FAILED]) | Q(
+        Q(heartbeat_at__isnull=True) | Q(heartbeat_at__lt=stale), status=BroadcastStatusChoices.SENDING
+    )
+
+
+def send_broadcast(broadcast, chunk_size=None):
+    """
+    Email broadcast to the ticket holders of its event after broadcast.last_ticket_id.
+    """
+    from events.models import Ticket
+
+    chunk_size = chunk_size or settings.BROADCAST_CHUNK_SIZE
+    tickets = Ticket.objects.filter(event_id=broadcast.event_id)
+    # Claimed by one sender at a time: a resumed broadcast and a pending retry of the
+    # failed one don't both send it
+    now = timezone.now()
+    claimed = Broadcast.objects.filter(claimable(now), id=broadcast.id).update(
+        status=BroadcastStatusChoices.SENDING, heartbeat_at=now, total_recipients=tickets.count(), error=''
+    )
+    broadcast.refresh_from_db()
+    if not claimed:
+        return broadcast
+
+    body = render_to_string('notifications/broadcast.html', {'event': broadcast.event, 'broadcast': broadcast})
+    recipients = (
+        tickets.filter(id__gt=broadcast.last_ticket_id)
+        .order_by('id').values_list('id', 'user_id', 'user__email')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    chunk, claimed = [], True
+    for recipient in recipients:
+        chunk.append(recipient)
+        if len(chunk) == chunk_size:
+            claimed = _send_chunk(broadcast, body, chunk)
+            chunk = []
+            if not claimed:
+                break
+    if chunk and claimed:
+        claimed = _send_chunk(broadcast, body, chunk)
+    if not claimed:
+        # Sent by the worker which claimed it again
+        broadcast.refresh_from_db()
+        return broadcast
+
+    Broadcast.objects.filter(
+        id=broadcast.id, status=BroadcastStatusChoices.SENDING, heartbeat_at=broadcast.heartbeat_at
+    ).update(
+        status=BroadcastStatusChoices.SENT, completed_at=timezone.now()
+    )
+    broadcast.refresh_from_db()
+    return broadcast
+
+
+def mark_failed(broadcast_id, error):
+    Broadcast.objects.filter(id=broadcast_id).update(status=BroadcastStatusChoices.FAILED, error=error)
@@ -0,0 +1,24 @@
+class BroadcastStatusChoices:
+    PENDING = 'PENDING'
+    SENDING = 'SENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+
+    choices = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed')
+    ]
+
+
+class EmailDigestChoices:
+    INSTANT = 'INSTANT'
+    HOURLY = 'HOURLY'
+    DAILY = 'DAILY'
+
+    choices = [
+        (INSTANT, 'Instant'),
+        (HOURLY, 'Hourly digest'),
+        (DAILY, 'Daily digest')
+    ]
@@ -0,0 +1,81 @@
+"""
+Retries and dead letters of the email tasks.
+
+Transient errors (dropped connections, timeouts, 4xx SMTP replies) are retried up to
+EMAIL_TASK_MAX_RETRIES times with exponential backoff and full jitter. Tasks which failed
+for good, on a permanent error or out of retries, are stored as DeadLetter and can be
+replayed with `manage.py replay_dead_letters`.
+"""
+import inspect
+import logging
+import smtplib
+
+from celery import Task
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DeadLetter
+
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+def is_transient(exc):
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    return False
+
+
+class EmailTask(Task):
+    ignore_result = True
+    max_retries = settings.EMAIL_TASK_MAX_RETRIES
+
+    def retry_if_transient(self, exc):
+        """
+        Retry the task if exc is transient and retries are left, return otherwise.
+        """
+        if is_transient(exc) and self.request.retries < self.max_retries:
+            countdown = get_exponential_backoff_interval(
+                factor=settings.EMAIL_RETRY_BACKOFF,
+                retries=self.request.retries,
+                maximum=settings.EMAIL_RETRY_BACKOFF_MAX,
+                full_jitter=True,
+            )
+            raise self.retry(exc=exc, countdown=countdown)
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        logger.error(f"Task {self.name}[{task_id}] failed for good, moved to the dead letters. Error: {str(exc)}")
+        if args:
+            kwargs = inspect.signature(self.run).bind(*args, **kwargs).arguments
+        DeadLetter.objects.create(
+            task_name=self.name,
+            task_id=task_id or '',
+            kwargs=dict(kwargs),
+            exception=type(exc).__name__,
+            error=str(exc),
+            attempts=self.request.retries + 1,
+        )
+
+
+def replay(dead_letters):
+    """
+    Publish dead_letters again through the outbox, return how many were replayed.
+    """
+    from . import outbox
+
+    replayed = 0
+    with transaction.atomic():
+        for dead_letter in dead_letters.filter(replayed_at__isnull=True).select_for_update(skip_locked=True):
+            outbox.enqueue(dead_letter.task_name, **dead_letter.kwargs)
+            dead_letter.replayed_at = timezone.now()
+            dead_letter.save(update_fields=['replayed_at'])
+            replayed += 1
+    return replayed
@@ -0,0 +1,130 @@
+"""
+Email digests.
+
+Reminders and broadcasts to users who chose an hourly or daily digest
+(NotificationPreference) aren't emailed one by one: they are buffered as DigestEntry rows
+and a beat job sends each user one digest of everything buffered once their oldest entry
+is a digest period old, or earlier when an entry has to go out sooner (a reminder must
+arrive before the event starts). Users are flushed DIGEST_CHUNK_SIZE at a time, with their
+preference rows locked so concurrent flushes skip each other's users. Recipients refused by
+the mail server are logged and skipped like the ones of reminders and broadcasts.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Min, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .backends import send_each
+from .choices import EmailDigestChoices
+from .models import NotificationPreference, DigestEntry
+
+
+PERIODS = {
+    EmailDigestChoices.HOURLY: timedelta(hours=1),
+    EmailDigestChoices.DAILY: timedelta(days=1),
+}
+
+
+def digest_users(user_ids):
+    """
+    Return the users of user_ids who get digests.
+    """
+    return set(
+        NotificationPreference.objects.filter(user_id__in=user_ids)
+        .exclude(email_digest=EmailDigestChoices.INSTANT).values_list('user_id', flat=True)
+    )
+
+
+def buffer(user_ids, title, message, event=None, send_before=None):
+    DigestEntry.objects.bulk_create([
+        DigestEntry(user_id=user_id, event=event, title=title, message=message, send_before=send_before)
+        for user_id in user_ids
+    ])
+
+
+def due_users(now, after_user_id, limit):
+    """
+    Return up to limit ids (above after_user_id) of users whose digest is due at now: their
+    oldest entry is a digest period old or an entry must be sent by now. Users who went back
+    to instant emails get what was buffered for them right away.
+    """
+    due = Q(email_digest=EmailDigestChoices.INSTANT) | Q(deadline__lte=now)
+    for mode, period in PERIODS.items():
+        due |= Q(email_digest=mode, oldest__lte=now - period)
+    return list(
+        NotificationPreference.objects.filter(user_id__gt=after_user_id)
+        .annotate(
+            oldest=Min('user__digest_entries__created_at'),
+            deadline=Min('user__digest_entries__send_before'),
+        )
+        .filter(due, oldest__isnull=False)
+        .order_by('user_id').values_list('user_id', flat=True)[:limit]
+    )
+
+
+def _send_digests(user_ids, template):
+    """
+    Send the digests of user_ids and delete the entries of the users handled. Returns how
+    many were sent and the error which stopped the sending, if any.
+    """
+    entries = list(
+        DigestEntry.objects.filter(user_id__in=user_ids)
+        .select_related('user', 'event').order_by('user_id', 'id')
+    )
+    digests = {}
+    for entry in entries:
+        digests.setdefault(entry.user_id, []).append(entry)
+
+    messages = [
+        (user_id, EmailMessage(
+            subject=f"Your Eventizer digest: {len(user_entries)} updates",
+            body=template.render({'user': user_entries[0].user, 'entries': user_entries}),
+            from_email=settings.EMAIL_HOST_USER,
+            to=[user_entries[0].user.email],
+        ))
+        for user_id, user_entries in digests.items()
+    ]
+    # Refused recipients are skipped, and the entries of the users handled before an error
+    # are deleted so their digest isn't sent again
+    handled, sent, error = [], 0, None
+    try:
+        for user_id, user_sent in send_each(get_connection(rate_limit='bulk'), messages):
+            handled.append(user_id)
+            sent += user_sent
+    except Exception as e:
+        error = e
+    DigestEntry.objects.filter(id__in=[entry.id for user_id in handled for entry in digests[user_id]]).delete()
+    return sent, error
+
+
+def flush_digests(now=None, chunk_size=None):
+    """
+    Send the digests due at now, return how many were sent.
+    """
+    now = now or timezone.now()
+    chunk_size = chunk_size or settings.DIGEST_CHUNK_SIZE
+    template = get_template('notifications/digest.html')
+
+    sent, last_user_id = 0, 0
+    while True:
+        user_ids = due_users(now, last_user_id, chunk_size)
+        if not user_ids:
+            return sent
+        last_user_id = user_ids[-1]
+
+        error = None
+        with transaction.atomic():
+            locked = list(
+                NotificationPreference.objects.select_for_update(skip_locked=True)
+                .filter(user_id__in=user_ids).values_list('user_id', flat=True)
+            )
+            if locked:
+                chunk_sent, error = _send_digests(locked, template)
+                sent += chunk_sent
+        # Raised once the progress is committed
+        if error is not None:
+            raise error
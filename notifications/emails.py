@@ -0,0 +1,101 @@
+"""
+Templated emails rendered by the Celery workers.
+
+Requests enqueue send_templated_emails with the key of an email and the primary keys of
+its objects (a ticket, a user), the worker loads the objects, renders the template
+(compiled once per process by Django's cached template loader) and sends the batch over
+one SMTP connection.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import get_template
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+
+logger = logging.getLogger(__name__)
+
+
+class TemplatedEmail:
+    key = None
+    subject = None
+    template_name = None
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_recipient(self, obj):
+        raise NotImplementedError
+
+    def get_context(self, obj):
+        raise NotImplementedError
+
+    def build_messages(self, object_ids):
+        template = get_template(self.template_name)
+        return [
+            EmailMessage(
+                subject=self.subject,
+                body=template.render(self.get_context(obj)),
+                from_email=settings.EMAIL_HOST_USER,
+                to=[self.get_recipient(obj)],
+            )
+            for obj in self.get_queryset().filter(pk__in=object_ids)
+        ]
+
+
+class TicketConfirmationEmail(TemplatedEmail):
+    key = 'ticket_confirmation'
+    subject = "Ticket Confirmation"
+    template_name = "events/confirm_ticket.html"
+
+    def get_queryset(self):
+        from events.models import Ticket
+        return Ticket.objects.select_related('user', 'event')
+
+    def get_recipient(self, ticket):
+        return ticket.user.email
+
+    def get_context(self, ticket):
+        return {
+            'event': ticket.event,
+            'user': ticket.user
+        }
+
+
+class AccountVerificationEmail(TemplatedEmail):
+    key = 'account_verification'
+    subject = "Verify Email for your account on Eventizer"
+    template_name = "authentication/acc_activate_mail.html"
+
+    def get_queryset(self):
+        return get_user_model().objects.filter(is_active=False)
+
+    def get_recipient(self, user):
+        return user.email
+
+    def get_context(self, user):
+        from authentication.tokens import account_activation_token
+
+        return {
+            "user": user,
+            "host": settings.FRONTEND_HOST,
+            "uidb64": urlsafe_base64_encode(force_bytes(user.id)),
+            "token": account_activation_token.make_token(user=user),
+            "protocol": settings.FRONTEND_PROTOCOL
+        }
+
+
+EMAILS = {email.key: email for email in (TicketConfirmationEmail(), AccountVerificationEmail())}
+
+
+def send_templated(key, object_ids):
+    """
+    Render and send the email key to every object of object_ids, return how many were sent.
+    """
+    messages = EMAILS[key].build_messages(object_ids)
+    if not messages:
+        return 0
+    return get_connection(rate_limit='transactional').send_messages(messages)
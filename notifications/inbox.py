@@ -0,0 +1,85 @@
+"""
+In-app notification inbox. Every change to the unread notifications of a user goes through
+this module, which keeps NotificationCounter in sync in the same transaction.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .models import Notification, NotificationCounter
+
+
+def _increment_unread(user_ids):
+    # One upsert for the whole chunk, users get their counter row on their first notification
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {NotificationCounter._meta.db_table} (user_id, unread_count)
+            SELECT user_id, 1 FROM unnest(%s::bigint[]) AS user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET unread_count = {NotificationCounter._meta.db_table}.unread_count + 1
+        """, [list(user_ids)])
+
+
+def notify_users(user_ids, title, message, event=None):
+    """
+    Create a notification for each user of user_ids (distinct ids) and return how many were created.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    with transaction.atomic():
+        Notification.objects.bulk_create([
+            Notification(user_id=user_id, event=event, title=title, message=message)
+            for user_id in user_ids
+        ])
+        _increment_unread(user_ids)
+    return len(user_ids)
+
+
+def notify_event_ticket_holders(event, title, message, chunk_size=None):
+    """
+    Notify every ticket holder of event, chunk_size users per transaction.
+    """
+    from events.models import Ticket
+
+    chunk_size = chunk_size or settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    user_ids = (
+        Ticket.objects.filter(event=event)
+        .order_by('user_id').values_list('user_id', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    notified, chunk = 0, []
+    for user_id in user_ids:
+        chunk.append(user_id)
+        if len(chunk) == chunk_size:
+            notified += notify_users(chunk, title, message, event=event)
+            chunk = []
+    notified += notify_users(chunk, title, message, event=event)
+    return notified
+
+
+def mark_read(user, ids=None):
+    """
+    Mark the notifications of user with the given ids (all of them if ids is None) as read.
+    Returns how many notifications were unread.
+    """
+    notifications = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+
+    with transaction.atomic():
+        updated = notifications.update(is_read=True)
+        if updated:
+            NotificationCounter.objects.filter(user=user).update(
+                unread_count=Greatest(F('unread_count') - updated, 0)
+            )
+    return updated
+
+
+def unread_count(user):
+    return (
+        NotificationCounter.objects.filter(user=user)
+        .values_list('unread_count', flat=True).first()
+    ) or 0
@@ -0,0 +1,47 @@
+import select
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish the outbox messages to the Celery broker. Runs until stopped, relaying "
+        "messages as soon as the transactions which enqueued them commit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Relay the pending messages and exit.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Seconds between two polls of the outbox when no NOTIFY arrives.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['once']:
+            published = outbox.relay_pending(batch_size)
+            self.stdout.write(f"Published {published} outbox messages.")
+            return
+
+        interval = options['interval'] or settings.OUTBOX_RELAY_INTERVAL
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {outbox.NOTIFY_CHANNEL}")
+        pg_connection = connection.connection
+        self.stdout.write(f"Relaying the outbox (polling every {interval}s).")
+
+        try:
+            while True:
+                published = outbox.relay_pending(batch_size)
+                if published:
+                    self.stdout.write(f"Published {published} outbox messages.")
+                if select.select([pg_connection], [], [], interval) != ([], [], []):
+                    pg_connection.poll()
+                    pg_connection.notifies.clear()
+        finally:
+            # The connection may go back to the connection pool
+            with connection.cursor() as cursor:
+                cursor.execute("UNLISTEN *")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from notifications.delivery import replay
+from notifications.models import DeadLetter
+
+
+class Command(BaseCommand):
+    help = "Publish the tasks which failed for good (dead letters) again, through the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="Dead letters to replay, all of them by default.")
+        parser.add_argument('--task', help="Only replay the dead letters of this task, e.g. notifications.tasks.send_email")
+        parser.add_argument('--exception', help="Only replay the dead letters which failed with this exception class.")
+        parser.add_argument('--dry-run', action='store_true', help="Count the dead letters without replaying them.")
+
+    def handle(self, *args, **options):
+        dead_letters = DeadLetter.objects.filter(replayed_at__isnull=True).order_by('id')
+        if options['ids']:
+            dead_letters = dead_letters.filter(id__in=options['ids'])
+        if options['task']:
+            dead_letters = dead_letters.filter(task_name=options['task'])
+        if options['exception']:
+            dead_letters = dead_letters.filter(exception=options['exception'])
+
+        if options['dry_run']:
+            self.stdout.write(f"{dead_letters.count()} dead letters would be replayed.")
+            return
+        self.stdout.write(f"Replayed {replay(dead_letters)} dead letters.")
@@ -0,0 +1,135 @@
+"""
+Per task metrics of the Celery workers.
+
+Every worker process counts the attempts, successes, retries and failures (by exception
+class) and the run time of each task from Celery's signals in memory, and adds its
+counters to the TaskMetric table with a single upsert every TASK_METRICS_FLUSH_INTERVAL
+seconds, so tracking a task doesn't cost a write of its own.
+
+Counters whose name ends with '_max' keep the largest value instead of adding up.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from celery import signals
+from django.conf import settings
+from django.db import connection
+
+from .models import TaskMetric
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters = Counter()
+_maxima = {}
+_started = {}
+_last_flush = time.monotonic()
+
+
+def incr(task_name, name, value=1):
+    with _lock:
+        _counters[(task_name, name)] += value
+
+
+def observe_max(task_name, name, value):
+    with _lock:
+        key = (task_name, name)
+        _maxima[key] = max(_maxima.get(key, value), value)
+
+
+def flush():
+    """
+    Add the counters of this process to TaskMetric and reset them.
+    """
+    global _last_flush
+    with _lock:
+        counters, maxima = dict(_counters), dict(_maxima)
+        _counters.clear()
+        _maxima.clear()
+        _last_flush = time.monotonic()
+
+    rows = list(counters.items()) + list(maxima.items())
+    if not rows:
+        return 0
+    table = TaskMetric._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {table} (task_name, name, value)
+                SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::bigint[])
+                ON CONFLICT (task_name, name) DO UPDATE
+                SET value = CASE WHEN right(EXCLUDED.name, 4) = '_max'
+                    THEN GREATEST({table}.value, EXCLUDED.value)
+                    ELSE {table}.value + EXCLUDED.value END
+            """, [
+                [task_name for (task_name, _), _ in rows],
+                [name for (_, name), _ in rows],
+                [value for _, value in rows],
+            ])
+    except Exception:
+        logger.exception("Could not save the task metrics, keeping them for the next flush.")
+        for key, value in counters.items():
+            incr(*key, value)
+        for key, value in maxima.items():
+            observe_max(*key, value)
+        return 0
+    return len(rows)
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.TASK_METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def get_metrics():
+    """
+    Return the saved metrics as {task_name: {name: value}}.
+    """
+    metrics = {}
+    for task_name, name, value in TaskMetric.objects.order_by('task_name', 'name').values_list('task_name', 'name', 'value'):
+        metrics.setdefault(task_name, {})[name] = value
+    return metrics
+
+
+def exception_name(exc):
+    # Retries are reported with the Retry exception wrapping the error
+    exc = getattr(exc, 'exc', None) or exc
+    return type(exc).__name__
+
+
+@signals.task_prerun.connect
+def on_task_prerun(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.monotonic()
+    incr(task.name, 'attempts')
+
+
+@signals.task_postrun.connect
+def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is not None:
+        runtime_ms = int((time.monotonic() - started) * 1000)
+        incr(task.name, 'runtime_ms_total', runtime_ms)
+        observe_max(task.name, 'runtime_ms_max', runtime_ms)
+    if state == 'SUCCESS':
+        incr(task.name, 'succeeded')
+    maybe_flush()
+
+
+@signals.task_retry.connect
+def on_task_retry(sender=None, reason=None, **kwargs):
+    incr(sender.name, 'retried')
+    incr(sender.name, f'retry:{exception_name(reason)}')
+
+
+@signals.task_failure.connect
+def on_task_failure(sender=None, exception=None, **kwargs):
+    incr(sender.name, 'failed')
+    incr(sender.name, f'failure:{exception_name(exception)}')
+
+
+@signals.worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    flush()
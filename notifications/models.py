@@ -1,3 +1,187 @@
+from django.contrib.auth import get_user_model
 from django.db import models
 
+from .choices import BroadcastStatusChoices, EmailDigestChoices
+
+
+User = get_user_model()
+
 # Create your models here.
+class Notification(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    event = models.ForeignKey('events.Event', on_delete=models.SET_NULL, null=True, blank=True, related_name='notifications')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Inbox pages (cursor pagination on -id)
+            models.Index(fields=['user', '-id'], name='notification_inbox_idx'),
+            # Mark all as read
+            models.Index(fields=['user'], condition=models.Q(is_read=False), name='notification_unread_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'user_{self.user_id}_{self.title}'
+
+
+class NotificationCounter(models.Model):
+    """
+    Unread notifications of a user, kept up to date by notifications.inbox so the unread
+    count never needs a COUNT(*) over the inbox.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f'user_{self.user_id}_{self.unread_count}'
+
+
+class Broadcast(models.Model):
+    """
+    A message from an organizer to every ticket holder of an event, emailed by
+    notifications.broadcast. last_ticket_id is the progress cursor: tickets up to it
+    have been emailed, so a failed broadcast resumes where it stopped.
+    """
+    event = models.ForeignKey('events.Event', on_delete=models.SET_NULL, null=True, related_name='broadcasts')
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcasts')
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+
+    status = models.CharField(max_length=10, choices=BroadcastStatusChoices.choices, default=BroadcastStatusChoices.PENDING)
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    last_ticket_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    # Written by the worker sending it when claiming it and after every chunk
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f'event_{self.event_id}_{self.subject}'
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task to publish, written in the transaction of the change which caused it
+    and published by notifications.outbox.relay once that transaction committed.
+    """
+    task_name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    # Enqueuing a message twice with the same key publishes it once
+    dedup_key = models.CharField(max_length=255, unique=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(published_at__isnull=True), name='outbox_pending_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.task_name}_{self.dedup_key}'
+
+
+class EventReminder(models.Model):
+    """
+    Progress of the reminder sent window_hours before an event, one row per event and
+    window. Tickets up to last_ticket_id have been reminded, so reruns (and other beat
+    instances, which skip a reminder row another worker has locked) only email the
+    tickets bought since.
+    """
+    event = models.ForeignKey('events.Event', on_delete=models.CASCADE, related_name='reminders')
+    window_hours = models.PositiveSmallIntegerField()
+    last_ticket_id = models.BigIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'window_hours'], name='unique_event_reminder_window')
+        ]
+
+    def __str__(self) -> str:
+        return f'event_{self.event_id}_{self.window_hours}h'
+
+
+class DeadLetter(models.Model):
+    """
+    A task which failed for good (permanent error or out of retries), kept with its
+    arguments so it can be replayed with `manage.py replay_dead_letters`.
+    """
+    task_name = models.CharField(max_length=255)
+    task_id = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    exception = models.CharField(max_length=255)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    replayed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(replayed_at__isnull=True), name='deadletter_pending_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.task_name}_{self.exception}'
+
+
+class TaskMetric(models.Model):
+    """
+    Counters of a Celery task (attempts, retries, failures by exception class, run time),
+    aggregated in memory by every worker process and added up here by notifications.metrics.
+    """
+    task_name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task_name', 'name'], name='unique_task_metric')
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.task_name}_{self.name}'
+
+
+class NotificationPreference(models.Model):
+    """
+    How a user gets reminder and broadcast emails: one by one, or coalesced into an hourly
+    or daily digest by notifications.digests. Users without a row get them one by one.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_preference')
+    email_digest = models.CharField(max_length=10, choices=EmailDigestChoices.choices, default=EmailDigestChoices.INSTANT)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f'user_{self.user_id}_{self.email_digest}'
+
+
+class DigestEntry(models.Model):
+    """
+    An email buffered for the next digest of a user.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='digest_entries')
+    event = models.ForeignKey('events.Event', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    # The digest goes out early when an entry must be sent before then (e.g. a reminder)
+    send_before = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='digest_entry_user_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'user_{self.user_id}_{self.title}'
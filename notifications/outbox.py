@@ -0,0 +1,107 @@
+"""
+Transactional outbox for Celery tasks.
+
+Views call enqueue() instead of task.delay(): the task is written to the outbox table in
+the same transaction as the change which caused it, so a rollback never sends anything
+and a broker outage never fails a request. relay() publishes pending messages to the
+broker in batches over one producer connection; the relay_outbox command runs it
+continuously, woken up by a NOTIFY sent when an enqueuing transaction commits.
+
+The outbox is also the spool of the broker outages: messages simply stay pending while
+the broker is down. After BROKER_CIRCUIT_THRESHOLD failed publishes in a row the relay
+stops connecting to the broker for BROKER_CIRCUIT_COOLDOWN seconds, then one batch probes
+it and the backlog drains once it answers.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.circuit import CircuitBreaker
+from .models import OutboxMessage
+
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'notifications_outbox'
+
+broker_circuit = CircuitBreaker(settings.BROKER_CIRCUIT_THRESHOLD, settings.BROKER_CIRCUIT_COOLDOWN)
+
+
+def enqueue(task, dedup_key=None, **kwargs):
+    """
+    Publish task (a Celery task or its name) with kwargs once the current transaction commits.
+    Messages with the dedup_key of an existing message are dropped.
+    """
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(
+            task_name=task if isinstance(task, str) else task.name,
+            kwargs=kwargs,
+            dedup_key=dedup_key or uuid.uuid4().hex,
+        )
+    ], ignore_conflicts=True)
+    # Delivered to the relay on commit only
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, '')", [NOTIFY_CHANNEL])
+
+
+def relay(batch_size=None):
+    """
+    Publish up to batch_size pending messages and return how many were published.
+    Concurrent relays skip each other's messages.
+    """
+    if not broker_circuit.allow():
+        return 0
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    published, failed = [], None
+
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True).order_by('id')[:batch_size]
+        )
+        if not messages:
+            return 0
+
+        try:
+            with current_app.producer_or_acquire() as producer:
+                for message in messages:
+                    current_app.send_task(message.task_name, kwargs=message.kwargs, producer=producer)
+                    published.append(message.id)
+        except Exception as e:
+            # Most likely the broker is down, the rest of the batch waits for the next run
+            logger.error(f"Failed to publish the outbox. Error: {str(e)}")
+            broker_circuit.record_failure()
+            if len(published) < len(messages):
+                failed = (messages[len(published)].id, str(e))
+        else:
+            broker_circuit.record_success()
+
+        if published:
+            OutboxMessage.objects.filter(id__in=published).update(published_at=timezone.now())
+        if failed:
+            OutboxMessage.objects.filter(id=failed[0]).update(attempts=F('attempts') + 1, last_error=failed[1])
+    return len(published)
+
+
+def relay_pending(batch_size=None):
+    """
+    Relay until the outbox is empty (or the broker fails).
+    """
+    total = 0
+    while True:
+        published = relay(batch_size)
+        total += published
+        if not published:
+            return total
+
+
+def purge_published(older_than=None):
+    older_than = older_than or timezone.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    deleted, _ = OutboxMessage.objects.filter(published_at__lt=older_than).delete()
+    return deleted
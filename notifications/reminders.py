@@ -0,0 +1,133 @@
+"""
+Email reminders to the ticket holders of upcoming events.
+
+A beat job looks up the events starting within each of EVENT_REMINDER_WINDOWS (hours) with
+a range scan on the start_time index, and emails their ticket holders in chunks of
+EVENT_REMINDER_CHUNK_SIZE in ticket id order. The EventReminder row of an event and window
+is locked while a chunk is sent and its cursor advanced in the same transaction, so reruns
+and concurrent beat instances never email a ticket holder twice, and tickets bought after
+a reminder went out are picked up by the next run. Recipients refused by the mail server
+are logged and skipped, and an event whose reminder fails doesn't hold up the others. Users who chose digests get the
+reminder in a digest sent halfway through the window at the latest.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from . import digests
+from .backends import send_each
+from .models import EventReminder
+
+
+logger = logging.getLogger(__name__)
+
+
+def window_ranges(now, windows=None):
+    """
+    Yield (window_hours, start, end) for each reminder window. An event gets the reminder
+    of the smallest window it falls in, so an event created an hour before it starts
+    isn't sent the 24 hour reminder as well.
+    """
+    windows = sorted(set(windows or settings.EVENT_REMINDER_WINDOWS))
+    start = now
+    for window_hours in windows:
+        end = now + timedelta(hours=window_hours)
+        yield window_hours, start, end
+        start = end
+
+
+def remind_event(event, window_hours, chunk_size=None):
+    """
+    Email the reminder of window_hours to the ticket holders of event who haven't got it yet.
+    Returns how many emails were sent.
+    """
+    from events.models import Ticket
+
+    chunk_size = chunk_size or settings.EVENT_REMINDER_CHUNK_SIZE
+    EventReminder.objects.bulk_create(
+        [EventReminder(event=event, window_hours=window_hours)], ignore_conflicts=True
+    )
+    template = get_template('notifications/event_reminder.html')
+    subject = f"Reminder: {event.title} starts soon"
+
+    sent = 0
+    while True:
+        with transaction.atomic():
+            reminder = (
+                EventReminder.objects.select_for_update(skip_locked=True)
+                .filter(event=event, window_hours=window_hours).first()
+            )
+            if reminder is None:
+                # Another worker is sending this reminder
+                return sent
+
+            chunk = list(
+                Ticket.objects.filter(event_id=event.id, id__gt=reminder.last_ticket_id)
+                .order_by('id').values_list('id', 'user_id', 'user__username', 'user__email')[:chunk_size]
+            )
+            if not chunk:
+                return sent
+
+            digest_user_ids = digests.digest_users([user_id for _, user_id, _, _ in chunk])
+            messages = [
+                (ticket, None if ticket[1] in digest_user_ids else EmailMessage(
+                    subject=subject,
+                    body=template.render({'event': event, 'user': {'username': ticket[2]}}),
+                    from_email=settings.EMAIL_HOST_USER,
+                    to=[ticket[3]],
+                ))
+                for ticket in chunk
+            ]
+            # The cursor is advanced up to the last ticket handled, also when sending fails
+            # halfway: the error is raised once that is committed
+            handled, delivered, error = [], 0, None
+            try:
+                for ticket, ticket_sent in send_each(get_connection(rate_limit='bulk'), messages):
+                    handled.append(ticket)
+                    delivered += ticket_sent
+            except Exception as e:
+                error = e
+            if handled:
+                # The digest goes out halfway through the window at the latest
+                digests.buffer(
+                    [user_id for _, user_id, _, _ in handled if user_id in digest_user_ids],
+                    subject, f"{event.title} starts on {event.start_time:%Y-%m-%d %H:%M %Z}.",
+                    event=event, send_before=event.start_time - timedelta(hours=window_hours) / 2
+                )
+                EventReminder.objects.filter(id=reminder.id).update(
+                    last_ticket_id=handled[-1][0], sent_count=F('sent_count') + delivered
+                )
+
+        if error is not None:
+            raise error
+        sent += delivered
+        if len(chunk) < chunk_size:
+            return sent
+
+
+def send_event_reminders(now=None, chunk_size=None):
+    """
+    Send the reminders due at now and forget the reminders of events which have started.
+    Returns how many emails were sent.
+    """
+    from events.models import Event
+
+    now = now or timezone.now()
+    sent = 0
+    for window_hours, start, end in window_ranges(now):
+        events = Event.objects.filter(start_time__gt=start, start_time__lte=end).order_by('start_time')
+        for event in events:
+            try:
+                sent += remind_event(event, window_hours, chunk_size=chunk_size)
+            except Exception:
+                # Retried by the next run, after the tickets already reminded
+                logger.exception("Could not send the %sh reminder of event %s.", window_hours, event.id)
+
+    EventReminder.objects.filter(event__start_time__lte=now).delete()
+    return sent
@@ -0,0 +1,38 @@
+from rest_framework import serializers
+
+from .models import Notification, Broadcast, NotificationPreference
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    event = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'event', 'title', 'message', 'is_read', 'created_at']
+        read_only_fields = fields
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, max_length=1000)
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        if not attrs['all'] and not attrs.get('ids'):
+            raise serializers.ValidationError("Provide the ids of the notifications or all=true.")
+        return attrs
+
+
+class BroadcastSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Broadcast
+        fields = ['id', 'subject', 'message', 'status', 'total_recipients', 'sent_count', 'error', 'created_at', 'completed_at']
+        read_only_fields = ['status', 'total_recipients', 'sent_count', 'error', 'created_at', 'completed_at']
+
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = NotificationPreference
+        fields = ['email_digest', 'updated_at']
+        read_only_fields = ['updated_at']
@@ -1,28 +1,102 @@
-
 from celery import shared_task
 
 from django.contrib.auth import get_user_model
-from django.template.loader import render_to_string
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import send_mail, get_connection
 import logging
 
+# Connects the task metrics to Celery's signals
+from . import metrics  # noqa: F401
+from .delivery import EmailTask
+
 User = get_user_model()
 
 # Get an instance of a logger
-logger = logging.getLogger('__file__')
+logger = logging.getLogger(__name__)
 
-@shared_task()
-def send_email(subject, message, to_email):
+@shared_task(base=EmailTask, bind=True)
+def send_email(self, subject, message, to_email):
     try:
         send_mail(
             subject=subject,
             message=message,
             from_email=settings.EMAIL_HOST_USER,
             recipient_list=[to_email],
-            fail_silently=False
+            fail_silently=False,
+            connection=get_connection(rate_limit='transactional')
         )
-        logger.info(f"Email sent successfully to {to_email} with subject: {subject}")
     except Exception as e:
-        logger.error(f"Failed to send email to {to_email} with subject: {subject}. Error: {str(e)}")
+        logger.warning(f"Failed to send email to {to_email} with subject: {subject}. Error: {str(e)}")
+        self.retry_if_transient(e)
+        raise
+    logger.info(f"Email sent successfully to {to_email} with subject: {subject}")
+
+
+
+@shared_task()
+def notify_event_ticket_holders_task(event_id, title, message):
+    from events.models import Event
+    from .inbox import notify_event_ticket_holders
+
+    event = Event.objects.filter(id=event_id).first()
+    if event is None:
+        return 0
+    return notify_event_ticket_holders(event, title, message)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_broadcast_task(self, broadcast_id):
+    from .broadcast import send_broadcast, mark_failed
+    from .models import Broadcast
+
+    broadcast = Broadcast.objects.select_related('event').filter(id=broadcast_id).first()
+    if broadcast is None or broadcast.event is None:
+        return 0
+    try:
+        send_broadcast(broadcast)
+    except Exception as e:
+        logger.error(f"Broadcast {broadcast_id} failed after ticket {broadcast.last_ticket_id}. Error: {str(e)}")
+        mark_failed(broadcast_id, str(e))
+        # Retries resume after the last chunk sent
+        raise self.retry(exc=e)
+    return broadcast.sent_count
+
+
+@shared_task()
+def relay_outbox_task():
+    from .outbox import relay_pending, purge_published
+
+    published = relay_pending()
+    purge_published()
+    return published
+
+
+@shared_task(base=EmailTask, bind=True)
+def send_templated_emails(self, template_key, object_ids):
+    """
+    Send the templated email template_key (see notifications.emails) to each of object_ids.
+    """
+    from .emails import send_templated
+
+    try:
+        sent = send_templated(template_key, object_ids)
+    except Exception as e:
+        logger.warning(f"Failed to send {template_key} emails to {object_ids}. Error: {str(e)}")
+        self.retry_if_transient(e)
+        raise
+    logger.info(f"Sent {sent} {template_key} emails.")
+    return sent
+
+
+@shared_task()
+def send_event_reminders_task():
+    from .reminders import send_event_reminders
+
+    return send_event_reminders()
+
+
+@shared_task()
+def flush_digests_task():
+    from .digests import flush_digests
 
+    return flush_digests()
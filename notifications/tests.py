@@ -1,3 +1,836 @@
-from django.test import TestCase
+import smtplib
+import socketserver
+import threading
+import time
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from datetime import timedelta
+
+from rest_framework.test import APIClient, APITestCase
+from rest_framework import status
+
+from core.circuit import CircuitBreaker
+from events.models import Event, Ticket
+from .models import (
+    Notification, NotificationCounter, Broadcast, OutboxMessage, EventReminder, DeadLetter,
+    NotificationPreference, DigestEntry,
+)
+from .choices import BroadcastStatusChoices, EmailDigestChoices
+from .broadcast import send_broadcast, mark_failed
+from . import inbox
+from . import backends
+from . import outbox
+from . import reminders
+from . import metrics
+from . import digests
+from .delivery import is_transient
+from .tasks import send_email, send_templated_emails
+
+User = get_user_model()
 
 # Create your tests here.
+class NotificationFanOutTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123')
+        self.event = Event.objects.create(
+            title='Event 1',
+            description='Description for event 1',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.organizer
+        )
+        self.holders = [
+            User.objects.create_user(username=f'holder{index}', email=f'holder{index}@email.com', password='password123')
+            for index in range(5)
+        ]
+        for user in self.holders:
+            Ticket.objects.create(event=self.event, user=user)
+
+    def test_ticket_holders_are_notified_in_chunks(self):
+        notified = inbox.notify_event_ticket_holders(self.event, "Event updated", "Details changed", chunk_size=2)
+
+        self.assertEqual(notified, 5)
+        self.assertEqual(Notification.objects.filter(event=self.event).count(), 5)
+        self.assertFalse(Notification.objects.filter(user=self.organizer).exists())
+        self.assertEqual(inbox.unread_count(self.holders[0]), 1)
+
+    def test_unread_count_is_incremented(self):
+        inbox.notify_event_ticket_holders(self.event, "First", "First message")
+        inbox.notify_event_ticket_holders(self.event, "Second", "Second message")
+
+        counter = NotificationCounter.objects.get(user=self.holders[0])
+        self.assertEqual(counter.unread_count, 2)
+        self.assertEqual(inbox.unread_count(self.organizer), 0)
+
+    def test_mark_read_only_counts_unread_notifications(self):
+        inbox.notify_users([self.holders[0].id], "First", "First message")
+        inbox.notify_users([self.holders[0].id], "Second", "Second message")
+        first = Notification.objects.filter(user=self.holders[0]).order_by('id').first()
+
+        self.assertEqual(inbox.mark_read(self.holders[0], ids=[first.id]), 1)
+        self.assertEqual(inbox.mark_read(self.holders[0], ids=[first.id]), 0)
+        self.assertEqual(inbox.unread_count(self.holders[0]), 1)
+        self.assertEqual(inbox.mark_read(self.holders[0]), 1)
+        self.assertEqual(inbox.unread_count(self.holders[0]), 0)
+
+
+class NotificationInboxViewTests(APITestCase):
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(username='testuser1', password='password123', email="user1@email.com")
+        self.user2 = User.objects.create_user(username='testuser2', password='password123', email="user2@email.com")
+        self.client = APIClient()
+
+        for index in range(25):
+            inbox.notify_users([self.user1.id], f"Notification {index}", "Message")
+        inbox.notify_users([self.user2.id], "Other user", "Message")
+
+    def test_list_notifications_with_cursor(self):
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        notifications = response.data['payload']['notifications']
+        self.assertEqual(len(notifications), 20)
+        self.assertEqual(notifications[0]['title'], "Notification 24")
+
+        response = self.client.get(response.data['payload']['pagination']['next'])
+        self.assertEqual(len(response.data['payload']['notifications']), 5)
+        self.assertIsNone(response.data['payload']['pagination']['next'])
+
+    def test_mark_read_in_bulk(self):
+        self.client.force_authenticate(user=self.user1)
+        ids = list(Notification.objects.filter(user=self.user1).values_list('id', flat=True)[:3])
+        other_id = Notification.objects.get(user=self.user2).id
+
+        response = self.client.post(reverse('notification-mark-read'), {'ids': ids + [other_id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload']['marked_read'], 3)
+        self.assertEqual(response.data['payload']['unread_count'], 22)
+        self.assertFalse(Notification.objects.get(id=other_id).is_read)
+
+        response = self.client.get(reverse('notification-list'), {'unread': 'true'})
+        self.assertEqual(len(response.data['payload']['notifications']), 20)
+
+        response = self.client.post(reverse('notification-mark-read'), {'all': True}, format='json')
+        self.assertEqual(response.data['payload']['marked_read'], 22)
+
+        response = self.client.get(reverse('notification-unread-count'))
+        self.assertEqual(response.data['payload']['unread_count'], 0)
+
+    def test_mark_read_needs_ids_or_all(self):
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.post(reverse('notification-mark-read'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unread_count(self):
+        self.client.force_authenticate(user=self.user2)
+        response = self.client.get(reverse('notification-unread-count'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload']['unread_count'], 1)
+
+    def test_inbox_requires_authentication(self):
+        response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BroadcastTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123')
+        self.other_user = User.objects.create_user(username='other', email='other@email.com', password='password123')
+        self.event = Event.objects.create(
+            title='Event 1',
+            description='Description for event 1',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.organizer
+        )
+        for index in range(5):
+            user = User.objects.create_user(username=f'holder{index}', email=f'holder{index}@email.com', password='password123')
+            Ticket.objects.create(event=self.event, user=user)
+        self.broadcast = Broadcast.objects.create(
+            event=self.event, created_by=self.organizer, subject="Venue changed", message="We moved to hall B."
+        )
+        self.url = reverse('event-broadcast-list-create', kwargs={'slug': self.event.slug})
+
+    def test_broadcast_is_sent_in_chunks(self):
+        with mock.patch('notifications.broadcast.get_connection', wraps=mail.get_connection) as get_connection:
+            send_broadcast(self.broadcast, chunk_size=2)
+
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn("We moved to hall B.", mail.outbox[0].body)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, BroadcastStatusChoices.SENT)
+        self.assertEqual(self.broadcast.sent_count, 5)
+        self.assertEqual(self.broadcast.total_recipients, 5)
+
+    def test_failed_broadcast_resumes_after_last_chunk(self):
+        send_messages = mail.get_connection().__class__.send_messages
+        calls = []
+
+        def fail_second_chunk(connection, messages):
+            calls.append(messages)
+            # The first message of the second chunk
+            if len(calls) == 3:
+                raise ConnectionError("SMTP server went away")
+            return send_messages(connection, messages)
+
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', fail_second_chunk):
+            with self.assertRaises(ConnectionError):
+                send_broadcast(self.broadcast, chunk_size=2)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.sent_count, 2)
+
+        # By the task, before its retry
+        mark_failed(self.broadcast.id, "SMTP server went away")
+        send_broadcast(self.broadcast, chunk_size=2)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(len({message.to[0] for message in mail.outbox}), 5)
+
+    def test_failed_broadcast_resumes_after_last_recipient_sent(self):
+        send_messages = mail.get_connection().__class__.send_messages
+        calls = []
+
+        def fail_fourth_message(connection, messages):
+            calls.append(messages)
+            if len(calls) == 4:
+                raise ConnectionError("SMTP server went away")
+            return send_messages(connection, messages)
+
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', fail_fourth_message):
+            with self.assertRaises(ConnectionError):
+                send_broadcast(self.broadcast, chunk_size=5)
+        self.broadcast.refresh_from_db()
+        self.assertEqual((self.broadcast.sent_count, self.broadcast.status), (3, BroadcastStatusChoices.SENDING))
+
+        mark_failed(self.broadcast.id, "SMTP server went away")
+        send_broadcast(self.broadcast, chunk_size=5)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'holder{index}@email.com' for index in range(5)])
+
+    def test_refused_recipients_are_skipped(self):
+        send_messages = mail.get_connection().__class__.send_messages
+
+        def refuse_holder2(connection, messages):
+            if messages[0].to == ['holder2@email.com']:
+                raise smtplib.SMTPRecipientsRefused({'holder2@email.com': (550, b'No such user')})
+            return send_messages(connection, messages)
+
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', refuse_holder2):
+            with self.assertLogs('notifications.backends', 'WARNING'):
+                send_broadcast(self.broadcast, chunk_size=2)
+        self.broadcast.refresh_from_db()
+        self.assertEqual(self.broadcast.status, BroadcastStatusChoices.SENT)
+        self.assertEqual(self.broadcast.sent_count, 5)
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_broadcast_is_sent_by_one_worker_only(self):
+        # Claimed by a resumed task while a retry of the failed one was pending
+        Broadcast.objects.filter(id=self.broadcast.id).update(status=BroadcastStatusChoices.SENDING, heartbeat_at=timezone.now())
+        send_broadcast(self.broadcast)
+        self.assertEqual(len(mail.outbox), 0)
+
+        Broadcast.objects.filter(id=self.broadcast.id).update(status=BroadcastStatusChoices.SENT)
+        send_broadcast(self.broadcast)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(BROADCAST_LEASE_SECONDS=60)
+    def test_broadcast_left_sending_by_a_dead_worker_is_claimed_again(self):
+        Broadcast.objects.filter(id=self.broadcast.id).update(
+            status=BroadcastStatusChoices.SENDING, last_ticket_id=Ticket.objects.order_by('id')[1].id, sent_count=2,
+            heartbeat_at=timezone.now() - timedelta(seconds=61),
+        )
+        send_broadcast(self.broadcast, chunk_size=2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'holder{index}@email.com' for index in range(2, 5)])
+        self.assertEqual((self.broadcast.status, self.broadcast.sent_count), (BroadcastStatusChoices.SENT, 5))
+
+    def test_worker_stops_once_its_broadcast_is_claimed_again(self):
+        send_messages = mail.get_connection().__class__.send_messages
+
+        def claim_by_another_worker(connection, messages):
+            Broadcast.objects.filter(id=self.broadcast.id).update(heartbeat_at=timezone.now() + timedelta(seconds=1))
+            return send_messages(connection, messages)
+
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', claim_by_another_worker):
+            send_broadcast(self.broadcast, chunk_size=2)
+        # The chunk being sent went out, its progress is the other worker's
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual((self.broadcast.status, self.broadcast.sent_count), (BroadcastStatusChoices.SENDING, 0))
+
+    def test_organizer_creates_broadcast(self):
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(self.url, {'subject': 'Delayed', 'message': 'Starts an hour later.'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        broadcast_id = response.data['payload']['broadcast']['id']
+        message = OutboxMessage.objects.get(task_name='notifications.tasks.send_broadcast_task')
+        self.assertEqual(message.kwargs, {'broadcast_id': broadcast_id})
+
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['payload']['broadcasts']), 2)
+
+    def test_only_organizer_can_broadcast(self):
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.post(self.url, {'subject': 'Spam', 'message': 'Spam'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_resume_failed_broadcast(self):
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('event-broadcast-resume', kwargs={'slug': self.event.slug, 'pk': self.broadcast.id})
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        Broadcast.objects.filter(id=self.broadcast.id).update(status=BroadcastStatusChoices.FAILED)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload']['broadcast']['status'], BroadcastStatusChoices.PENDING)
+        message = OutboxMessage.objects.get(task_name='notifications.tasks.send_broadcast_task')
+        self.assertEqual(message.kwargs, {'broadcast_id': self.broadcast.id})
+
+    @override_settings(BROADCAST_LEASE_SECONDS=60)
+    def test_resume_stalled_broadcast(self):
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('event-broadcast-resume', kwargs={'slug': self.event.slug, 'pk': self.broadcast.id})
+        Broadcast.objects.filter(id=self.broadcast.id).update(status=BroadcastStatusChoices.SENDING, heartbeat_at=timezone.now())
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        Broadcast.objects.filter(id=self.broadcast.id).update(heartbeat_at=timezone.now() - timedelta(seconds=61))
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload']['broadcast']['status'], BroadcastStatusChoices.PENDING)
+        self.assertTrue(OutboxMessage.objects.filter(task_name='notifications.tasks.send_broadcast_task').exists())
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.send_task = mock.patch('notifications.outbox.current_app.send_task').start()
+        self.circuit = mock.patch.object(outbox, 'broker_circuit', CircuitBreaker(threshold=2, cooldown=60)).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_enqueue_is_part_of_the_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                outbox.enqueue(send_email, subject="Hi", message="Hello", to_email="user@email.com")
+                raise RuntimeError("rollback")
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_messages_are_deduplicated_by_key(self):
+        for _ in range(2):
+            outbox.enqueue(send_email, dedup_key='welcome:1', subject="Hi", message="Hello", to_email="user@email.com")
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_relay_publishes_pending_messages_in_batches(self):
+        for index in range(5):
+            outbox.enqueue(send_email, subject="Hi", message="Hello", to_email=f"user{index}@email.com")
+
+        self.assertEqual(outbox.relay_pending(batch_size=2), 5)
+        self.assertEqual(self.send_task.call_count, 5)
+        self.send_task.assert_any_call(
+            'notifications.tasks.send_email',
+            kwargs={'subject': "Hi", 'message': "Hello", 'to_email': "user0@email.com"},
+            producer=mock.ANY,
+        )
+        self.assertFalse(OutboxMessage.objects.filter(published_at__isnull=True).exists())
+        self.assertEqual(outbox.relay_pending(), 0)
+
+    def test_broker_failure_keeps_messages_pending(self):
+        outbox.enqueue(send_email, subject="Hi", message="Hello", to_email="user@email.com")
+        self.send_task.side_effect = ConnectionError("broker is down")
+
+        with self.assertLogs('notifications.outbox', level='ERROR'):
+            self.assertEqual(outbox.relay_pending(), 0)
+        message = OutboxMessage.objects.get()
+        self.assertIsNone(message.published_at)
+        self.assertEqual(message.attempts, 1)
+
+        self.send_task.side_effect = None
+        self.assertEqual(outbox.relay_pending(), 1)
+
+    def test_relay_stops_connecting_while_the_broker_is_down(self):
+        outbox.enqueue(send_email, subject="Hi", message="Hello", to_email="user@email.com")
+        self.send_task.side_effect = ConnectionError("broker is down")
+
+        with self.assertLogs('notifications.outbox', level='ERROR'):
+            for _ in range(5):
+                outbox.relay_pending()
+        self.assertEqual(self.send_task.call_count, 2)
+        self.assertEqual(OutboxMessage.objects.get().attempts, 2)
+
+        # Once the cooldown is over one batch probes the broker and drains the backlog
+        self.send_task.side_effect = None
+        self.circuit.open_until = time.monotonic() - 1
+        self.assertEqual(outbox.relay_pending(), 1)
+        self.assertFalse(self.circuit.is_open)
+
+    def test_requests_succeed_during_a_broker_outage(self):
+        self.send_task.side_effect = ConnectionError("broker is down")
+        response = APIClient().post(reverse('register-user'), {
+            'email': 'new@email.com', 'password': 'Testpassword@123', 'first_name': 'New', 'last_name': 'User'
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.send_task.assert_not_called()
+        self.assertEqual(OutboxMessage.objects.filter(published_at__isnull=True).count(), 1)
+
+    def test_registration_writes_the_verification_email_to_the_outbox(self):
+        response = APIClient().post(reverse('register-user'), {
+            'email': 'new@email.com', 'password': 'Testpassword@123', 'first_name': 'New', 'last_name': 'User'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'notifications.tasks.send_templated_emails')
+        self.assertEqual(message.kwargs, {
+            'template_key': 'account_verification',
+            'object_ids': [User.objects.get(email='new@email.com').id],
+        })
+        self.send_task.assert_not_called()
+
+
+class TemplatedEmailTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123')
+        self.event = Event.objects.create(
+            title='Event 1',
+            description='Description for event 1',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.organizer
+        )
+        self.users = [
+            User.objects.create_user(username=f'holder{index}', email=f'holder{index}@email.com', password='password123')
+            for index in range(3)
+        ]
+        self.tickets = [Ticket.objects.create(event=self.event, user=user) for user in self.users]
+
+    def test_batch_is_rendered_and_sent_by_the_worker(self):
+        sent = send_templated_emails('ticket_confirmation', [ticket.id for ticket in self.tickets])
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(len(mail.outbox), 3)
+        message = next(message for message in mail.outbox if message.to == ['holder0@email.com'])
+        self.assertEqual(message.subject, "Ticket Confirmation")
+        self.assertIn("Hi holder0", message.body)
+        self.assertIn("Event 1", message.body)
+
+    def test_account_verification_is_only_sent_to_inactive_users(self):
+        inactive = User.objects.create_user(username='inactive', email='inactive@email.com', password='password123', is_active=False)
+
+        send_templated_emails('account_verification', [inactive.id, self.users[0].id])
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['inactive@email.com'])
+        self.assertIn("Hi inactive", mail.outbox[0].body)
+
+    def test_purchase_enqueues_keys_not_bodies(self):
+        other_event = Event.objects.create(
+            title='Event 2',
+            description='Description for event 2',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.organizer
+        )
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.post(reverse('buy-event-ticket', kwargs={'slug': other_event.slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ticket = Ticket.objects.get(event=other_event)
+        message = OutboxMessage.objects.get(task_name='notifications.tasks.send_templated_emails')
+        self.assertEqual(message.kwargs, {'template_key': 'ticket_confirmation', 'object_ids': [ticket.id]})
+
+
+@override_settings(EVENT_REMINDER_WINDOWS=[24, 1])
+class EventReminderTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123')
+        self.event = Event.objects.create(
+            title='Event 1',
+            description='Description for event 1',
+            start_time=timezone.now() + timedelta(hours=5),
+            created_by=self.organizer
+        )
+        self.holders = [
+            User.objects.create_user(username=f'holder{index}', email=f'holder{index}@email.com', password='password123')
+            for index in range(5)
+        ]
+        for holder in self.holders:
+            Ticket.objects.create(event=self.event, user=holder)
+
+    def test_ticket_holders_are_reminded_in_chunks(self):
+        sent = reminders.send_event_reminders(chunk_size=2)
+
+        self.assertEqual(sent, 5)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), sorted(holder.email for holder in self.holders))
+        self.assertIn("Event 1", mail.outbox[0].body)
+        reminder = EventReminder.objects.get(event=self.event)
+        self.assertEqual(reminder.window_hours, 24)
+        self.assertEqual(reminder.sent_count, 5)
+
+    def test_reruns_only_remind_new_ticket_holders(self):
+        reminders.send_event_reminders(chunk_size=2)
+        self.assertEqual(reminders.send_event_reminders(chunk_size=2), 0)
+
+        late = User.objects.create_user(username='late', email='late@email.com', password='password123')
+        Ticket.objects.create(event=self.event, user=late)
+        mail.outbox = []
+        self.assertEqual(reminders.send_event_reminders(chunk_size=2), 1)
+        self.assertEqual(mail.outbox[0].to, ['late@email.com'])
+
+    def test_event_gets_the_reminder_of_the_smallest_window_only(self):
+        Event.objects.filter(id=self.event.id).update(start_time=timezone.now() + timedelta(minutes=30))
+
+        reminders.send_event_reminders()
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(list(EventReminder.objects.values_list('window_hours', flat=True)), [1])
+
+    def test_events_outside_the_windows_are_not_reminded(self):
+        Event.objects.filter(id=self.event.id).update(start_time=timezone.now() + timedelta(days=3))
+        self.assertEqual(reminders.send_event_reminders(), 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_failed_chunk_is_retried_by_the_next_run(self):
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=ConnectionError):
+            with self.assertLogs(reminders.logger):
+                self.assertEqual(reminders.send_event_reminders(chunk_size=2), 0)
+        self.assertEqual(EventReminder.objects.get().last_ticket_id, 0)
+
+        self.assertEqual(reminders.send_event_reminders(chunk_size=2), 5)
+
+    def fail_on(self, email, error):
+        send_messages = mail.get_connection().__class__.send_messages
+
+        def send_or_fail(connection, messages):
+            if messages[0].to == [email]:
+                raise error
+            return send_messages(connection, messages)
+
+        return mock.patch.object(mail.get_connection().__class__, 'send_messages', send_or_fail)
+
+    def test_refused_recipient_is_skipped_without_double_sending(self):
+        refused = smtplib.SMTPRecipientsRefused({'holder3@email.com': (550, b'No such user')})
+        with self.fail_on('holder3@email.com', refused), self.assertLogs('notifications.backends', 'WARNING'):
+            self.assertEqual(reminders.send_event_reminders(chunk_size=5), 4)
+            for _ in range(2):
+                self.assertEqual(reminders.send_event_reminders(chunk_size=5), 0)
+
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f'holder{index}@email.com' for index in (0, 1, 2, 4)],
+        )
+        self.assertEqual(EventReminder.objects.get().sent_count, 4)
+
+    def test_failure_halfway_keeps_the_progress_and_the_other_events(self):
+        other_event = Event.objects.create(
+            title='Event 2', description='Description for event 2',
+            start_time=timezone.now() + timedelta(hours=6), created_by=self.organizer
+        )
+        Ticket.objects.create(event=other_event, user=self.organizer)
+
+        with self.fail_on('holder2@email.com', ConnectionError()), self.assertLogs(reminders.logger):
+            self.assertEqual(reminders.send_event_reminders(chunk_size=5), 1)
+        self.assertEqual(EventReminder.objects.get(event=self.event).sent_count, 2)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['holder0@email.com', 'holder1@email.com', 'organizer@email.com'])
+
+        mail.outbox = []
+        self.assertEqual(reminders.send_event_reminders(chunk_size=5), 3)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [f'holder{index}@email.com' for index in (2, 3, 4)])
+
+    def test_reminders_of_started_events_are_purged(self):
+        reminders.send_event_reminders()
+        self.assertEqual(reminders.send_event_reminders(now=self.event.start_time + timedelta(minutes=1)), 0)
+        self.assertFalse(EventReminder.objects.exists())
+
+
+@override_settings(EVENT_REMINDER_WINDOWS=[24])
+class NotificationDigestTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='organizer', email='organizer@email.com', password='password123')
+        self.power_user = User.objects.create_user(username='power', email='power@email.com', password='password123')
+        self.user = User.objects.create_user(username='user', email='user@email.com', password='password123')
+        NotificationPreference.objects.create(user=self.power_user, email_digest=EmailDigestChoices.DAILY)
+        self.events = [
+            Event.objects.create(
+                title=f'Event {index}',
+                description=f'Description for event {index}',
+                start_time=timezone.now() + timedelta(hours=30),
+                created_by=self.organizer
+            )
+            for index in range(40)
+        ]
+        for event in self.events:
+            Ticket.objects.create(event=event, user=self.power_user)
+            Ticket.objects.create(event=event, user=self.user)
+
+    def emails_to(self, user):
+        return [message for message in mail.outbox if message.to == [user.email]]
+
+    def test_broadcasts_are_coalesced_into_one_digest(self):
+        for event in self.events:
+            send_broadcast(Broadcast.objects.create(event=event, created_by=self.organizer, subject="Update", message=f"News about {event.title}"))
+
+        self.assertEqual(len(self.emails_to(self.user)), 40)
+        self.assertEqual(len(self.emails_to(self.power_user)), 0)
+        self.assertEqual(DigestEntry.objects.filter(user=self.power_user).count(), 40)
+
+        self.assertEqual(digests.flush_digests(), 0)
+        self.assertEqual(digests.flush_digests(now=timezone.now() + timedelta(days=1, minutes=1)), 1)
+        digest = self.emails_to(self.power_user)[0]
+        self.assertEqual(digest.subject, "Your Eventizer digest: 40 updates")
+        self.assertIn("News about Event 0", digest.body)
+        self.assertIn("News about Event 39", digest.body)
+        self.assertFalse(DigestEntry.objects.exists())
+
+    def test_reminders_make_the_digest_go_out_before_the_events(self):
+        now = timezone.now()
+        # The reminders routed to the digest aren't counted as sent
+        self.assertEqual(reminders.send_event_reminders(now=now + timedelta(hours=8)), 40)
+        self.assertEqual(len(self.emails_to(self.user)), 40)
+        self.assertEqual(DigestEntry.objects.filter(user=self.power_user).count(), 40)
+
+        # Halfway through the 24 hour window, long before the daily digest
+        self.assertEqual(digests.flush_digests(now=now + timedelta(hours=17)), 0)
+        self.assertEqual(digests.flush_digests(now=now + timedelta(hours=19)), 1)
+        self.assertEqual(len(self.emails_to(self.power_user)), 1)
+
+    def test_refused_digest_is_skipped_without_double_sending(self):
+        users = [self.power_user] + [
+            User.objects.create_user(username=f'digest{index}', email=f'digest{index}@email.com', password='password123')
+            for index in range(2)
+        ]
+        NotificationPreference.objects.bulk_create([
+            NotificationPreference(user=user, email_digest=EmailDigestChoices.DAILY) for user in users[1:]
+        ])
+        digests.buffer([user.id for user in users], "Update", "News", event=self.events[0])
+
+        send_messages = mail.get_connection().__class__.send_messages
+
+        def refuse_power_user(connection, messages):
+            if messages[0].to == [self.power_user.email]:
+                raise smtplib.SMTPRecipientsRefused({self.power_user.email: (550, b'No such user')})
+            return send_messages(connection, messages)
+
+        later = timezone.now() + timedelta(days=2)
+        with mock.patch.object(mail.get_connection().__class__, 'send_messages', refuse_power_user):
+            with self.assertLogs('notifications.backends', 'WARNING'):
+                self.assertEqual(digests.flush_digests(now=later, chunk_size=5), 2)
+            self.assertEqual(digests.flush_digests(now=later, chunk_size=5), 0)
+
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['digest0@email.com', 'digest1@email.com'])
+        self.assertFalse(DigestEntry.objects.exists())
+
+    def test_buffered_emails_are_sent_when_going_back_to_instant(self):
+        digests.buffer([self.power_user.id], "Update", "News", event=self.events[0])
+        NotificationPreference.objects.filter(user=self.power_user).update(email_digest=EmailDigestChoices.INSTANT)
+
+        self.assertEqual(digests.flush_digests(), 1)
+
+
+class NotificationPreferenceViewTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', email='user@email.com', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('notification-preferences')
+
+    def test_default_is_instant(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['payload']['email_digest'], EmailDigestChoices.INSTANT)
+
+    def test_choose_daily_digest(self):
+        response = self.client.put(self.url, {'email_digest': EmailDigestChoices.DAILY}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(NotificationPreference.objects.get(user=self.user).email_digest, EmailDigestChoices.DAILY)
+
+    def test_invalid_choice(self):
+        response = self.client.put(self.url, {'email_digest': 'WEEKLY'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(TASK_METRICS_FLUSH_INTERVAL=0)
+class EmailDeliveryTests(TestCase):
+
+    def setUp(self):
+        metrics.flush()
+        self.kwargs = {'subject': "Hello", 'message': "Hello", 'to_email': 'user@email.com'}
+
+    def send(self, side_effect):
+        with mock.patch('notifications.tasks.send_mail', side_effect=side_effect) as send_mail:
+            with self.assertLogs('notifications', level='WARNING'):
+                result = send_email.apply(kwargs=self.kwargs)
+        return result, send_mail
+
+    def test_transient_errors_are_retried(self):
+        result, send_mail = self.send([smtplib.SMTPServerDisconnected("lost"), 1])
+
+        self.assertTrue(result.successful())
+        self.assertEqual(send_mail.call_count, 2)
+        self.assertFalse(DeadLetter.objects.exists())
+        task_metrics = metrics.get_metrics()['notifications.tasks.send_email']
+        self.assertEqual(task_metrics['attempts'], 2)
+        self.assertEqual(task_metrics['retry:SMTPServerDisconnected'], 1)
+        self.assertEqual(task_metrics['succeeded'], 1)
+
+    def test_permanent_error_goes_to_dead_letters(self):
+        result, send_mail = self.send(smtplib.SMTPRecipientsRefused({'user@email.com': (550, b'No such user')}))
+
+        self.assertTrue(result.failed())
+        self.assertEqual(send_mail.call_count, 1)
+        dead_letter = DeadLetter.objects.get()
+        self.assertEqual(dead_letter.task_name, 'notifications.tasks.send_email')
+        self.assertEqual(dead_letter.kwargs, self.kwargs)
+        self.assertEqual(dead_letter.exception, 'SMTPRecipientsRefused')
+        self.assertEqual(dead_letter.attempts, 1)
+        self.assertEqual(metrics.get_metrics()['notifications.tasks.send_email']['failure:SMTPRecipientsRefused'], 1)
+
+    @override_settings(EMAIL_RETRY_BACKOFF=0)
+    def test_dead_letter_after_last_retry(self):
+        result, send_mail = self.send(ConnectionRefusedError("refused"))
+
+        self.assertTrue(result.failed())
+        self.assertEqual(send_mail.call_count, send_email.max_retries + 1)
+        self.assertEqual(DeadLetter.objects.get().attempts, send_email.max_retries + 1)
+
+    def test_transient_errors(self):
+        self.assertTrue(is_transient(TimeoutError()))
+        self.assertTrue(is_transient(smtplib.SMTPDataError(451, b'Try again later')))
+        self.assertFalse(is_transient(smtplib.SMTPDataError(554, b'Rejected')))
+        self.assertFalse(is_transient(smtplib.SMTPAuthenticationError(535, b'Bad credentials')))
+
+    def test_replay_dead_letters(self):
+        self.send(smtplib.SMTPRecipientsRefused({'user@email.com': (550, b'No such user')}))
+
+        call_command('replay_dead_letters', stdout=mock.MagicMock())
+        call_command('replay_dead_letters', stdout=mock.MagicMock())
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'notifications.tasks.send_email')
+        self.assertEqual(message.kwargs, self.kwargs)
+        self.assertIsNotNone(DeadLetter.objects.get().replayed_at)
+
+    def test_metrics_of_flushes_add_up(self):
+        metrics.incr('some.task', 'attempts', 2)
+        metrics.observe_max('some.task', 'runtime_ms_max', 30)
+        metrics.flush()
+        metrics.incr('some.task', 'attempts', 3)
+        metrics.observe_max('some.task', 'runtime_ms_max', 20)
+        metrics.flush()
+
+        self.assertEqual(metrics.get_metrics()['some.task'], {'attempts': 5, 'runtime_ms_max': 30})
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP server which accepts and drops every message.
+    """
+
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b'220 sink\r\n')
+        messages = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.wfile.write(b'354 go ahead\r\n')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                messages += 1
+                self.wfile.write(b'250 ok\r\n')
+                if messages == self.server.drop_after:
+                    return
+            elif command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            else:
+                self.wfile.write(b'250 ok\r\n')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.connections = 0
+        self.messages = 0
+        # Close the connection after that many messages, like a server timing out
+        self.drop_after = drop_after
+
+
+class PooledSMTPEmailBackendTests(SimpleTestCase):
+
+    def start_sink(self, drop_after=None):
+        sink = SMTPSink(drop_after=drop_after)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        self.addCleanup(sink.server_close)
+        self.addCleanup(sink.shutdown)
+
+        settings_override = override_settings(
+            EMAIL_BACKEND='notifications.backends.PooledSMTPEmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=sink.server_address[1], EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='sender@email.com', EMAIL_HOST_PASSWORD='',
+            EMAIL_POOL_MAX_MESSAGES=3,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(backends.close_pools)
+        return sink
+
+    def send(self, count):
+        for index in range(count):
+            send_email(subject=f"Email {index}", message="Hello", to_email=f"user{index}@email.com")
+
+    def test_connections_are_reused(self):
+        sink = self.start_sink()
+        self.send(3)
+        self.assertEqual(sink.messages, 3)
+        self.assertEqual(sink.connections, 1)
+
+    def test_connection_is_replaced_after_max_messages(self):
+        sink = self.start_sink()
+        self.send(7)
+        self.assertEqual(sink.messages, 7)
+        self.assertEqual(sink.connections, 3)
+
+    def test_reconnects_when_server_drops_connection(self):
+        sink = self.start_sink(drop_after=1)
+        self.send(2)
+        self.assertEqual(sink.messages, 2)
+        self.assertEqual(sink.connections, 2)
+
+    @override_settings(EMAIL_RATE_LIMITS={'bulk': 50})
+    def test_bulk_emails_are_rate_limited(self):
+        sink = self.start_sink()
+        messages = [
+            mail.EmailMessage(subject="Bulk", body="Hello", to=[f"user{index}@email.com"])
+            for index in range(75)
+        ]
+
+        started = time.monotonic()
+        mail.get_connection(rate_limit='bulk').send_messages(messages)
+
+        # A burst of 50, then 25 more at 50 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.45)
+        self.assertEqual(sink.messages, 75)
+
+    @override_settings(EMAIL_RATE_LIMITS={'bulk': 50, 'transactional': 0})
+    def test_transactional_emails_are_not_limited_by_bulk_limit(self):
+        self.start_sink()
+        self.assertIsNotNone(mail.get_connection(rate_limit='bulk').rate_limiter)
+        self.assertIsNone(mail.get_connection(rate_limit='transactional').rate_limiter)
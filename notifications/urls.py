@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views as notification_views
+
+urlpatterns = [
+    path('', view=notification_views.NotificationListView.as_view(), name='notification-list'),
+    path('mark-read/', view=notification_views.NotificationMarkReadView.as_view(), name='notification-mark-read'),
+    path('unread-count/', view=notification_views.NotificationUnreadCountView.as_view(), name='notification-unread-count'),
+    path('preferences/', view=notification_views.NotificationPreferenceView.as_view(), name='notification-preferences'),
+]
@@ -1,3 +1,118 @@
-from django.shortcuts import render
+from rest_framework.generics import ListAPIView, GenericAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from authentication.helpers import validation_error_handler
+from .models import Notification, NotificationPreference
+from . import inbox
+from . import serializers as notification_serializers
+
+
+class NotificationCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = '-id'
+
 
 # Create your views here.
+class NotificationListView(ListAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = notification_serializers.NotificationSerializer
+    pagination_class = NotificationCursorPagination
+    throttle_scope = 'unrestricted'
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        return Response({
+            "status": "success",
+            "message": "Notifications retrieved successfully.",
+            "payload": {
+                'notifications': response.data.pop('results'),
+                'pagination': response.data,
+            },
+        }, status=status.HTTP_200_OK)
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user).select_related('event')
+        if self.request.query_params.get('unread') in ('1', 'true', 'True'):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+
+class NotificationMarkReadView(GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = notification_serializers.MarkReadSerializer
+    throttle_scope = 'unrestricted'
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid() is False:
+            return Response({
+                "status": "error",
+                "message": validation_error_handler(serializer.errors),
+                "payload": {
+                    "errors": serializer.errors
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        updated = inbox.mark_read(request.user, ids=None if data['all'] else data['ids'])
+        return Response({
+            "status": "success",
+            "message": "Notifications marked as read.",
+            "payload": {
+                "marked_read": updated,
+                "unread_count": inbox.unread_count(request.user),
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class NotificationUnreadCountView(GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'unrestricted'
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "status": "success",
+            "message": "Unread count retrieved successfully.",
+            "payload": {
+                "unread_count": inbox.unread_count(request.user),
+            }
+        }, status=status.HTTP_200_OK)
+
+
+class NotificationPreferenceView(GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = notification_serializers.NotificationPreferenceSerializer
+    throttle_scope = 'unrestricted'
+
+    def get_object(self):
+        # Users without preferences get every email right away
+        return NotificationPreference.objects.filter(user=self.request.user).first() or NotificationPreference(user=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.serializer_class(self.get_object())
+        return Response({
+            "status": "success",
+            "message": "Notification preferences retrieved successfully.",
+            "payload": serializer.data
+        }, status=status.HTTP_200_OK)
+
+    def put(self, request, *args, **kwargs):
+        serializer = self.serializer_class(self.get_object(), data=request.data)
+        if serializer.is_valid() is False:
+            return Response({
+                "status": "error",
+                "message": validation_error_handler(serializer.errors),
+                "payload": {
+                    "errors": serializer.errors
+                }
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer.save()
+        return Response({
+            "status": "success",
+            "message": "Notification preferences updated successfully.",
+            "payload": serializer.data
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,5 @@
+from django.contrib import admin
+from .models import WebhookEndpoint, WebhookDelivery
+# Register your models here.
+admin.site.register(WebhookEndpoint)
+admin.site.register(WebhookDelivery)
@@ -0,0 +1,22 @@
+class WebhookEventChoices:
+    TICKET_CREATED = 'ticket.created'
+    EVENT_UPDATED = 'event.updated'
+    FEEDBACK_CREATED = 'feedback.created'
+
+    choices = [
+        (TICKET_CREATED, 'Ticket created'),
+        (EVENT_UPDATED, 'Event updated'),
+        (FEEDBACK_CREATED, 'Feedback created')
+    ]
+
+
+class WebhookDeliveryStatusChoices:
+    PENDING = 'PENDING'
+    DELIVERED = 'DELIVERED'
+    FAILED = 'FAILED'
+
+    choices = [
+        (PENDING, 'Pending'),
+        (DELIVERED, 'Delivered'),
+        (FAILED, 'Failed')
+    ]
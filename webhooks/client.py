@@ -0,0 +1,130 @@
+"""
+HTTP client of the webhook deliveries.
+
+Keeps up to WEBHOOK_CONNECTIONS_PER_HOST keep-alive connections per receiver and process,
+so the deliveries of a busy endpoint don't reconnect (and renegotiate TLS) for every POST.
+Receivers must resolve to public addresses unless WEBHOOK_ALLOW_PRIVATE_ADDRESSES is set,
+the connection goes to the address which was checked.
+
+Like notifications.backends the pools are per process and dropped after a fork.
+"""
+import http.client
+import ipaddress
+import os
+import socket
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+
+class WebhookAddressError(Exception):
+    pass
+
+
+def resolve(host, port):
+    """
+    Return the address to connect to for host, refusing private addresses.
+    """
+    address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0][4][0]
+    if not settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES and not ipaddress.ip_address(address).is_global:
+        raise WebhookAddressError(f"{host} resolves to the non public address {address}.")
+    return address
+
+
+class ConnectionPool:
+
+    def __init__(self, scheme, host, port, size):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def get(self, timeout):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is not None:
+            connection.sock.settimeout(timeout)
+            return connection, True
+
+        address = resolve(self.host, self.port)
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(self.host, self.port, timeout=timeout)
+        connection._create_connection = (
+            lambda _, timeout, source_address: socket.create_connection((address, self.port), timeout, source_address)
+        )
+        return connection, False
+
+    def put(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for connection in idle:
+            connection.close()
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def get_pool(scheme, host, port):
+    global _pools_pid
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            _pools.clear()
+            _pools_pid = os.getpid()
+        key = (scheme, host, port)
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(scheme, host, port, settings.WEBHOOK_CONNECTIONS_PER_HOST)
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values()) if os.getpid() == _pools_pid else []
+    for pool in pools:
+        pool.close()
+
+
+def post(url, body, headers, timeout):
+    """
+    POST body to url and return the response status code.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+        raise WebhookAddressError(f"Unsupported scheme {scheme!r}.")
+    port = parts.port or (443 if scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+
+    pool = get_pool(scheme, parts.hostname, port)
+    while True:
+        connection, reused = pool.get(timeout)
+        try:
+            connection.request('POST', path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError) as e:
+            connection.close()
+            if reused and not isinstance(e, TimeoutError):
+                # The receiver closed the idle connection, try the next one
+                continue
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            pool.put(connection)
+        return response.status
@@ -0,0 +1,211 @@
+"""
+Delivery of the webhooks, run by the workers of the 'webhooks' queue.
+
+Due deliveries are claimed with a lease (their next_attempt_at is pushed past the time a
+round can take), so concurrent workers never send the same delivery and a crashed worker's
+deliveries are retried once the lease expires. The claimed deliveries are grouped by
+endpoint and POSTed in batches of the endpoint's batch_size, one thread per endpoint and at
+most WEBHOOK_CONCURRENCY endpoints at a time. An endpoint stops at its first failed batch.
+
+Failed deliveries are retried with exponential backoff and jitter up to
+WEBHOOK_MAX_ATTEMPTS attempts. After WEBHOOK_CIRCUIT_THRESHOLD consecutive failures the
+circuit of the endpoint opens: nothing is sent to it for WEBHOOK_CIRCUIT_COOLDOWN seconds,
+then a single batch probes it.
+
+Every POST is signed: X-Webhook-Signature is the hex HMAC-SHA256, keyed with the endpoint's
+secret, of "<X-Webhook-Timestamp>.<body>".
+"""
+import hashlib
+import hmac
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from celery.utils.time import get_exponential_backoff_interval
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import client
+from .choices import WebhookDeliveryStatusChoices
+from .models import WebhookEndpoint, WebhookDelivery
+
+
+logger = logging.getLogger(__name__)
+
+# Deliveries claimed per round, and batches sent to one endpoint per round
+CLAIM_SIZE = 500
+BATCHES_PER_ROUND = 4
+
+
+def sign(secret, timestamp, body):
+    return hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+
+
+def build_request(endpoint, deliveries):
+    body = json.dumps({
+        'events': [
+            {
+                'id': delivery.id,
+                'type': delivery.event_type,
+                'created_at': delivery.created_at.isoformat(),
+                'data': delivery.payload,
+            }
+            for delivery in deliveries
+        ]
+    }).encode()
+    timestamp = str(int(time.time()))
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'Eventizer-Webhooks/1.0',
+        'X-Webhook-Timestamp': timestamp,
+        'X-Webhook-Signature': sign(endpoint.secret, timestamp, body),
+    }
+    return body, headers
+
+
+def post_batches(endpoint, batches):
+    """
+    POST batches to endpoint until one fails. Returns (delivered, failed) where delivered is
+    a list of (batch, status) and failed is (batch, status, error) or None. Runs in a thread
+    of the pool, no database access here.
+    """
+    delivered = []
+    for batch in batches:
+        body, headers = build_request(endpoint, batch)
+        try:
+            response_status = client.post(endpoint.url, body, headers, timeout=settings.WEBHOOK_TIMEOUT)
+        except Exception as e:
+            return delivered, (batch, None, f'{type(e).__name__}: {e}')
+        if not 200 <= response_status < 300:
+            return delivered, (batch, response_status, f'HTTP {response_status}')
+        delivered.append((batch, response_status))
+    return delivered, None
+
+
+def claim(now, limit=CLAIM_SIZE):
+    """
+    Claim up to limit due deliveries and return them, with their endpoints.
+    """
+    lease = timedelta(seconds=settings.WEBHOOK_TIMEOUT * BATCHES_PER_ROUND * 2 + 60)
+    with transaction.atomic():
+        ids = list(
+            WebhookDelivery.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(
+                Q(endpoint__circuit_open_until__isnull=True) | Q(endpoint__circuit_open_until__lte=now),
+                status=WebhookDeliveryStatusChoices.PENDING, next_attempt_at__lte=now,
+                endpoint__is_active=True,
+            )
+            .order_by('id').values_list('id', flat=True)[:limit]
+        )
+        WebhookDelivery.objects.filter(id__in=ids).update(
+            next_attempt_at=now + lease, attempts=F('attempts') + 1
+        )
+    return list(WebhookDelivery.objects.filter(id__in=ids).select_related('endpoint').order_by('id'))
+
+
+def release(deliveries, now):
+    """
+    Give back claimed deliveries which weren't attempted.
+    """
+    WebhookDelivery.objects.filter(id__in=[delivery.id for delivery in deliveries]).update(
+        next_attempt_at=now, attempts=F('attempts') - 1
+    )
+
+
+def record_success(endpoint, delivered, now):
+    for batch, response_status in delivered:
+        WebhookDelivery.objects.filter(id__in=[delivery.id for delivery in batch]).update(
+            status=WebhookDeliveryStatusChoices.DELIVERED, delivered_at=now,
+            response_status=response_status, last_error='',
+        )
+    if delivered and (endpoint.consecutive_failures or endpoint.circuit_open_until):
+        WebhookEndpoint.objects.filter(id=endpoint.id).update(consecutive_failures=0, circuit_open_until=None)
+
+
+def record_failure(endpoint, batch, response_status, error, now):
+    logger.warning(f"Webhook delivery to endpoint {endpoint.id} failed. Error: {error}")
+    for delivery in batch:
+        if delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+            WebhookDelivery.objects.filter(id=delivery.id).update(
+                status=WebhookDeliveryStatusChoices.FAILED, response_status=response_status, last_error=error
+            )
+            continue
+        countdown = get_exponential_backoff_interval(
+            factor=settings.WEBHOOK_RETRY_BACKOFF,
+            retries=delivery.attempts - 1,
+            maximum=settings.WEBHOOK_RETRY_BACKOFF_MAX,
+            full_jitter=True,
+        )
+        WebhookDelivery.objects.filter(id=delivery.id).update(
+            next_attempt_at=now + timedelta(seconds=countdown), response_status=response_status, last_error=error
+        )
+
+    WebhookEndpoint.objects.filter(id=endpoint.id).update(consecutive_failures=F('consecutive_failures') + 1)
+    WebhookEndpoint.objects.filter(
+        id=endpoint.id, consecutive_failures__gte=settings.WEBHOOK_CIRCUIT_THRESHOLD
+    ).update(circuit_open_until=now + timedelta(seconds=settings.WEBHOOK_CIRCUIT_COOLDOWN))
+
+
+def deliver_round(now=None):
+    """
+    Claim and send one round of due deliveries, return (claimed, delivered).
+    """
+    now = now or timezone.now()
+    deliveries = claim(now)
+    if not deliveries:
+        return 0, 0
+
+    by_endpoint = {}
+    for delivery in deliveries:
+        by_endpoint.setdefault(delivery.endpoint_id, []).append(delivery)
+
+    jobs, unsent = [], []
+    for endpoint_deliveries in by_endpoint.values():
+        endpoint = endpoint_deliveries[0].endpoint
+        size = max(endpoint.batch_size, 1)
+        batches = [endpoint_deliveries[i:i + size] for i in range(0, len(endpoint_deliveries), size)]
+        # A half open circuit is probed with a single batch
+        limit = 1 if endpoint.consecutive_failures >= settings.WEBHOOK_CIRCUIT_THRESHOLD else BATCHES_PER_ROUND
+        jobs.append((endpoint, batches[:limit]))
+        unsent.extend(delivery for batch in batches[limit:] for delivery in batch)
+    release(unsent, now)
+
+    with ThreadPoolExecutor(max_workers=settings.WEBHOOK_CONCURRENCY) as executor:
+        futures = [executor.submit(post_batches, endpoint, batches) for endpoint, batches in jobs]
+
+    delivered_count = 0
+    for (endpoint, batches), future in zip(jobs, futures):
+        delivered, failed = future.result()
+        record_success(endpoint, delivered, now)
+        delivered_count += sum(len(batch) for batch, _ in delivered)
+        if failed:
+            batch, response_status, error = failed
+            record_failure(endpoint, batch, response_status, error, now)
+            release([delivery for batch in batches[len(delivered) + 1:] for delivery in batch], now)
+    return len(deliveries), delivered_count
+
+
+def deliver_due(now=None, max_rounds=10):
+    """
+    Deliver until nothing is due (or max_rounds rounds), return how many were delivered.
+    """
+    total = 0
+    for _ in range(max_rounds):
+        claimed, delivered = deliver_round(now)
+        total += delivered
+        if not claimed:
+            break
+    return total
+
+
+def purge_delivered(older_than=None):
+    older_than = older_than or timezone.now() - timedelta(days=settings.WEBHOOK_RETENTION_DAYS)
+    deleted, _ = WebhookDelivery.objects.filter(
+        status__in=[WebhookDeliveryStatusChoices.DELIVERED, WebhookDeliveryStatusChoices.FAILED],
+        created_at__lt=older_than,
+    ).delete()
+    return deleted
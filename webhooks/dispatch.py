@@ -0,0 +1,66 @@
+"""
+Webhook events. Called in the transaction of the change: the deliveries are written with
+it and the delivery task is published through the outbox once it commits. Organizers
+without a subscribed endpoint cost one indexed query.
+"""
+from notifications import outbox
+
+from .choices import WebhookEventChoices
+from .models import WebhookEndpoint, WebhookDelivery
+
+
+def emit(organizer_id, event_type, payload):
+    """
+    Queue a delivery of payload to every active endpoint of organizer_id subscribed to
+    event_type, return how many were queued.
+    """
+    from .tasks import deliver_webhooks_task
+
+    endpoint_ids = list(
+        WebhookEndpoint.objects.filter(organizer_id=organizer_id, is_active=True, event_types__contains=[event_type])
+        .values_list('id', flat=True)
+    )
+    if not endpoint_ids:
+        return 0
+    WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(endpoint_id=endpoint_id, event_type=event_type, payload=payload)
+        for endpoint_id in endpoint_ids
+    ])
+    outbox.enqueue(deliver_webhooks_task)
+    return len(endpoint_ids)
+
+
+def event_data(event):
+    return {
+        'id': event.id,
+        'slug': event.slug,
+        'title': event.title,
+        'location': event.location,
+        'start_time': event.start_time.isoformat(),
+        'no_of_participants': event.no_of_participants,
+        'updated_at': event.updated_at.isoformat(),
+    }
+
+
+def ticket_created(ticket):
+    return emit(ticket.event.created_by_id, WebhookEventChoices.TICKET_CREATED, {
+        'ticket_id': ticket.id,
+        'event': event_data(ticket.event),
+        'user': {'username': ticket.user.username, 'email': ticket.user.email},
+        'purchase_time': ticket.pruchase_time.isoformat(),
+    })
+
+
+def event_updated(event):
+    return emit(event.created_by_id, WebhookEventChoices.EVENT_UPDATED, {
+        'event': event_data(event),
+    })
+
+
+def feedback_created(feedback):
+    return emit(feedback.event.created_by_id, WebhookEventChoices.FEEDBACK_CREATED, {
+        'feedback_id': feedback.id,
+        'event': event_data(feedback.event),
+        'user': {'username': feedback.user.username},
+        'feedback': feedback.feedback,
+    })
@@ -0,0 +1,66 @@
+import secrets
+
+from django.contrib.auth import get_user_model
+from django.db import models
+from django.utils import timezone
+
+from .choices import WebhookDeliveryStatusChoices
+
+
+User = get_user_model()
+
+
+def generate_secret():
+    return secrets.token_hex(32)
+
+
+# Create your models here.
+class WebhookEndpoint(models.Model):
+    """
+    A URL of an organizer notified of the event_types happening to their events. Deliveries
+    are signed with secret. consecutive_failures and circuit_open_until are the circuit
+    breaker of the endpoint, see webhooks.delivery.
+    """
+    organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_endpoints')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=generate_secret)
+    event_types = models.JSONField(default=list)
+    # Number of events sent per POST
+    batch_size = models.PositiveSmallIntegerField(default=1)
+    is_active = models.BooleanField(default=True)
+
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    circuit_open_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f'organizer_{self.organizer_id}_{self.url}'
+
+
+class WebhookDelivery(models.Model):
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='deliveries')
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+
+    status = models.CharField(max_length=10, choices=WebhookDeliveryStatusChoices.choices, default=WebhookDeliveryStatusChoices.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(status=WebhookDeliveryStatusChoices.PENDING),
+                name='webhook_delivery_due_idx'
+            ),
+            models.Index(fields=['endpoint', '-id'], name='webhook_delivery_list_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'endpoint_{self.endpoint_id}_{self.event_type}'
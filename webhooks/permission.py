@@ -0,0 +1,14 @@
+from rest_framework.permissions import BasePermission
+from authentication.choices import UserTypeChoices
+
+
+class IsOrganizer(BasePermission):
+    """
+    The request is authenticated as a organizer or admin.
+    """
+
+    def has_permission(self, request, view):
+        return bool(
+            request.user and request.user.is_authenticated and
+            request.user.role in {UserTypeChoices.ORGANIZER, UserTypeChoices.ADMIN}
+        )
@@ -0,0 +1,37 @@
+from rest_framework import serializers
+
+from .choices import WebhookEventChoices
+from .models import WebhookEndpoint, WebhookDelivery
+
+
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    event_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=WebhookEventChoices.choices), allow_empty=False
+    )
+    batch_size = serializers.IntegerField(min_value=1, max_value=100, required=False)
+
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'url', 'event_types', 'batch_size', 'is_active', 'consecutive_failures', 'circuit_open_until', 'created_at']
+        read_only_fields = ['consecutive_failures', 'circuit_open_until', 'created_at']
+
+    def validate_event_types(self, value):
+        return sorted(set(value))
+
+
+class WebhookEndpointCreateSerializer(WebhookEndpointSerializer):
+    """
+    The secret is only shown when the endpoint is created.
+    """
+
+    class Meta(WebhookEndpointSerializer.Meta):
+        fields = WebhookEndpointSerializer.Meta.fields + ['secret']
+        read_only_fields = WebhookEndpointSerializer.Meta.read_only_fields + ['secret']
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = WebhookDelivery
+        fields = ['id', 'event_type', 'payload', 'status', 'attempts', 'next_attempt_at', 'response_status', 'last_error', 'created_at', 'delivered_at']
+        read_only_fields = fields
@@ -0,0 +1,15 @@
+from celery import shared_task
+
+from .delivery import deliver_due, purge_delivered
+
+
+@shared_task()
+def deliver_webhooks_task():
+    return deliver_due()
+
+
+@shared_task()
+def retry_webhooks_task():
+    delivered = deliver_due()
+    purge_delivered()
+    return delivered
@@ -0,0 +1,331 @@
+import json
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from authentication.choices import UserTypeChoices
+from events.models import Event, Ticket
+from notifications.models import OutboxMessage
+from .choices import WebhookEventChoices, WebhookDeliveryStatusChoices
+from .models import WebhookEndpoint, WebhookDelivery
+from . import client
+from . import delivery
+from . import dispatch
+
+User = get_user_model()
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    """
+    Records the POSTed requests and answers with the status of the server.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.requests.append((dict(self.headers), body))
+            self.server.connections.add(self.client_address)
+        time.sleep(self.server.delay)
+        self.send_response(self.server.response_status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class Receiver(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, response_status=200, delay=0):
+        super().__init__(('127.0.0.1', 0), ReceiverHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.connections = set()
+        self.response_status = response_status
+        self.delay = delay
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hook'
+
+
+@override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True, WEBHOOK_RETRY_BACKOFF=60, WEBHOOK_MAX_ATTEMPTS=3)
+class WebhookDeliveryTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER
+        )
+        self.addCleanup(client.close_pools)
+
+    def start_receiver(self, **kwargs):
+        receiver = Receiver(**kwargs)
+        threading.Thread(target=receiver.serve_forever, daemon=True).start()
+        self.addCleanup(receiver.server_close)
+        self.addCleanup(receiver.shutdown)
+        return receiver
+
+    def create_endpoint(self, receiver, **kwargs):
+        return WebhookEndpoint.objects.create(
+            organizer=self.organizer, url=receiver.url, event_types=[WebhookEventChoices.TICKET_CREATED], **kwargs
+        )
+
+    def emit(self, count):
+        for index in range(count):
+            dispatch.emit(self.organizer.id, WebhookEventChoices.TICKET_CREATED, {'ticket_id': index})
+
+    def test_deliveries_are_signed(self):
+        receiver = self.start_receiver()
+        endpoint = self.create_endpoint(receiver)
+        self.emit(1)
+
+        self.assertEqual(delivery.deliver_due(), 1)
+        headers, body = receiver.requests[0]
+        self.assertEqual(
+            headers['X-Webhook-Signature'], delivery.sign(endpoint.secret, headers['X-Webhook-Timestamp'], body)
+        )
+        event = json.loads(body)['events'][0]
+        self.assertEqual(event['type'], WebhookEventChoices.TICKET_CREATED)
+        self.assertEqual(event['data'], {'ticket_id': 0})
+        self.assertEqual(
+            WebhookDelivery.objects.get().status, WebhookDeliveryStatusChoices.DELIVERED
+        )
+
+    def test_events_are_batched_over_one_connection(self):
+        receiver = self.start_receiver()
+        self.create_endpoint(receiver, batch_size=2)
+        self.emit(5)
+
+        self.assertEqual(delivery.deliver_due(), 5)
+        self.assertEqual([len(json.loads(body)['events']) for _, body in receiver.requests], [2, 2, 1])
+        self.assertEqual(len(receiver.connections), 1)
+
+    def test_only_subscribed_endpoints_get_deliveries(self):
+        receiver = self.start_receiver()
+        self.create_endpoint(receiver)
+        WebhookEndpoint.objects.create(organizer=self.organizer, url=receiver.url, event_types=[WebhookEventChoices.EVENT_UPDATED])
+        WebhookEndpoint.objects.create(
+            organizer=self.organizer, url=receiver.url, event_types=[WebhookEventChoices.TICKET_CREATED], is_active=False
+        )
+
+        self.emit(1)
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+        self.assertEqual(OutboxMessage.objects.filter(task_name='webhooks.tasks.deliver_webhooks_task').count(), 1)
+
+    def test_failed_deliveries_are_retried_with_backoff(self):
+        receiver = self.start_receiver(response_status=500)
+        self.create_endpoint(receiver)
+        self.emit(1)
+        now = timezone.now()
+
+        self.assertEqual(delivery.deliver_round(now), (1, 0))
+        webhook_delivery = WebhookDelivery.objects.get()
+        self.assertEqual(webhook_delivery.status, WebhookDeliveryStatusChoices.PENDING)
+        self.assertEqual(webhook_delivery.attempts, 1)
+        self.assertEqual(webhook_delivery.response_status, 500)
+        self.assertLessEqual(webhook_delivery.next_attempt_at, now + timedelta(seconds=60))
+        self.assertEqual(len(receiver.requests), 1)
+
+        receiver.response_status = 200
+        self.assertEqual(delivery.deliver_due(now + timedelta(seconds=61)), 1)
+        webhook_delivery.refresh_from_db()
+        self.assertEqual(webhook_delivery.status, WebhookDeliveryStatusChoices.DELIVERED)
+        self.assertEqual(webhook_delivery.attempts, 2)
+
+    def test_deliveries_fail_after_max_attempts(self):
+        receiver = self.start_receiver(response_status=503)
+        self.create_endpoint(receiver)
+        self.emit(1)
+
+        now = timezone.now()
+        for attempt in range(3):
+            delivery.deliver_due(now + timedelta(hours=attempt))
+        webhook_delivery = WebhookDelivery.objects.get()
+        self.assertEqual(webhook_delivery.status, WebhookDeliveryStatusChoices.FAILED)
+        self.assertEqual(webhook_delivery.attempts, 3)
+        self.assertEqual(webhook_delivery.last_error, 'HTTP 503')
+
+        delivery.deliver_due(now + timedelta(hours=4))
+        self.assertEqual(len(receiver.requests), 3)
+
+    @override_settings(WEBHOOK_CIRCUIT_THRESHOLD=2, WEBHOOK_CIRCUIT_COOLDOWN=600, WEBHOOK_MAX_ATTEMPTS=10)
+    def test_circuit_opens_after_consecutive_failures(self):
+        receiver = self.start_receiver(response_status=500)
+        endpoint = self.create_endpoint(receiver)
+        self.emit(3)
+
+        now = timezone.now()
+        delivery.deliver_due(now)
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.consecutive_failures, 2)
+        self.assertEqual(endpoint.circuit_open_until, now + timedelta(seconds=600))
+
+        # Nothing is sent while the circuit is open
+        sent = len(receiver.requests)
+        delivery.deliver_due(now + timedelta(minutes=5))
+        self.assertEqual(len(receiver.requests), sent)
+
+        # Then a single batch probes the endpoint and closes the circuit
+        receiver.response_status = 200
+        self.assertEqual(delivery.deliver_round(now + timedelta(hours=3)), (3, 1))
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.consecutive_failures, 0)
+        self.assertIsNone(endpoint.circuit_open_until)
+        self.assertEqual(delivery.deliver_due(now + timedelta(hours=3)), 2)
+
+    def test_slow_endpoints_are_delivered_concurrently(self):
+        receivers = [self.start_receiver(delay=0.3) for _ in range(4)]
+        for receiver in receivers:
+            self.create_endpoint(receiver)
+        self.emit(1)
+
+        started = time.monotonic()
+        self.assertEqual(delivery.deliver_due(), 4)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False)
+    def test_private_addresses_are_refused(self):
+        receiver = self.start_receiver()
+        self.create_endpoint(receiver)
+        self.emit(1)
+
+        self.assertEqual(delivery.deliver_round(), (1, 0))
+        self.assertEqual(receiver.requests, [])
+        self.assertIn('WebhookAddressError', WebhookDelivery.objects.get().last_error)
+
+    def test_purge_deletes_old_finished_deliveries(self):
+        receiver = self.start_receiver()
+        self.create_endpoint(receiver)
+        self.emit(2)
+        delivery.deliver_due()
+
+        self.assertEqual(delivery.purge_delivered(timezone.now() - timedelta(days=1)), 0)
+        self.assertEqual(delivery.purge_delivered(timezone.now() + timedelta(seconds=1)), 2)
+
+
+class WebhookEndpointViewTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER
+        )
+        self.user = User.objects.create_user(username='user', email='user@email.com', password='password123')
+        self.url = reverse('webhook-list-create')
+        self.data = {'url': 'https://example.com/hook', 'event_types': ['ticket.created', 'feedback.created']}
+
+    def test_organizer_creates_endpoint_and_gets_secret_once(self):
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(self.url, self.data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        webhook = response.data['payload']['webhook']
+        self.assertEqual(webhook['secret'], WebhookEndpoint.objects.get().secret)
+
+        response = self.client.get(reverse('webhook-detail', kwargs={'pk': webhook['id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('secret', response.data['payload']['webhook'])
+
+    def test_invalid_event_type_is_rejected(self):
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.post(self.url, {**self.data, 'event_types': ['ticket.deleted']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_cannot_manage_webhooks(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_organizer_only_sees_own_endpoints(self):
+        other = User.objects.create_user(
+            username='other', email='other@email.com', password='password123', role=UserTypeChoices.ORGANIZER
+        )
+        endpoint = WebhookEndpoint.objects.create(organizer=other, url='https://example.com/hook', event_types=['ticket.created'])
+
+        self.client.force_authenticate(user=self.organizer)
+        self.assertEqual(self.client.get(self.url).data['payload']['webhooks'], [])
+        response = self.client.get(reverse('webhook-delivery-list', kwargs={'pk': endpoint.id}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_closes_circuit(self):
+        endpoint = WebhookEndpoint.objects.create(
+            organizer=self.organizer, url='https://example.com/hook', event_types=['ticket.created'],
+            consecutive_failures=5, circuit_open_until=timezone.now() + timedelta(minutes=5),
+        )
+        self.client.force_authenticate(user=self.organizer)
+        response = self.client.patch(
+            reverse('webhook-detail', kwargs={'pk': endpoint.id}), {'url': 'https://example.com/fixed'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.url, 'https://example.com/fixed')
+        self.assertEqual(endpoint.consecutive_failures, 0)
+        self.assertIsNone(endpoint.circuit_open_until)
+
+    def test_deliveries_are_listed_by_status(self):
+        endpoint = WebhookEndpoint.objects.create(organizer=self.organizer, url='https://example.com/hook', event_types=['ticket.created'])
+        WebhookDelivery.objects.create(endpoint=endpoint, event_type='ticket.created', status=WebhookDeliveryStatusChoices.FAILED)
+        WebhookDelivery.objects.create(endpoint=endpoint, event_type='ticket.created')
+
+        self.client.force_authenticate(user=self.organizer)
+        url = reverse('webhook-delivery-list', kwargs={'pk': endpoint.id})
+        self.assertEqual(len(self.client.get(url).data['payload']['deliveries']), 2)
+        deliveries = self.client.get(url, {'status': 'failed'}).data['payload']['deliveries']
+        self.assertEqual([delivery['status'] for delivery in deliveries], [WebhookDeliveryStatusChoices.FAILED])
+
+
+class WebhookEmitTests(APITestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            username='organizer', email='organizer@email.com', password='password123', role=UserTypeChoices.ORGANIZER
+        )
+        self.user = User.objects.create_user(username='user', email='user@email.com', password='password123')
+        self.event = Event.objects.create(
+            title='Event 1',
+            description='Description for event 1',
+            start_time=timezone.now() + timedelta(days=2),
+            created_by=self.organizer
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            organizer=self.organizer, url='https://example.com/hook', event_types=[value for value, _ in WebhookEventChoices.choices],
+        )
+
+    def test_ticket_purchase_emits_ticket_created(self):
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('buy-event-ticket', kwargs={'slug': self.event.slug}))
+
+        webhook_delivery = WebhookDelivery.objects.get()
+        self.assertEqual(webhook_delivery.event_type, WebhookEventChoices.TICKET_CREATED)
+        self.assertEqual(webhook_delivery.payload['event']['slug'], self.event.slug)
+        self.assertEqual(webhook_delivery.payload['user']['email'], 'user@email.com')
+
+    def test_feedback_emits_feedback_created(self):
+        Ticket.objects.create(event=self.event, user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(reverse('feedback-list-create', kwargs={'slug': self.event.slug}), {'feedback': 'Great event'})
+
+        webhook_delivery = WebhookDelivery.objects.get()
+        self.assertEqual(webhook_delivery.event_type, WebhookEventChoices.FEEDBACK_CREATED)
+        self.assertEqual(webhook_delivery.payload['feedback'], 'Great event')
+
+    def test_event_update_emits_event_updated(self):
+        self.client.force_authenticate(user=self.organizer)
+        self.client.patch(
+            reverse('event-retrieve-update-destroy', kwargs={'slug': self.event.slug}), {'title': 'Event 1 moved'}
+        )
+
+        webhook_delivery = WebhookDelivery.objects.get()
+        self.assertEqual(webhook_delivery.event_type, WebhookEventChoices.EVENT_UPDATED)
+        self.assertEqual(webhook_delivery.payload['event']['title'], 'Event 1 moved')
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from . import views as webhook_views
+
+urlpatterns = [
+    path('', view=webhook_views.WebhookEndpointListCreateView.as_view(), name='webhook-list-create'),
+    path('<int:pk>/', view=webhook_views.WebhookEndpointDetailView.as_view(), name='webhook-detail'),
+    path('<int:pk>/deliveries/', view=webhook_views.WebhookDeliveryListView.as_view(), name='webhook-delivery-list'),
+]
@@ -0,0 +1,150 @@
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework import status
+
+from authentication.helpers import validation_error_handler
+from .models import WebhookEndpoint, WebhookDelivery
+from .permission import IsOrganizer
+from . import serializers as webhook_serializers
+
+
+class WebhookDeliveryCursorPagination(CursorPagination):
+    page_size = 20
+    ordering = '-id'
+
+
+class WebhookEndpointMixin:
+
+    def get_endpoint(self, request, pk):
+        """
+        Return (endpoint, error response), the endpoint must belong to the user.
+        """
+        endpoint = WebhookEndpoint.objects.filter(id=pk, organizer=request.user).first()
+        if not endpoint:
+            return None, Response({
+                "status": "error",
+                "message": "No webhook with that id found.",
+                "payload": {}
+            }, status=status.HTTP_404_NOT_FOUND)
+        return endpoint, None
+
+    def error_response(self, serializer):
+        return Response({
+            "status": "error",
+            "message": validation_error_handler(serializer.errors),
+            "payload": {
+                "errors": serializer.errors
+            }
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Create your views here.
+class WebhookEndpointListCreateView(WebhookEndpointMixin, GenericAPIView):
+    permission_classes = (IsOrganizer,)
+    serializer_class = webhook_serializers.WebhookEndpointSerializer
+    throttle_scope = 'unrestricted'
+
+    def get(self, request, *args, **kwargs):
+        endpoints = WebhookEndpoint.objects.filter(organizer=request.user).order_by('id')
+        return Response({
+            "status": "success",
+            "message": "Webhooks retrieved successfully.",
+            "payload": {
+                "webhooks": self.serializer_class(endpoints, many=True).data
+            }
+        }, status=status.HTTP_200_OK)
+
+    def post(self, request, *args, **kwargs):
+        serializer = webhook_serializers.WebhookEndpointCreateSerializer(data=request.data)
+        if serializer.is_valid() is False:
+            return self.error_response(serializer)
+
+        endpoint = serializer.save(organizer=request.user)
+        return Response({
+            "status": "success",
+            "message": "Webhook created, keep its secret to verify the signature of the deliveries.",
+            "payload": {
+                "webhook": webhook_serializers.WebhookEndpointCreateSerializer(endpoint).data
+            }
+        }, status=status.HTTP_201_CREATED)
+
+
+class WebhookEndpointDetailView(WebhookEndpointMixin, GenericAPIView):
+    permission_classes = (IsOrganizer,)
+    serializer_class = webhook_serializers.WebhookEndpointSerializer
+    throttle_scope = 'unrestricted'
+
+    def get(self, request, pk, *args, **kwargs):
+        endpoint, error = self.get_endpoint(request, pk)
+        if error:
+            return error
+
+        return Response({
+            "status": "success",
+            "message": "Webhook retrieved successfully.",
+            "payload": {
+                "webhook": self.serializer_class(endpoint).data
+            }
+        }, status=status.HTTP_200_OK)
+
+    def patch(self, request, pk, *args, **kwargs):
+        endpoint, error = self.get_endpoint(request, pk)
+        if error:
+            return error
+
+        serializer = self.serializer_class(endpoint, data=request.data, partial=True)
+        if serializer.is_valid() is False:
+            return self.error_response(serializer)
+
+        # A fixed endpoint gets its deliveries right away
+        endpoint = serializer.save(consecutive_failures=0, circuit_open_until=None)
+        return Response({
+            "status": "success",
+            "message": "Webhook updated successfully.",
+            "payload": {
+                "webhook": self.serializer_class(endpoint).data
+            }
+        }, status=status.HTTP_200_OK)
+
+    def delete(self, request, pk, *args, **kwargs):
+        endpoint, error = self.get_endpoint(request, pk)
+        if error:
+            return error
+
+        endpoint.delete()
+        return Response({
+            "status": "success",
+            "message": "Webhook deleted successfully.",
+            "payload": {}
+        }, status=status.HTTP_200_OK)
+
+
+class WebhookDeliveryListView(WebhookEndpointMixin, ListAPIView):
+    permission_classes = (IsOrganizer,)
+    serializer_class = webhook_serializers.WebhookDeliverySerializer
+    pagination_class = WebhookDeliveryCursorPagination
+    throttle_scope = 'unrestricted'
+
+    def list(self, request, pk, *args, **kwargs):
+        endpoint, error = self.get_endpoint(request, pk)
+        if error:
+            return error
+
+        self.endpoint = endpoint
+        response = super().list(request, *args, **kwargs)
+        return Response({
+            "status": "success",
+            "message": "Webhook deliveries retrieved successfully.",
+            "payload": {
+                'deliveries': response.data.pop('results'),
+                'pagination': response.data,
+            },
+        }, status=status.HTTP_200_OK)
+
+    def get_queryset(self):
+        queryset = WebhookDelivery.objects.filter(endpoint=self.endpoint)
+        delivery_status = self.request.query_params.get('status')
+        if delivery_status:
+            queryset = queryset.filter(status=delivery_status.upper())
+        return queryset